@@ -1,20 +1,101 @@
 # app.py
 
 import os
-from flask import Flask, request, jsonify, session, redirect, url_for, send_from_directory
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, date, timedelta, UTC
+from flask import Blueprint, Flask, current_app, g, request, jsonify, session, redirect, url_for, send_from_directory, Response, stream_with_context
+from sqlalchemy import tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import selectinload
+from datetime import MAXYEAR, MINYEAR, datetime, date, timedelta, UTC
 import json
+import json_provider
+import base64
 import secrets
+import click
+import csv
+import logging
+
+from models import db, User, Child, Payment, PasswordResetToken, REPLICA_BIND
+import assets
+import balances
+import data_access
+import database
+import ledger
+import logging_config
+import metrics
+import passwords
+import ratelimit
+import replica
+import sync
+import versioning
+import warmup
+
+# Os módulos opcionais (e-mail, lembretes, exportação/importação de pagamentos, correção
+# monetária, migrações) são importados só quando uma rota ou comando os usa, para que um
+# processo novo responda mais cedo ao primeiro pedido (medido por benchmarks/startup.py).
+
+logger = logging.getLogger(__name__)
+
+# Rotas e comandos da aplicação, registados em cada aplicação criada por create_app()
+bp = Blueprint('pensao', __name__, cli_group=None)
+
+
+def create_app(config=None):
+    logging_config.configure_logging()
+
+    app = Flask(__name__)
+    # jsonify com o orjson (mesma saída do provider padrão, ver json_provider.py)
+    app.json = json_provider.FastJSONProvider(app)
+    # Latência, código de estado e consultas SQL por rota (GET /metrics)
+    metrics.init_app(app)
+
+    # --- CONFIGURAÇÕES DA APLICAÇÃO ---
+    # Use a SECRET_KEY de uma variável de ambiente. O fallback é apenas para desenvolvimento local.
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'meu_abacate_secreto_e_longo_para_testes')
+    # Use DATABASE_URL do Render para PostgreSQL, ou fallback para um valor padrão
+    # O Render irá injetar a URL do seu banco de dados PostgreSQL aqui.
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Réplica de leitura opcional para as rotas GET marcadas com @replica.read_only (ver replica.py)
+    if os.environ.get('DATABASE_REPLICA_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {
+            REPLICA_BIND: {
+                'url': os.environ['DATABASE_REPLICA_URL'],
+                **database.engine_options(os.environ['DATABASE_REPLICA_URL']),
+            },
+        }
+    app.config['SESSION_COOKIE_SAMESITE'] = 'None' # Alterado para 'None' para compatibilidade cross-site em HTTPS
+    app.config['SESSION_COOKIE_SECURE'] = True # Adicionado, necessário se SAMESITE for 'None' e você estiver em HTTPS
+    # 'config' substitui os valores acima (ex.: benchmarks com outro banco)
+    app.config.update(config or {})
+    # Pool de ligações, pre-ping e tempo máximo das consultas (ver database.py e gunicorn.conf.py)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', database.engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    db.init_app(app)
+    app.register_blueprint(bp)
+    # Manifesto do build dos ficheiros estáticos (assets.py), lido uma vez; None sem build
+    app.extensions['static_manifest'] = assets.load_manifest()
+
+    # Worker de e-mails dentro do próprio servidor, para deploys sem um processo 'worker' separado
+    if os.environ.get('EMAIL_OUTBOX_IN_PROCESS') == '1':
+        import email_outbox
+        email_outbox.start_background_worker(app, max_workers=int(os.environ.get('EMAIL_OUTBOX_WORKERS', 2)))
 
-# Importações para SendGrid
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To # Adicionado To para destinatário
+    # Aquecimento opcional do processo: ligações ao banco, pool de hash, caches (ver warmup.py)
+    warmup.init_app(app)
+    return app
+
+
+def __getattr__(name):
+    # 'gunicorn app:app' e 'flask --app app' continuam a funcionar: a aplicação é criada no
+    # primeiro acesso a app.app
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = Flask(__name__)
 
 # --- CONFIGURAÇÃO DO CORS (AGORA MANUAL VIA after_request) ---
-@app.after_request
+@bp.after_app_request
 def add_cors_headers(response):
     # Permite requisições de qualquer origem para o deploy inicial.
     # Em produção, você deve restringir isso ao domínio do seu frontend.
@@ -26,132 +107,57 @@ def add_cors_headers(response):
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     # Permite os métodos HTTP que o frontend usará
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    # Permite que o frontend leia o cursor da paginação dos pagamentos
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-Cursor')
     return response
 
 
-# --- CONFIGURAÇÕES DA APLICAÇÃO ---
-# Use a SECRET_KEY de uma variável de ambiente. O fallback é apenas para desenvolvimento local.
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'meu_abacate_secreto_e_longo_para_testes')
-# Use DATABASE_URL do Render para PostgreSQL, ou fallback para um valor padrão
-# O Render irá injetar a URL do seu banco de dados PostgreSQL aqui.
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SESSION_COOKIE_SAMESITE'] = 'None' # Alterado para 'None' para compatibilidade cross-site em HTTPS
-app.config['SESSION_COOKIE_SECURE'] = True # Adicionado, necessário se SAMESITE for 'None' e você estiver em HTTPS
-
-db = SQLAlchemy(app)
-
-# --- MODELOS DO BANCO DE DADOS ---
-
-class User(db.Model):
-    __tablename__ = 'users'
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(255), nullable=False)
-    surname = db.Column(db.String(255), nullable=False)
-    email = db.Column(db.String(255), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
-    children = db.relationship('Child', backref='user', lazy=True, cascade="all, delete-orphan")
-    reset_tokens = db.relationship('PasswordResetToken', backref='user', lazy=True, cascade="all, delete-orphan")
-
-    def set_password(self, password):
-        self.password_hash = password
-
-    def check_password(self, password):
-        return self.password_hash == password
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'surname': self.surname,
-            'email': self.email
-        }
-
-class Child(db.Model):
-    __tablename__ = 'children'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    full_name = db.Column(db.String(255), nullable=False)
-    gender = db.Column(db.String(50), nullable=True)
-    date_of_birth = db.Column(db.Date, nullable=False)
-    monthly_alimony_value = db.Column(db.Float, nullable=False)
-    enabled_years = db.Column(db.JSON, nullable=True)
-    payments = db.relationship('Payment', backref='child', lazy=True, cascade="all, delete-orphan")
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'full_name': self.full_name,
-            'gender': self.gender,
-            'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
-            'monthly_alimony_value': self.monthly_alimony_value,
-            'enabled_years': self.enabled_years
-        }
-
-class Payment(db.Model):
-    __tablename__ = 'payments'
-    id = db.Column(db.Integer, primary_key=True)
-    child_id = db.Column(db.Integer, db.ForeignKey('children.id'), nullable=False)
-    value_paid = db.Column(db.Float, nullable=False)
-    payment_date = db.Column(db.Date, nullable=False)
-    month_reference = db.Column(db.Integer, nullable=True)
-    year_reference = db.Column(db.Integer, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'child_id': self.child_id,
-            'amount': self.value_paid,
-            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
-            'month_reference': self.month_reference,
-            'year_reference': self.year_reference,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
-
-class PasswordResetToken(db.Model):
-    __tablename__ = 'password_reset_tokens'
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    token = db.Column(db.String(255), unique=True, nullable=False)
-    expires_at = db.Column(db.DateTime, nullable=False)
-    used = db.Column(db.Boolean, default=False, nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'token': self.token,
-            'expires_at': self.expires_at.isoformat(),
-            'used': self.used,
-            'created_at': self.created_at.isoformat()
-        }
-
-# Comentado para deploy em produção, pois o banco de dados já foi populado
-# with app.app_context():
-#     db.create_all()
 
 # --- HELPERS DE AUTENTICAÇÃO ---
 def login_required(f):
     def wrapper(*args, **kwargs):
         if session.get('user_id') is None:
-            print("Login Required: No user_id in session")
+            logger.info("Pedido sem sessão iniciada", extra={'path': request.path})
             return jsonify({'message': 'Não autorizado', 'redirect': 'index.html'}), 401
         return f(*args, **kwargs)
     wrapper.__name__ = f.__name__
     return wrapper
 
+@bp.app_errorhandler(passwords.HashingBusy)
+def password_hashing_busy(e):
+    # Fila do pool de hash de palavras-passe cheia (ver passwords.py)
+    db.session.rollback()
+    logger.warning("Pool de hash de palavras-passe sobrecarregado", extra={'path': request.path})
+    return jsonify({'message': 'Serviço temporariamente sobrecarregado. Tente novamente.'}), 503, {'Retry-After': '1'}
+
 # --- ROTAS PARA SERVIR FICHEIROS ESTÁTICOS DO FRONTEND ---
-@app.route('/')
+# Com o build de assets.py (flask --app app build-assets, ou no arranque do Gunicorn) os
+# ficheiros vêm de STATIC_BUILD_DIR, pré-comprimidos e com cache longa. Sem build, são
+# servidos da raiz do projeto.
+def send_built_asset(path):
+    resolved = assets.resolve(current_app.extensions['static_manifest'], path, request.accept_encodings)
+    if resolved is None:
+        return "Ficheiro não encontrado", 404
+    file_name, entry, encoding, immutable = resolved
+    response = send_from_directory(assets.BUILD_DIR, file_name, mimetype=entry['content_type'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if entry['encodings']:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = assets.cache_control(immutable)
+    return response
+
+@bp.route('/')
 def serve_index():
+    if current_app.extensions['static_manifest']:
+        return send_built_asset('index.html')
     return send_from_directory('.', 'index.html')
 
 # Rota para servir ficheiros estáticos do frontend
-@app.route('/<path:path>')
+@bp.route('/<path:path>')
 def serve_static_files(path):
+    if current_app.extensions['static_manifest']:
+        return send_built_asset(path)
     # Tenta servir o ficheiro diretamente da raiz do projeto
     # Isso é útil para HTML, CSS, JS e outros ativos na raiz
     try:
@@ -167,7 +173,7 @@ def serve_static_files(path):
 
 # --- ROTAS DA API (BACKEND) ---
 
-@app.route('/api/register', methods=['POST'])
+@bp.route('/api/register', methods=['POST'])
 def register():
     data = request.get_json()
     name = data.get('name')
@@ -187,7 +193,8 @@ def register():
     db.session.commit()
     return jsonify({"message": "Utilizador registado com sucesso!"}), 201
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])
+@ratelimit.limit('login')
 def login():
     data = request.get_json()
     email = data.get('email')
@@ -199,99 +206,74 @@ def login():
     user = User.query.filter_by(email=email).first()
 
     if user and user.check_password(password):
+        # Grava o novo hash, se check_password o atualizou
+        db.session.commit()
         session['user_id'] = user.id
         session['user_email'] = user.email
         session['user_name'] = user.name
-        print(f"Utilizador {user.name} logado. Sessão: {session}")
+        logger.info("Login bem-sucedido", extra={'user_id': user.id})
         return jsonify({"message": "Login bem-sucedido", "user_name": user.name, "user_email": user.email}), 200
     else:
-        print("Login falhou: Credenciais inválidas")
+        logger.info("Login falhou: credenciais inválidas")
         return jsonify({"message": "E-mail ou palavra-passe inválidos."}), 401
 
-@app.route('/api/logout', methods=['POST'])
+@bp.route('/api/logout', methods=['POST'])
 @login_required
 def logout():
-    session.pop('user_id', None)
+    user_id = session.pop('user_id', None)
     session.pop('user_email', None)
     session.pop('user_name', None)
-    print("Utilizador desconectado. Sessão limpa.")
+    logger.info("Logout", extra={'user_id': user_id})
     return jsonify({"message": "Logout bem-sucedido"}), 200
 
-@app.route('/api/forgot-password', methods=['POST'])
+@bp.route('/api/forgot-password', methods=['POST'])
+@ratelimit.limit('forgot_password')
 def forgot_password():
-    print("\n--- Rota /api/forgot-password foi acionada ---")
     try:
         data = request.get_json()
-        print(f"Dados recebidos na requisição forgot-password: {data}")
     except Exception as e:
-        print(f"Erro ao obter JSON da requisição forgot-password: {e}")
+        logger.info("JSON inválido em forgot-password", extra={'error': str(e)})
         return jsonify({'message': 'Erro ao processar os dados da requisição.'}), 400
 
     email = data.get('email')
 
     if not email:
-        print("Erro: E-mail em falta na requisição forgot-password.")
         return jsonify({'message': 'Por favor, forneça o e-mail para recuperação.'}), 400
 
     user = User.query.filter_by(email=email).first()
     if not user:
-        print(f"Info: Tentativa de recuperação para e-mail não registado: {email}")
+        logger.info("Recuperação pedida para e-mail não registado")
         return jsonify({"message": "Se o e-mail estiver registado, um link para redefinir a sua palavra-passe foi enviado para ele."}), 200
 
     token = secrets.token_urlsafe(32)
     expires_at = datetime.now(UTC) + timedelta(hours=1)
 
-    new_token = PasswordResetToken(user_id=user.id, token=token, expires_at=expires_at)
-    db.session.add(new_token)
-    db.session.commit()
-    print(f"Token de recuperação gerado e salvo para o utilizador {user.email}.")
-
     # Use uma variável de ambiente para o domínio do frontend em produção
     frontend_base_url = os.environ.get('FRONTEND_BASE_URL', 'http://127.0.0.1:5500')
     reset_link = f"{frontend_base_url}/redefinir-senha.html?token={token}"
 
-    # --- INÍCIO DA INTEGRAÇÃO SENDGRID ---
-    sendgrid_api_key = os.environ.get('SENDGRID_API_KEY')
-    sender_email = os.environ.get('SENDGRID_SENDER_EMAIL') # O e-mail verificado no SendGrid
-
-    if not sendgrid_api_key or not sender_email:
-        print("Erro: SENDGRID_API_KEY ou SENDGRID_SENDER_EMAIL não configurados. E-mail de recuperação não enviado.")
-        print(f"\n--- SIMULAÇÃO DE E-MAIL DE RECUPERAÇÃO DE PALAVRA-PASSE ---")
-        print(f"Para: {user.email}")
-        print(f"Assunto: Redefinição de Palavra-Passe")
-        print(f"Corpo: Olá {user.name},\n\nVocê solicitou a redefinição da sua palavra-passe. Clique no link abaixo para redefinir:\n{reset_link}\n\nEste link é válido por 1 hora.<br><br>Se você não solicitou isso, por favor, ignore este e-mail.")
-        print(f"--- FIM DA SIMULAÇÃO ---\n")
-    else:
-        try:
-            message = Mail(
-                from_email=Email(sender_email, 'Pensão em Dia Suporte'), # Remetente verificado no SendGrid
-                to_emails=To(user.email), # Destinatário
-                subject='Redefinição de Palavra-Passe - Pensão em Dia',
-                html_content=f'Olá {user.name},<br><br>Você solicitou a redefinição da sua palavra-passe. Clique no link abaixo para redefinir:<br><a href="{reset_link}">{reset_link}</a><br><br>Este link é válido por 1 hora.<br><br>Se você não solicitou isso, por favor, ignore este e-mail.'
-            )
-            sg = SendGridAPIClient(sendgrid_api_key)
-            response = sg.send(message)
-            print(f"E-mail de recuperação enviado para {user.email}. Status Code: {response.status_code}")
-        except Exception as e:
-            print(f"Erro ao enviar e-mail de recuperação com SendGrid: {e}")
-            # Fallback para log se o envio falhar
-            print(f"\n--- SIMULAÇÃO DE E-MAIL DE RECUPERAÇÃO DE PALAVRA-PASSE (ERRO NO ENVIO REAL) ---")
-            print(f"Para: {user.email}")
-            print(f"Assunto: Redefinição de Palavra-Passe")
-            print(f"Corpo: Olá {user.name},\n\nVocê solicitou a redefinição da sua palavra-passe. Clique no link abaixo para redefinir:\n{reset_link}\n\nEste link é válido por 1 hora.\n\nSe você não solicitou isso, por favor, ignore este e-mail.")
-            print(f"--- FIM DA SIMULAÇÃO ---\n")
-    # --- FIM DA INTEGRAÇÃO SENDGRID ---
+    # O token e o e-mail são gravados na mesma transação; o envio é feito pelo worker
+    # da caixa de saída (email_outbox.py), fora do pedido
+    import email_outbox
+    new_token = PasswordResetToken(user_id=user.id, token=token, expires_at=expires_at)
+    db.session.add(new_token)
+    email_outbox.enqueue(
+        to_email=user.email,
+        subject='Redefinição de Palavra-Passe - Pensão em Dia',
+        html_content=f'Olá {user.name},<br><br>Você solicitou a redefinição da sua palavra-passe. Clique no link abaixo para redefinir:<br><a href="{reset_link}">{reset_link}</a><br><br>Este link é válido por 1 hora.<br><br>Se você não solicitou isso, por favor, ignore este e-mail.',
+        text_content=f'Olá {user.name},\n\nVocê solicitou a redefinição da sua palavra-passe. Clique no link abaixo para redefinir:\n{reset_link}\n\nEste link é válido por 1 hora.\n\nSe você não solicitou isso, por favor, ignore este e-mail.',
+    )
+    db.session.commit()
+    logger.info("Token de recuperação gerado e e-mail colocado na fila", extra={'user_id': user.id})
 
     return jsonify({"message": "Se o e-mail estiver registado, um link para redefinir a sua palavra-passe foi enviado para ele."}), 200
 
-@app.route('/api/reset-password', methods=['POST'])
+@bp.route('/api/reset-password', methods=['POST'])
 def reset_password():
-    print("\n--- Rota /api/reset-password foi acionada ---")
     try:
         data = request.get_json()
-        print(f"Dados recebidos na requisição: {data}")
     except Exception as e:
-        print(f"Erro ao obter JSON da requisição: {e}")
+        logger.info("JSON inválido em reset-password", extra={'error': str(e)})
         return jsonify({'message': 'Erro ao processar os dados da requisição.'}), 400
 
     token = data.get('token')
@@ -299,17 +281,15 @@ def reset_password():
     confirm_password = data.get('confirm_password')
 
     if not all([token, new_password, confirm_password]):
-        print("Erro: Token ou nova palavra-passe em falta.")
         return jsonify({'message': 'Token e nova palavra-passe são obrigatórios.'}), 400
 
     if new_password != confirm_password:
-        print("Erro: As palavras-passe não coincidem.")
         return jsonify({'message': 'As palavras-passe não coincidem.'}), 400
 
     reset_token = PasswordResetToken.query.filter_by(token=token, used=False).first()
 
     if not reset_token:
-        print(f"Erro: Token '{token}' inválido ou já utilizado.")
+        logger.info("Token de recuperação inválido ou já utilizado")
         return jsonify({'message': 'Token inválido ou já utilizado.'}), 400
 
     # Converter expires_at para um datetime com fuso horário UTC para comparação
@@ -320,22 +300,22 @@ def reset_password():
         expires_at_aware = reset_token.expires_at
 
     if expires_at_aware < datetime.now(UTC):
-        print(f"Erro: Token expirado. Expira em: {reset_token.expires_at}, Agora: {datetime.now(UTC)}")
+        logger.info("Token de recuperação expirado", extra={'user_id': reset_token.user_id})
         return jsonify({'message': 'Token expirado.'}), 400
 
     user = User.query.get(reset_token.user_id)
     if not user:
-        print(f"Erro: Utilizador com ID {reset_token.user_id} associado ao token não encontrado.")
+        logger.warning("Utilizador do token de recuperação não encontrado", extra={'user_id': reset_token.user_id})
         return jsonify({'message': 'Utilizador associado ao token não encontrado.'}), 404
 
     user.set_password(new_password)
     reset_token.used = True
     db.session.commit()
-    print(f"Sucesso: Palavra-passe para o utilizador {user.email} redefinida com sucesso. Token usado.")
+    logger.info("Palavra-passe redefinida", extra={'user_id': user.id})
 
     return jsonify({'message': 'Palavra-passe redefinida com sucesso!'}), 200
 
-@app.route('/api/children', methods=['POST'])
+@bp.route('/api/children', methods=['POST'])
 @login_required
 def add_child():
     data = request.get_json()
@@ -364,18 +344,25 @@ def add_child():
         enabled_years=enabled_years
     )
     db.session.add(new_child)
+    versioning.bump(user_id, new_child)
     db.session.commit()
     return jsonify({'message': 'Filho adicionado com sucesso', 'child': new_child.to_dict()}), 201
 
-@app.route('/api/children', methods=['GET'])
+@bp.route('/api/children', methods=['GET'])
 @login_required
+@replica.read_only
+@versioning.conditional_get
 def get_children():
     user_id = session.get('user_id')
-    children = Child.query.filter_by(user_id=user_id).all()
-    return jsonify([child.to_dict() for child in children]), 200
+    rows = db.session.execute(
+        db.select(*Child.list_columns()).where(Child.user_id == user_id)
+    )
+    return jsonify([Child.row_to_dict(row) for row in rows]), 200
 
-@app.route('/api/children/<int:child_id>', methods=['GET'])
+@bp.route('/api/children/<int:child_id>', methods=['GET'])
 @login_required
+@replica.read_only
+@versioning.conditional_get
 def get_child_detail(child_id):
     user_id = session.get('user_id')
     child = Child.query.filter_by(id=child_id, user_id=user_id).first()
@@ -385,57 +372,103 @@ def get_child_detail(child_id):
 
     return jsonify(child.to_dict()), 200
 
-@app.route('/api/children/<int:child_id>', methods=['PUT'])
+def correction_etag():
+    # Um novo mês publicado do índice muda os valores corrigidos: entra no ETag
+    index_name = request.args.get('correction')
+    if not index_name:
+        return None
+    import correction
+    try:
+        series = correction.get_series(index_name)
+    except correction.IndexUnavailable:
+        return None
+    return f'{series.name}-{correction.format_ordinal(series.last)}'
+
+@bp.route('/api/children/<int:child_id>/ledger', methods=['GET'])
 @login_required
-def update_child(child_id):
+@replica.read_only
+@versioning.conditional_get(etag_extra=correction_etag)
+def get_child_ledger(child_id):
+    # ?correction=inpc|ipca acrescenta a correção monetária e os juros de cada mês (ver correction.py)
     user_id = session.get('user_id')
+    index_name = request.args.get('correction')
+    if index_name:
+        import correction
+        if index_name not in correction.SUPPORTED_INDEXES:
+            return jsonify({'message': f"Índice de correção inválido. Use {', '.join(correction.SUPPORTED_INDEXES)}."}), 400
+
     child = Child.query.filter_by(id=child_id, user_id=user_id).first()
 
     if not child:
         return jsonify({'message': 'Filho não encontrado ou não autorizado'}), 404
 
+    if not index_name:
+        return jsonify(ledger.build_ledger(child)), 200
+    try:
+        data_version = g.get('data_version', versioning.current(user_id))
+        return jsonify(correction.corrected_ledger(child, data_version, index_name)), 200
+    except correction.IndexUnavailable as e:
+        return jsonify({'message': str(e)}), 503
+
+@bp.route('/api/children/<int:child_id>', methods=['PUT'])
+@login_required
+def update_child(child_id):
+    user_id = session.get('user_id')
     data = request.get_json()
-    child.full_name = data.get('full_name', child.full_name)
-    child.gender = data.get('gender', child.gender)
+
+    # Valida primeiro; a posse do filho é verificada pelo próprio UPDATE
+    values = {}
+    if 'full_name' in data:
+        values['full_name'] = data['full_name']
+    if 'gender' in data:
+        values['gender'] = data['gender']
 
     date_of_birth_str = data.get('date_of_birth')
     if date_of_birth_str:
         try:
-            child.date_of_birth = datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()
+            values['date_of_birth'] = datetime.strptime(date_of_birth_str, '%Y-%m-%d').date()
         except ValueError:
             return jsonify({'message': 'Formato de data inválido'}), 400
 
     monthly_alimony_value = data.get('monthly_alimony_value')
     if monthly_alimony_value is not None:
         try:
-            child.monthly_alimony_value = float(monthly_alimony_value)
+            values['monthly_alimony_value'] = float(monthly_alimony_value)
         except (ValueError, TypeError):
             return jsonify({'message': 'Formato de valor de pensão mensal inválido'}), 400
 
     enabled_years_data = data.get('enabled_years')
     if enabled_years_data is not None:
         if isinstance(enabled_years_data, list):
-            child.enabled_years = enabled_years_data
+            values['enabled_years'] = enabled_years_data
         else:
             return jsonify({'message': 'Formato de anos habilitados inválido. Deve ser uma lista.'}), 400
 
+    version = versioning.bump(user_id)
+    child = data_access.update_child(user_id, child_id, values, version)
+    if child is None:
+        db.session.rollback()
+        return jsonify({'message': 'Filho não encontrado ou não autorizado'}), 404
+
     db.session.commit()
-    return jsonify({'message': 'Filho atualizado com sucesso', 'child': child.to_dict()}), 200
+    return jsonify({'message': 'Filho atualizado com sucesso', 'child': child}), 200
 
-@app.route('/api/children/<int:child_id>', methods=['DELETE'])
+@bp.route('/api/children/<int:child_id>', methods=['DELETE'])
 @login_required
 def delete_child(child_id):
     user_id = session.get('user_id')
-    child = Child.query.filter_by(id=child_id, user_id=user_id).first()
 
-    if not child:
+    # Os pagamentos e os totais mensais do filho são apagados pelo banco (ON DELETE CASCADE)
+    if data_access.delete_child(user_id, child_id) is None:
+        db.session.rollback()
         return jsonify({'message': 'Filho não encontrado ou não autorizado'}), 404
 
-    db.session.delete(child)
+    version = versioning.bump(user_id)
+    sync.record_tombstone(user_id, 'child', child_id, version)
     db.session.commit()
     return jsonify({'message': 'Filho excluído com sucesso'}), 200
 
-@app.route('/api/payments', methods=['POST'])
+@bp.route('/api/payments', methods=['POST'])
 @login_required
 def add_payment():
     data = request.get_json()
@@ -472,12 +505,58 @@ def add_payment():
         year_reference=year_reference
     )
     db.session.add(new_payment)
+    balances.record_payment_added(new_payment)
+    versioning.bump(user_id, new_payment)
     db.session.commit()
     return jsonify({'message': 'Pagamento adicionado com sucesso', 'payment': new_payment.to_dict()}), 201
 
-@app.route('/api/payments/<int:child_id>', methods=['GET'])
+@bp.route('/api/payments/import', methods=['POST'])
+@login_required
+def import_payments():
+    # Corpo em CSV (text/csv) ou NDJSON (application/x-ndjson), com as colunas/campos
+    # child_id, amount, payment_date (AAAA-MM-DD), month_reference e year_reference
+    import payment_import
+    user_id = session.get('user_id')
+    try:
+        import_format = payment_import.detect_format(request.content_type, request.args.get('format'))
+    except payment_import.ImportFormatError as e:
+        return jsonify({'message': str(e)}), 415
+
+    try:
+        report = payment_import.import_payments(request.stream, import_format, user_id)
+    except csv.Error as e:
+        return jsonify({'message': f'Ficheiro CSV inválido: {e}'}), 400
+    except UnicodeDecodeError:
+        # A importação é uma só transação: nada foi gravado
+        return jsonify({'message': 'O ficheiro deve estar em UTF-8'}), 400
+
+    return jsonify({'message': 'Importação concluída', **report}), 200
+
+# --- PAGINAÇÃO DOS PAGAMENTOS ---
+PAYMENTS_PAGE_MAX_LIMIT = 1000
+
+# O cursor é opaco para o cliente: (payment_date, id) do último pagamento, em base64
+def encode_payments_cursor(payment):
+    raw = json.dumps([payment.payment_date.isoformat(), payment.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_payments_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payment_date_str, payment_id = json.loads(raw)
+        return datetime.strptime(payment_date_str, '%Y-%m-%d').date(), int(payment_id)
+    except (ValueError, TypeError):
+        raise ValueError('Cursor inválido')
+
+@bp.route('/api/payments/<int:child_id>', methods=['GET'])
 @login_required
+@replica.read_only
+@versioning.conditional_get
 def get_payments_by_child_id(child_id):
+    # Parâmetros opcionais:
+    #   year / month   -> filtra pela data do pagamento (ou pela referência, com by=reference)
+    #   limit / cursor -> paginação por keyset sobre (payment_date, id); o cursor da página
+    #                     seguinte vem no cabeçalho X-Next-Cursor
     user_id = session.get('user_id')
 
     child = Child.query.filter_by(id=child_id, user_id=user_id).first()
@@ -485,13 +564,182 @@ def get_payments_by_child_id(child_id):
         return jsonify({'message': 'Filho não encontrado ou não autorizado'}), 404
 
     try:
-        payments = Payment.query.filter_by(child_id=child_id).order_by(Payment.payment_date).all()
-        return jsonify([payment.to_dict() for payment in payments]), 200
+        year = int(request.args['year']) if request.args.get('year') else None
+        month = int(request.args['month']) if request.args.get('month') else None
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'message': 'Ano, mês ou limite inválido'}), 400
+    # O filtro por data usa date(year + 1, 1, 1)
+    if year is not None and not MINYEAR <= year < MAXYEAR:
+        return jsonify({'message': 'Ano, mês ou limite inválido'}), 400
+
+    if month is not None and (month < 1 or month > 12 or year is None):
+        return jsonify({'message': 'O mês deve estar entre 1 e 12 e ser acompanhado do ano'}), 400
+    if limit is not None and (limit < 1 or limit > PAYMENTS_PAGE_MAX_LIMIT):
+        return jsonify({'message': f'O limite deve estar entre 1 e {PAYMENTS_PAGE_MAX_LIMIT}'}), 400
+
+    # Lidos como tuplos (sem objetos Payment) e convertidos por Payment.row_to_dict
+    query = db.select(*Payment.list_columns()).where(Payment.child_id == child_id)
+
+    if year is not None:
+        if request.args.get('by') == 'reference':
+            query = query.where(Payment.year_reference == year)
+            if month is not None:
+                query = query.where(Payment.month_reference == month)
+        else:
+            # Intervalo de datas para aproveitar o índice (child_id, payment_date, id)
+            start = date(year, month or 1, 1)
+            if month is None or month == 12:
+                end = date(year + 1, 1, 1)
+            else:
+                end = date(year, month + 1, 1)
+            query = query.where(Payment.payment_date >= start, Payment.payment_date < end)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_payments_cursor(cursor)
+        except ValueError:
+            return jsonify({'message': 'Cursor inválido'}), 400
+        query = query.where(tuple_(Payment.payment_date, Payment.id) > tuple_(cursor_date, cursor_id))
+
+    query = query.order_by(Payment.payment_date, Payment.id)
+
+    try:
+        if limit is None:
+            rows = db.session.execute(query)
+            return jsonify([Payment.row_to_dict(row) for row in rows]), 200
+
+        # Busca um registo a mais para saber se existe uma página seguinte
+        payments = db.session.execute(query.limit(limit + 1)).all()
+        has_more = len(payments) > limit
+        payments = payments[:limit]
+        response = jsonify([Payment.row_to_dict(row) for row in payments])
+        if has_more:
+            response.headers['X-Next-Cursor'] = encode_payments_cursor(payments[-1])
+        return response, 200
     except Exception as e:
-        print(f"Erro no banco de dados ao buscar pagamentos: {e}")
+        if isinstance(e, DBAPIError) and g.get('use_replica'):
+            # A réplica falhou: @replica.read_only repete o pedido no banco principal
+            raise
+        logger.exception("Erro no banco de dados ao buscar pagamentos", extra={'child_id': child_id})
         return jsonify({'message': 'Erro interno do servidor ao buscar pagamentos', 'error': str(e)}), 500
 
-@app.route('/api/payments/<int:payment_id>', methods=['PUT'])
+# Agrupa uma lista de pagamentos na estrutura { "ano": [12 listas, uma por mês] }
+# usada pelo frontend (gestao.js), com base na data do pagamento.
+def group_payments_by_year_and_month(payments):
+    organized = {}
+    for payment in sorted(payments, key=lambda p: (p.payment_date, p.id)):
+        year_key = str(payment.payment_date.year)
+        if year_key not in organized:
+            organized[year_key] = [[] for _ in range(12)]
+        organized[year_key][payment.payment_date.month - 1].append(payment.to_dict())
+    return organized
+
+@bp.route('/api/dashboard', methods=['GET'])
+@login_required
+@replica.read_only
+@versioning.conditional_get
+def get_dashboard():
+    # Carrega todos os filhos do utilizador e os respetivos pagamentos de uma só vez
+    # (uma consulta para os filhos e uma para os pagamentos, independentemente do número de filhos).
+    # Com ?year=AAAA apenas os pagamentos desse ano são enviados; o montante devedor de cada
+    # filho vem sempre calculado pelo ledger, para todos os anos habilitados.
+    user_id = session.get('user_id')
+    try:
+        year = int(request.args['year']) if request.args.get('year') else None
+    except ValueError:
+        return jsonify({'message': 'Ano inválido'}), 400
+    # date(year + 1, 1, 1) tem de existir
+    if year is not None and not MINYEAR <= year < MAXYEAR:
+        return jsonify({'message': 'Ano inválido'}), 400
+
+    payments_loader = selectinload(Child.payments)
+    if year is not None:
+        payments_loader = selectinload(Child.payments.and_(
+            Payment.payment_date >= date(year, 1, 1),
+            Payment.payment_date < date(year + 1, 1, 1),
+        ))
+    children = (
+        Child.query
+        .filter_by(user_id=user_id)
+        .options(payments_loader)
+        .order_by(Child.id)
+        .all()
+    )
+
+    today = date.today()
+    ledger_years = sorted({y for child in children for y in ledger.years_to_track(child, today)})
+    totals = ledger.monthly_paid_totals([child.id for child in children], ledger_years)
+
+    result = []
+    for child in children:
+        child_data = child.to_dict()
+        payments_by_year = group_payments_by_year_and_month(child.payments)
+        if year is not None:
+            payments_by_year.setdefault(str(year), [[] for _ in range(12)])
+        child_data['payments_by_year'] = payments_by_year
+        child_ledger = ledger.build_ledger(child, today=today, totals=totals)
+        child_data['ledger'] = {'total_due': child_ledger['total_due'], 'status': child_ledger['status']}
+        result.append(child_data)
+    return jsonify(result), 200
+
+# Lê os parâmetros opcionais from_year/to_year das rotas de exportação
+def parse_year_range_args():
+    try:
+        from_year = int(request.args['from_year']) if request.args.get('from_year') else None
+        to_year = int(request.args['to_year']) if request.args.get('to_year') else None
+    except ValueError:
+        raise ValueError('Ano inicial ou final inválido')
+    # O filtro usa date(to_year + 1, 1, 1) (ver payment_export.py)
+    if any(year is not None and not MINYEAR <= year < MAXYEAR for year in (from_year, to_year)):
+        raise ValueError('Ano inicial ou final inválido')
+    if from_year is not None and to_year is not None and from_year > to_year:
+        raise ValueError('O ano inicial não pode ser posterior ao ano final')
+    return from_year, to_year
+
+def export_payments_response(user_id, child_id=None):
+    import payment_export
+    export_format = request.args.get('format', 'csv')
+    if export_format not in payment_export.RENDERERS:
+        return jsonify({'message': "Formato inválido. Use 'csv' ou 'ndjson'."}), 400
+    try:
+        from_year, to_year = parse_year_range_args()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    children = payment_export.load_children(user_id, child_id)
+    if child_id is not None and not children:
+        return jsonify({'message': 'Filho não encontrado ou não autorizado'}), 404
+
+    rows = payment_export.export_rows(children, from_year, to_year)
+    body = payment_export.RENDERERS[export_format](rows)
+
+    filename = f"pagamentos-{child_id}" if child_id is not None else "pagamentos"
+    if from_year is not None or to_year is not None:
+        filename += f"-{from_year or 'inicio'}-{to_year or 'atual'}"
+    extension = 'csv' if export_format == 'csv' else 'ndjson'
+
+    response = Response(stream_with_context(body), mimetype=payment_export.CONTENT_TYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+@bp.route('/api/payments/export', methods=['GET'])
+@login_required
+@replica.read_only
+@versioning.conditional_get
+def export_payments():
+    # Histórico de todos os filhos do utilizador (?format=csv|ndjson&from_year=&to_year=)
+    return export_payments_response(session.get('user_id'))
+
+@bp.route('/api/children/<int:child_id>/payments/export', methods=['GET'])
+@login_required
+@replica.read_only
+@versioning.conditional_get
+def export_child_payments(child_id):
+    return export_payments_response(session.get('user_id'), child_id)
+
+@bp.route('/api/payments/<int:payment_id>', methods=['PUT'])
 @login_required
 def update_payment(payment_id):
     data = request.get_json()
@@ -501,17 +749,11 @@ def update_payment(payment_id):
     year_reference = data.get('year_reference')
     user_id = session.get('user_id')
 
-    payment = Payment.query.get(payment_id)
-    if not payment:
-        return jsonify({'message': 'Pagamento não encontrado'}), 404
-
-    child = Child.query.filter_by(id=payment.child_id, user_id=user_id).first()
-    if not child:
-        return jsonify({'message': 'Não autorizado: O pagamento não pertence ao seu filho'}), 403
-
+    # Valida primeiro; a posse do pagamento é verificada pelo próprio UPDATE
+    values = {}
     if amount_from_frontend is not None:
         try:
-            payment.value_paid = float(amount_from_frontend)
+            values['value_paid'] = float(amount_from_frontend)
         except (ValueError, TypeError):
             return jsonify({'message': 'Formato de valor inválido'}), 400
 
@@ -520,41 +762,161 @@ def update_payment(payment_id):
             new_payment_date = datetime.strptime(payment_date_str, '%Y-%m-%d').date()
             if new_payment_date > date.today():
                 return jsonify({'message': 'A data de pagamento não pode ser no futuro'}), 400
-            payment.payment_date = new_payment_date
+            values['payment_date'] = new_payment_date
         except ValueError:
             return jsonify({'message': 'Formato de data inválido'}), 400
 
     if month_reference is not None:
         try:
-            payment.month_reference = int(month_reference)
+            values['month_reference'] = int(month_reference)
         except ValueError:
             return jsonify({'message': 'Formato de mês de referência inválido'}), 400
     if year_reference is not None:
         try:
-            payment.year_reference = int(year_reference)
+            values['year_reference'] = int(year_reference)
         except ValueError:
             return jsonify({'message': 'Formato de ano de referência inválido'}), 400
 
+    version = versioning.bump(user_id)
+    updated = data_access.update_payment(user_id, payment_id, values, version)
+    if updated is None:
+        db.session.rollback()
+        return jsonify({'message': 'Pagamento não encontrado ou não autorizado'}), 404
+
+    old_payment_date, old_value_paid, row = updated
+    payment = Payment.row_to_dict(row)
+    balances.record_payment_changed(row.child_id, old_payment_date, old_value_paid, row.payment_date, row.value_paid)
     db.session.commit()
-    return jsonify({'message': 'Pagamento atualizado com sucesso', 'payment': payment.to_dict()}), 200
+    return jsonify({'message': 'Pagamento atualizado com sucesso', 'payment': payment}), 200
 
-@app.route('/api/payments/<int:payment_id>', methods=['DELETE'])
+@bp.route('/api/payments/<int:payment_id>', methods=['DELETE'])
 @login_required
 def delete_payment(payment_id):
     user_id = session.get('user_id')
-    payment = Payment.query.get(payment_id)
-
-    if not payment:
-        return jsonify({'message': 'Pagamento não encontrado'}), 404
 
-    child = Child.query.filter_by(id=payment.child_id, user_id=user_id).first()
-    if not child:
-        return jsonify({'message': 'Não autorizado: O pagamento não pertence ao seu filho'}), 403
+    payment = data_access.delete_payment(user_id, payment_id)
+    if payment is None:
+        db.session.rollback()
+        return jsonify({'message': 'Pagamento não encontrado ou não autorizado'}), 404
 
-    db.session.delete(payment)
+    balances.record_payment_removed(payment)
+    version = versioning.bump(user_id)
+    sync.record_tombstone(user_id, 'payment', payment.id, version)
     db.session.commit()
     return jsonify({'message': 'Pagamento excluído com sucesso'}), 200
 
+# --- SINCRONIZAÇÃO (PWA / MODO OFFLINE) ---
+
+@bp.route('/api/sync', methods=['GET'])
+@login_required
+@versioning.conditional_get
+def get_sync_changes():
+    # ?since=<cursor devolvido pela sincronização anterior>; sem 'since' devolve todos os dados
+    user_id = session.get('user_id')
+    try:
+        since = sync.decode_cursor(request.args['since']) if request.args.get('since') else None
+    except sync.SyncError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(sync.changes_since(user_id, since)), 200
+
+@bp.route('/api/sync', methods=['POST'])
+@login_required
+def push_sync_mutations():
+    # Corpo: {"mutations": [{"idempotency_key": "...", "type": "add_payment", "id": 1, "payload": {...}}]}
+    user_id = session.get('user_id')
+    data = request.get_json(silent=True) or {}
+    try:
+        result = sync.apply_mutations(user_id, data.get('mutations'))
+    except sync.SyncError as e:
+        return jsonify({'message': str(e)}), 400
+    return jsonify(result), 200
+
+# --- COMANDOS CLI (flask --app app <comando>) ---
+
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    # Aplica as migrações versionadas que ainda não foram aplicadas (ver migrations.py)
+    import migrations
+    applied = migrations.upgrade(echo=click.echo)
+    if not applied:
+        click.echo("O esquema já está atualizado.")
+
+@bp.cli.command('db-status')
+def db_status_command():
+    import migrations
+    applied = migrations.applied_versions()
+    for version, description, _ in migrations.MIGRATIONS:
+        state = 'aplicada' if version in applied else 'pendente'
+        click.echo(f"{version:04d} [{state}] {description}")
+
+@bp.cli.command('deliver-emails')
+@click.option('--once', is_flag=True, help='Envia o que estiver pendente e termina.')
+@click.option('--workers', default=4, show_default=True, help='Número de threads de envio.')
+@click.option('--batch-size', default=50, show_default=True)
+@click.option('--poll-interval', default=5.0, show_default=True, help='Segundos entre verificações da fila.')
+def deliver_emails_command(once, workers, batch_size, poll_interval):
+    import email_outbox
+    email_outbox.run_worker(current_app._get_current_object(), max_workers=workers, batch_size=batch_size, poll_interval=poll_interval, once=once)
+
+@bp.cli.command('send-reminders')
+@click.option('--dry-run', is_flag=True, help='Apenas conta os filhos e destinatários, sem enviar e-mails.')
+@click.option('--chunk-size', default=2000, show_default=True, help='Utilizadores analisados por consulta.')
+@click.option('--batch-size', default=1000, show_default=True, help='Destinatários por pedido ao serviço de e-mail.')
+def send_reminders_command(dry_run, chunk_size, batch_size):
+    # Tarefa noturna (cron): lembretes de meses em atraso para todos os utilizadores
+    import reminders
+    summary = reminders.send_reminders(chunk_size=chunk_size, batch_size=min(batch_size, reminders.BATCH_SIZE), dry_run=dry_run)
+    click.echo(
+        f"{summary['children']} filho(s) com meses em atraso, {summary['recipients']} destinatário(s) "
+        f"em {summary['batches']} lote(s): {summary['sent']} enviado(s), {summary['failed']} com erro."
+    )
+    if summary['failed']:
+        raise SystemExit(1)
+
+@bp.cli.command('build-assets')
+@click.option('--force', is_flag=True, help='Refaz o build mesmo sem alterações nos ficheiros de origem.')
+def build_assets_command(force):
+    # Ficheiros do frontend com hash no nome, pré-comprimidos, em STATIC_BUILD_DIR (ver assets.py)
+    manifest = assets.build(force=force)
+    fingerprinted = sum(1 for entry in manifest['files'].values() if entry['immutable'])
+    click.echo(f"{len(manifest['files'])} ficheiro(s) em {assets.BUILD_DIR} ({fingerprinted} com hash no nome).")
+
+@bp.cli.command('recalculate-corrections')
+@click.option('--index', 'index_name', type=click.Choice(('inpc', 'ipca')),
+              help='Índice de correção (por omissão CORRECTION_INDEX, ou inpc).')
+@click.option('--chunk-size', default=2000, show_default=True, help='Filhos por consulta.')
+@click.option('--output', type=click.File('w'), help='CSV com a dívida corrigida de cada filho.')
+def recalculate_corrections_command(index_name, chunk_size, output):
+    # Depois de publicado um novo mês do índice: dívida corrigida de toda a carteira
+    import correction
+    writer = csv.writer(output) if output else None
+    summary = correction.recalculate_portfolio(index_name, chunk_size=chunk_size, writer=writer)
+    click.echo(
+        f"{summary['children']} filho(s), índice {summary['index'].upper()} até {summary['index_last_month']}: "
+        f"em falta {summary['total_due']:.2f}, corrigido {summary['total_corrected']:.2f}, "
+        f"juros {summary['total_interest']:.2f}."
+    )
+
+@bp.cli.command('rebuild-balances')
+@click.option('--verify', is_flag=True, help='Apenas compara a tabela com os pagamentos, sem a reconstruir.')
+def rebuild_balances_command(verify):
+    drift = balances.find_drift()
+    for item in drift:
+        click.echo(
+            f"Filho {item['child_id']} {item['month']:02d}/{item['year']}: "
+            f"esperado {item['expected_total_paid']:.2f} ({item['expected_payment_count']} pagamentos), "
+            f"guardado {item['stored_total_paid']:.2f} ({item['stored_payment_count']} pagamentos)"
+        )
+    click.echo(f"{len(drift)} mês(es) com diferenças em child_month_balance.")
+
+    if verify:
+        if drift:
+            raise SystemExit(1)
+        return
+
+    balances.rebuild()
+    click.echo("child_month_balance reconstruída a partir de payments.")
+
 # Comentado para deploy em produção, o servidor WSGI (Gunicorn) irá iniciar a aplicação
 # if __name__ == '__main__':
 #     app.run(debug=True, port=5000)
@@ -0,0 +1,192 @@
+# assets.py
+# Ficheiros estáticos do frontend: build com impressão digital, pré-compressão e manifesto.
+#
+# build() copia os ficheiros do frontend para STATIC_BUILD_DIR:
+#   - CSS, JS e ícones ganham o hash do conteúdo no nome (style.css -> style.3f2a9c1b7e40.css)
+#     e são servidos com Cache-Control: immutable (um ano);
+#   - as páginas HTML e o manifest.json da PWA mantêm o nome, com as referências aos ficheiros
+#     acima trocadas pelos novos nomes, e são revalidados a cada visita (ETag -> 304);
+#   - os ficheiros de texto ganham variantes .gz e .br (brotli, se instalado), escolhidas pelo
+#     Accept-Encoding do pedido;
+#   - static-manifest.json descreve tudo isto e é lido uma vez no arranque (load_manifest).
+# Se os ficheiros de origem não mudaram desde o último build (source_digest no manifesto), o
+# build existente é mantido e o arranque não paga a compressão outra vez.
+# Numa visita repetida o navegador só revalida o HTML; o resto vem da cache sem pedidos.
+#
+# O build corre no arranque do Gunicorn (gunicorn.conf.py) ou com: flask --app app build-assets
+# Sem build (desenvolvimento), app.py serve os ficheiros da raiz do projeto como antes.
+#
+# Variáveis de ambiente:
+#   STATIC_BUILD_DIR        pasta do build (por omissão static_build/ no projeto)
+#   STATIC_HTML_MAX_AGE     segundos de cache do HTML (por omissão 0: revalidar sempre)
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.environ.get('STATIC_BUILD_DIR', os.path.join(ROOT, 'static_build'))
+HTML_MAX_AGE = int(os.environ.get('STATIC_HTML_MAX_AGE', 0))
+MANIFEST_NAME = 'static-manifest.json'
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Ficheiros com nome fixo (o HTML e o manifest.json da PWA, referidos por URLs conhecidos)
+STABLE_NAMES = ('manifest.json',)
+SOURCE_EXTENSIONS = ('.html', '.css', '.js', '.png', '.svg', '.ico', '.webp', '.woff2')
+COMPRESSIBLE_EXTENSIONS = ('.html', '.css', '.js', '.json', '.svg')
+# Abaixo disto a compressão não compensa o cabeçalho extra
+MIN_COMPRESS_BYTES = 512
+
+# Referências entre aspas ou em url(...): "style.css", './icons/icon-192x192.png', url(x.png)
+_REFERENCE_RE = re.compile(r'''(["'(])(\./)?([\w./-]+)(["')])''')
+
+
+def _source_files(source_dir):
+    names = [name for name in sorted(os.listdir(source_dir))
+             if (name.endswith(SOURCE_EXTENSIONS) or name in STABLE_NAMES)
+             and os.path.isfile(os.path.join(source_dir, name))]
+    icons_dir = os.path.join(source_dir, 'icons')
+    if os.path.isdir(icons_dir):
+        names += [f'icons/{name}' for name in sorted(os.listdir(icons_dir)) if name.endswith(SOURCE_EXTENSIONS)]
+    return names
+
+
+def _is_fingerprinted(name):
+    return not name.endswith('.html') and name not in STABLE_NAMES
+
+
+def _fingerprinted_name(name, content):
+    base, extension = os.path.splitext(name)
+    return f'{base}.{hashlib.sha256(content).hexdigest()[:12]}{extension}'
+
+
+def _rewrite_references(content, renamed):
+    def replace(match):
+        opening, dot_slash, target, closing = match.groups()
+        if target not in renamed:
+            return match.group(0)
+        return f'{opening}{dot_slash or ""}{renamed[target]}{closing}'
+    return _REFERENCE_RE.sub(replace, content.decode()).encode()
+
+
+def _brotli():
+    # Só é importado quando há um build para fazer
+    try:
+        import brotli
+    except ImportError:  # dependência opcional
+        try:
+            import brotlicffi as brotli
+        except ImportError:
+            brotli = None
+    return brotli
+
+
+def _source_digest(contents):
+    digest = hashlib.sha256()
+    for name, content in sorted(contents.items()):
+        digest.update(name.encode() + b'\0' + hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def _write_variants(output_dir, name, content, brotli):
+    # Grava o ficheiro e as versões comprimidas que forem mais pequenas; devolve as codificações
+    path = os.path.join(output_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    encodings = []
+    if not name.endswith(COMPRESSIBLE_EXTENSIONS) or len(content) < MIN_COMPRESS_BYTES:
+        return encodings
+    variants = [('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    for encoding, suffix, compress in variants:
+        compressed = compress(content)
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build(source_dir=ROOT, output_dir=BUILD_DIR, force=False):
+    names = _source_files(source_dir)
+    contents = {}
+    for name in names:
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            contents[name] = f.read()
+
+    source_digest = _source_digest(contents)
+    current = load_manifest(output_dir)
+    if not force and current is not None and current.get('source_digest') == source_digest:
+        return current
+    brotli = _brotli()
+
+    # CSS primeiro: pode referir imagens, e o seu próprio hash tem de incluir essas referências
+    renamed = {}
+    ordered = sorted((name for name in names if _is_fingerprinted(name)), key=lambda name: name.endswith('.css'))
+    for name in ordered:
+        if name.endswith('.css'):
+            contents[name] = _rewrite_references(contents[name], renamed)
+        renamed[name] = _fingerprinted_name(name, contents[name])
+    for name in names:
+        if not _is_fingerprinted(name):
+            contents[name] = _rewrite_references(contents[name], renamed)
+
+    # Novo build numa pasta temporária, trocada no fim (os workers leem o manifesto completo)
+    staging_dir = output_dir + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    files = {}
+    for name in names:
+        served_name = renamed.get(name, name)
+        files[served_name] = {
+            'source': name,
+            'content_type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'immutable': name in renamed,
+            'encodings': _write_variants(staging_dir, served_name, contents[name], brotli),
+        }
+    manifest = {'files': files, 'aliases': renamed, 'source_digest': source_digest}
+    with open(os.path.join(staging_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(staging_dir, output_dir)
+    return manifest
+
+
+def load_manifest(output_dir=BUILD_DIR):
+    # None sem build: app.py serve então os ficheiros da raiz do projeto
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def resolve(manifest, path, accept_encodings):
+    # Devolve (ficheiro no build, entrada do manifesto, codificação, imutável) ou None.
+    # Pedidos pelo nome original (ex.: style.css de uma página antiga) recebem a versão atual,
+    # mas sem cache longa.
+    entry = manifest['files'].get(path)
+    immutable = entry is not None and entry['immutable']
+    if entry is None:
+        alias = manifest['aliases'].get(path)
+        if alias is None:
+            return None
+        path, entry = alias, manifest['files'][alias]
+    for encoding in entry['encodings']:
+        if accept_encodings[encoding]:
+            suffix = '.br' if encoding == 'br' else '.gz'
+            return path + suffix, entry, encoding, immutable
+    return path, entry, None, immutable
+
+
+def cache_control(immutable):
+    if immutable:
+        return IMMUTABLE_CACHE_CONTROL
+    return f'public, max-age={HTML_MAX_AGE}' if HTML_MAX_AGE else 'no-cache'
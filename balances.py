@@ -0,0 +1,140 @@
+# balances.py
+# Manutenção da tabela 'child_month_balance' (total pago e número de pagamentos por
+# filho e mês). As rotas de pagamentos chamam estas funções antes do commit, para que
+# a tabela seja atualizada na mesma transação que o pagamento.
+
+from sqlalchemy import extract, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Payment, ChildMonthBalance
+
+# Diferenças abaixo deste valor são tratadas como arredondamento de vírgula flutuante
+DRIFT_TOLERANCE = 0.005
+
+
+def _upsert(values):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        stmt = postgresql.insert(ChildMonthBalance)
+    elif dialect == 'sqlite':
+        stmt = sqlite.insert(ChildMonthBalance)
+    else:
+        raise RuntimeError(f"Banco de dados não suportado para child_month_balance: {dialect}")
+
+    stmt = stmt.values(**values)
+    # Incremento atómico no próprio UPDATE, sem ler a linha antes
+    return stmt.on_conflict_do_update(
+        index_elements=[ChildMonthBalance.child_id, ChildMonthBalance.year, ChildMonthBalance.month],
+        set_={
+            'total_paid': ChildMonthBalance.total_paid + stmt.excluded.total_paid,
+            'payment_count': ChildMonthBalance.payment_count + stmt.excluded.payment_count,
+        },
+    )
+
+
+def apply_delta(child_id, payment_date, amount_delta, count_delta):
+    if not amount_delta and not count_delta:
+        return
+    db.session.execute(_upsert({
+        'child_id': child_id,
+        'year': payment_date.year,
+        'month': payment_date.month,
+        'total_paid': amount_delta,
+        'payment_count': count_delta,
+    }))
+
+
+def record_payment_added(payment):
+    apply_delta(payment.child_id, payment.payment_date, payment.value_paid, 1)
+
+
+def record_payment_removed(payment):
+    apply_delta(payment.child_id, payment.payment_date, -payment.value_paid, -1)
+
+
+def record_payment_changed(child_id, old_date, old_value, new_date, new_value):
+    # Se a data mudou de mês, o pagamento sai do mês antigo e entra no novo
+    if (old_date.year, old_date.month) == (new_date.year, new_date.month):
+        apply_delta(child_id, new_date, new_value - old_value, 0)
+    else:
+        apply_delta(child_id, old_date, -old_value, -1)
+        apply_delta(child_id, new_date, new_value, 1)
+
+
+def paid_totals(child_ids, years):
+    # Devolve { (child_id, ano, mês): (total_pago, quantidade_de_pagamentos) }
+    if not child_ids or not years:
+        return {}
+    rows = db.session.execute(
+        db.select(
+            ChildMonthBalance.child_id,
+            ChildMonthBalance.year,
+            ChildMonthBalance.month,
+            ChildMonthBalance.total_paid,
+            ChildMonthBalance.payment_count,
+        ).where(
+            ChildMonthBalance.child_id.in_(child_ids),
+            ChildMonthBalance.year.in_(years),
+            ChildMonthBalance.payment_count > 0,
+        )
+    ).all()
+    return {
+        (child_id, year, month): (float(total or 0), int(count))
+        for child_id, year, month, total, count in rows
+    }
+
+
+def totals_from_payments_query():
+    year_col = extract('year', Payment.payment_date)
+    month_col = extract('month', Payment.payment_date)
+    return (
+        db.select(
+            Payment.child_id,
+            year_col,
+            month_col,
+            func.sum(Payment.value_paid),
+            func.count(Payment.id),
+        )
+        .group_by(Payment.child_id, year_col, month_col)
+    )
+
+
+def find_drift():
+    # Compara a tabela com os totais recalculados a partir de 'payments'
+    expected = {
+        (child_id, int(year), int(month)): (float(total or 0), int(count))
+        for child_id, year, month, total, count in db.session.execute(totals_from_payments_query())
+    }
+    stored = {
+        (row.child_id, row.year, row.month): (float(row.total_paid or 0), int(row.payment_count))
+        for row in ChildMonthBalance.query.all()
+    }
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        expected_total, expected_count = expected.get(key, (0.0, 0))
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        if expected_count != stored_count or abs(expected_total - stored_total) > DRIFT_TOLERANCE:
+            child_id, year, month = key
+            drift.append({
+                'child_id': child_id,
+                'year': year,
+                'month': month,
+                'expected_total_paid': round(expected_total, 2),
+                'stored_total_paid': round(stored_total, 2),
+                'expected_payment_count': expected_count,
+                'stored_payment_count': stored_count,
+            })
+    return drift
+
+
+def rebuild():
+    # Recria a tabela inteira a partir de 'payments' numa única transação
+    db.session.execute(db.delete(ChildMonthBalance))
+    db.session.execute(
+        db.insert(ChildMonthBalance).from_select(
+            ['child_id', 'year', 'month', 'total_paid', 'payment_count'],
+            totals_from_payments_query(),
+        )
+    )
+    db.session.commit()
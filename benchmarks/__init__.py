@@ -0,0 +1,16 @@
+# benchmarks
+# Ferramentas de medição de desempenho da API.
+#
+#   python -m benchmarks.seed --database-url ... --users 1000 --children 2 --years 5
+#       gera uma população sintética num banco vazio (SQLite ou PostgreSQL local)
+#   python -m benchmarks.run inprocess [--iterations 200] [--save baseline.json]
+#       chama todas as rotas da API através do cliente de testes do Flask
+#   python -m benchmarks.run http --url http://127.0.0.1:8000 [--concurrency 16 --duration 30]
+#       carga concorrente sobre um servidor a correr (ex.: gunicorn) já populado com seed
+#   python -m benchmarks.passwords [--methods scrypt:16384:8:1,scrypt:32768:8:1] [--workers 2]
+#       débito de logins com cada custo de hash de palavras-passe
+#   python -m benchmarks.startup [--runs 10] [--modes off,sync] [--save startup.json]
+#       tempo de um processo novo até à primeira resposta, com e sem aquecimento (APP_WARMUP)
+#
+# Cada execução mostra p50/p95/p99, pedidos por segundo e consultas SQL por pedido, e pode
+# ser gravada em JSON (--save) e comparada com uma execução anterior (--baseline).
@@ -0,0 +1,133 @@
+# benchmarks/passwords.py
+# Débito de POST /api/login com cada custo de hash de palavras-passe (ver passwords.py).
+#
+# Para cada método, vários clientes fazem login em simultâneo (threads, como os pedidos de um
+# worker gthread) durante --duration segundos, enquanto outro cliente pede GET /api/children
+# sem parar; a latência desse pedido mostra se os logins atrasam os restantes pedidos.
+#
+# Uso: python -m benchmarks.passwords [--methods scrypt:16384:8:1,scrypt:32768:8:1]
+#                                     [--workers 2] [--concurrency 4] [--duration 10]
+#      --workers 0 calcula os hashes nas threads dos pedidos, sem o pool de processos.
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks import report
+
+DEFAULT_METHODS = 'pbkdf2:sha256:600000,scrypt:16384:8:1,scrypt:32768:8:1,scrypt:65536:8:1'
+PASSWORD = 'senha-de-teste'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Débito de logins por custo de hash.')
+    parser.add_argument('--methods', default=DEFAULT_METHODS,
+                        help='Métodos separados por vírgulas, no formato do werkzeug.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processos do pool de hash (por omissão PASSWORD_HASH_WORKERS).')
+    parser.add_argument('--concurrency', type=int, default=4, help='Clientes a fazer login em simultâneo.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de carga por método.')
+    return parser.parse_args(argv)
+
+
+def run_method(app, db, method, concurrency, duration):
+    import passwords
+    from models import User
+
+    passwords.HASH_METHOD = method
+    passwords._current_method.cache_clear()
+
+    with app.app_context():
+        started = time.perf_counter()
+        password_hash = passwords.hash_password(PASSWORD)
+        hash_seconds = time.perf_counter() - started
+        emails = [f'login-{method}-{n}@exemplo.com' for n in range(concurrency + 1)]
+        db.session.execute(db.insert(User), [
+            {'name': 'Benchmark', 'surname': 'Login', 'email': email, 'password_hash': password_hash}
+            for email in emails
+        ])
+        db.session.commit()
+
+    probe = app.test_client()
+    probe.post('/api/login', json={'email': emails[-1], 'password': PASSWORD})
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    login_latencies, probe_latencies = [], []
+    errors = [0]
+
+    def login_loop(email):
+        client = app.test_client()
+        while not stop.is_set():
+            started = time.perf_counter()
+            status = client.post('/api/login', json={'email': email, 'password': PASSWORD}).status_code
+            elapsed = time.perf_counter() - started
+            with lock:
+                if status == 200:
+                    login_latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    def probe_loop():
+        while not stop.is_set():
+            started = time.perf_counter()
+            probe.get('/api/children').get_data()
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=login_loop, args=(email,)) for email in emails[:-1]]
+    threads.append(threading.Thread(target=probe_loop))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'hash_ms': round(hash_seconds * 1000, 1),
+        'login': report.summarize(login_latencies, elapsed, errors=errors[0]),
+        'other_route': report.summarize(probe_latencies, elapsed),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'passwords.db')
+    # Os logins são lentos de propósito: sem os avisos de 'Pedido lento'
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+    # Os logins repetidos do mesmo IP não podem ser travados pelo limite de tentativas
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    if args.workers is not None:
+        os.environ['PASSWORD_HASH_WORKERS'] = str(args.workers)
+
+    from app import create_app
+    from models import db
+    import migrations
+    import passwords
+
+    app = create_app()
+
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+
+    pool = f'{passwords.HASH_WORKERS} processo(s)' if passwords.HASH_WORKERS > 0 else 'desativado'
+    print(f"Pool de hash: {pool}, "
+          f"{args.concurrency} clientes em simultâneo, {args.duration:.0f} s por método")
+    print(f"{'método':<24}{'hash ms':>9}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'erros':>7}"
+          f"{'outra rota p95 ms':>19}")
+    for method in [m.strip() for m in args.methods.split(',') if m.strip()]:
+        result = run_method(app, db, method, args.concurrency, args.duration)
+        login = result['login']
+        print(f"{method:<24}{result['hash_ms']:>9.1f}{login['rps']:>10.1f}{login['p50_ms']:>9.1f}"
+              f"{login['p95_ms']:>9.1f}{login['errors']:>7}{result['other_route']['p95_ms']:>19.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
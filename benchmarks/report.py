@@ -0,0 +1,109 @@
+# benchmarks/report.py
+# Estatísticas, gravação em JSON e comparação entre execuções dos benchmarks.
+
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, UTC
+
+
+def percentile(sorted_values, fraction):
+    # Interpolação linear entre as duas posições mais próximas (como numpy.percentile)
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, elapsed, queries=None, errors=0):
+    # latencies em segundos; elapsed é o tempo de relógio em que os pedidos foram feitos
+    values = sorted(latencies)
+    summary = {
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'rps': round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    if queries is not None:
+        summary['queries_per_request'] = round(queries, 2)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def build_document(mode, settings, results):
+    return {
+        'mode': mode,
+        'created_at': datetime.now(UTC).isoformat(),
+        'git_commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'settings': settings,
+        'results': results,
+    }
+
+
+def save(document, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_table(results):
+    print(f"{'rota':<52} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'pedidos/s':>10} {'SQL/pedido':>10}")
+    for label, summary in results.items():
+        queries = summary.get('queries_per_request')
+        print(
+            f"{label:<52} {summary['requests']:>6} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} "
+            f"{summary['p99_ms']:>9.2f} {summary['rps']:>10.1f} {'-' if queries is None else f'{queries:.1f}':>10}"
+            + (f"  ({summary['errors']} erros)" if summary['errors'] else '')
+        )
+
+
+def compare(document, baseline, max_regression=None):
+    # Mostra a variação de cada rota em relação à execução de referência. Devolve as rotas
+    # cujo p95 piorou mais do que max_regression (%) ou que passaram a fazer mais consultas.
+    regressions = []
+    print(f"\nComparação com {baseline.get('git_commit') or '?'} ({baseline.get('created_at')}):")
+    for label, summary in document['results'].items():
+        previous = baseline.get('results', {}).get(label)
+        if previous is None:
+            print(f"  {label}: sem referência")
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'rps'):
+            if previous.get(key):
+                changes.append(f"{key} {(summary[key] - previous[key]) / previous[key] * 100:+.1f}%")
+        queries, previous_queries = summary.get('queries_per_request'), previous.get('queries_per_request')
+        if queries is not None and previous_queries is not None and queries != previous_queries:
+            changes.append(f"SQL/pedido {previous_queries:g} -> {queries:g}")
+            if queries > previous_queries:
+                regressions.append(label)
+        print(f"  {label}: {', '.join(changes)}")
+        if (max_regression is not None and previous.get('p95_ms')
+                and (summary['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100 > max_regression
+                and label not in regressions):
+            regressions.append(label)
+    return regressions
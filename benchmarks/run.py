@@ -0,0 +1,298 @@
+# benchmarks/run.py
+# Executa os benchmarks da API.
+#
+#   python -m benchmarks.run inprocess [--database-url URL] [--users 200 --children 3 --years 5]
+#                                      [--iterations 200] [--warmup 20] [--routes texto]
+#       Sem --database-url usa um SQLite temporário, populado de novo a cada execução (resultados
+#       reproduzíveis). Com --database-url, a população só é gerada se o banco estiver vazio.
+#       As consultas por pedido são contadas pelos eventos do SQLAlchemy.
+#
+#   python -m benchmarks.run http --url http://127.0.0.1:8000 [--concurrency 16] [--duration 30]
+#       Carga concorrente sobre um servidor já a correr e populado com benchmarks.seed (os
+#       clientes iniciam sessão como utilizador0..N). As consultas por pedido vêm de /metrics,
+#       somadas por todos os workers do Gunicorn: inicie o servidor e o benchmark com o mesmo
+#       METRICS_TOKEN (sem ele o servidor não expõe /metrics).
+#       Inicie o servidor com RATE_LIMIT_ENABLED=0: todos os clientes fazem login do mesmo IP.
+#
+# Em ambos os modos: --save ficheiro.json grava o resultado e --baseline ficheiro.json compara
+# com uma execução anterior (--max-regression 20 termina com erro se o p95 de uma rota piorar
+# mais de 20% ou se passar a fazer mais consultas).
+
+import argparse
+import http.client
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import report
+from benchmarks.scenarios import SCENARIOS, HTTP_SCENARIOS, Context
+from benchmarks.seed import PASSWORD, seed, user_email
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks da API Pensão em Dia.')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    inprocess = subparsers.add_parser('inprocess', help='Todas as rotas através do cliente de testes do Flask.')
+    inprocess.add_argument('--database-url')
+    inprocess.add_argument('--users', type=int, default=200)
+    inprocess.add_argument('--children', type=int, default=3, help='Filhos por utilizador.')
+    inprocess.add_argument('--years', type=int, default=5, help='Anos de pagamentos por filho.')
+    inprocess.add_argument('--payments-per-month', type=int, default=1)
+    inprocess.add_argument('--iterations', type=int, default=200)
+    inprocess.add_argument('--warmup', type=int, default=20)
+    inprocess.add_argument('--routes', help='Mede apenas as rotas cujo rótulo contém este texto.')
+
+    load = subparsers.add_parser('http', help='Carga concorrente sobre um servidor HTTP.')
+    load.add_argument('--url', required=True)
+    load.add_argument('--concurrency', type=int, default=16)
+    load.add_argument('--duration', type=float, default=30.0, help='Segundos de carga.')
+    load.add_argument('--users', type=int, default=None,
+                      help='Utilizadores do seed usados pelos clientes (por omissão, um por cliente).')
+    load.add_argument('--routes', help='Usa apenas as rotas cujo rótulo contém este texto.')
+
+    for subparser in (inprocess, load):
+        subparser.add_argument('--save', help='Grava o resultado neste ficheiro JSON.')
+        subparser.add_argument('--baseline', help='Compara com um resultado gravado anteriormente.')
+        subparser.add_argument('--max-regression', type=float, default=None,
+                               help='Percentagem máxima de aumento do p95 aceite em relação à referência.')
+    return parser.parse_args(argv)
+
+
+# --- MODO INPROCESS ---
+
+def run_inprocess(args):
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Os logins repetidos do mesmo IP não podem ser travados pelo limite de tentativas
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    # O cenário GET /metrics envia este token (ver scenarios.py)
+    os.environ.setdefault('METRICS_TOKEN', 'benchmark')
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import create_app, encode_payments_cursor
+    from models import db, User, Child, Payment
+    import migrations
+
+    app = create_app()
+
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+        if db.session.execute(db.select(db.func.count(User.id))).scalar() == 0:
+            seed(db, args.users, args.children, args.years, args.payments_per_month)
+        # Utilizador com dados típicos: o primeiro da população gerada
+        email = user_email(0)
+        user_id = db.session.execute(db.select(User.id).where(User.email == email)).scalar()
+        child_id = db.session.execute(
+            db.select(Child.id).where(Child.user_id == user_id).order_by(Child.id).limit(1)
+        ).scalar()
+        payments = Payment.query.filter_by(child_id=child_id).order_by(Payment.payment_date, Payment.id)
+        payment_id = payments.first().id
+        first_page_cursor = encode_payments_cursor(payments.offset(4).first())
+        db.session.remove()
+
+    client = app.test_client()
+    ctx = Context(app, client, run_id=str(int(time.time())), user_email=email, child_id=child_id,
+                  payment_id=payment_id, first_page_cursor=first_page_cursor)
+
+    counter = {'active': False, 'queries': 0}
+
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if counter['active']:
+            counter['queries'] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count_query)
+    results = {}
+    try:
+        for label, build_request in SCENARIOS:
+            if args.routes and args.routes not in label:
+                continue
+            ctx.login()
+            latencies = []
+            errors = 0
+            counter['queries'] = 0
+            elapsed = 0.0
+            for i in range(args.warmup + args.iterations):
+                method, url, kwargs = build_request(ctx, i)
+                measured = i >= args.warmup
+                counter['active'] = measured
+                started = time.perf_counter()
+                response = client.open(url, method=method, **kwargs)
+                response.get_data()
+                response.close()
+                duration = time.perf_counter() - started
+                counter['active'] = False
+                if not measured:
+                    continue
+                latencies.append(duration)
+                elapsed += duration
+                if response.status_code >= 400:
+                    errors += 1
+            results[label] = report.summarize(
+                latencies, elapsed, queries=counter['queries'] / max(len(latencies), 1), errors=errors,
+            )
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count_query)
+
+    settings = {
+        'database': database_url.split(':')[0],
+        'users': args.users, 'children_per_user': args.children, 'years': args.years,
+        'payments_per_month': args.payments_per_month,
+        'iterations': args.iterations, 'warmup': args.warmup,
+    }
+    return settings, results
+
+
+# --- MODO HTTP ---
+
+class HttpSession:
+    # Uma ligação keep-alive por cliente, com o cookie de sessão guardado manualmente
+    # (o cookie é 'Secure', e o http.cookiejar não o devolveria num servidor local sem HTTPS)
+    def __init__(self, base_url, email):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=60)
+        self.prefix = parts.path.rstrip('/')
+        self.cookie = None
+        self.email = email
+        self.child_id = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Ligação fechada pelo servidor: tenta de novo com uma ligação nova
+            self.connection.close()
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        set_cookie = response.getheader('Set-Cookie')
+        if set_cookie:
+            self.cookie = set_cookie.split(';', 1)[0]
+        return response.status, data
+
+    def login(self):
+        status, _ = self.request('POST', '/api/login', {'email': self.email, 'password': PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"Login de {self.email} falhou ({status}). O servidor foi populado com benchmarks.seed?")
+        status, data = self.request('GET', '/api/children')
+        children = json.loads(data) if status == 200 else []
+        if not children:
+            raise RuntimeError(f"{self.email} não tem filhos registados.")
+        self.child_id = children[0]['id']
+
+
+_SAMPLE_RE = re.compile(r'^(http_request_sql_statements)_(sum|count)\{method="([^"]*)",route="([^"]*)"\} (\S+)$')
+
+
+def scrape_sql_statements(session):
+    # Devolve { (método, rota): [soma, contagem] } a partir de /metrics
+    headers = {}
+    if os.environ.get('METRICS_TOKEN'):
+        headers['Authorization'] = f"Bearer {os.environ['METRICS_TOKEN']}"
+    status, data = session.request('GET', '/metrics', headers=headers)
+    samples = {}
+    if status != 200:
+        return samples
+    for line in data.decode().splitlines():
+        match = _SAMPLE_RE.match(line)
+        if match:
+            _, kind, method, route, value = match.groups()
+            samples.setdefault((method, route), [0.0, 0.0])[0 if kind == 'sum' else 1] = float(value)
+    return samples
+
+
+def run_http(args):
+    scenarios = [scenario for scenario in HTTP_SCENARIOS if not args.routes or args.routes in scenario[0]]
+    users = args.users or args.concurrency
+    sessions = [HttpSession(args.url, user_email(i % users)) for i in range(args.concurrency)]
+    for session in sessions:
+        session.login()
+
+    monitor = HttpSession(args.url, None)
+    before = scrape_sql_statements(monitor)
+
+    lock = threading.Lock()
+    latencies = {label: [] for label, *_ in scenarios}
+    errors = {label: 0 for label, *_ in scenarios}
+    deadline = time.perf_counter() + args.duration
+
+    def worker(number, session):
+        n = number
+        while time.perf_counter() < deadline:
+            label, _, method, path, body = scenarios[n % len(scenarios)]
+            n += 1
+            started = time.perf_counter()
+            try:
+                status, _ = session.request(method, path.format(child_id=session.child_id),
+                                            body(session) if body else None)
+            except (http.client.HTTPException, OSError):
+                status = 599
+            duration = time.perf_counter() - started
+            with lock:
+                latencies[label].append(duration)
+                if status >= 400:
+                    errors[label] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number, session)) for number, session in enumerate(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    after = scrape_sql_statements(monitor)
+    results = {}
+    for label, rule, method, _, _ in scenarios:
+        queries = None
+        total_before = before.get((method, rule), [0.0, 0.0])
+        total_after = after.get((method, rule))
+        if total_after and total_after[1] > total_before[1]:
+            queries = (total_after[0] - total_before[0]) / (total_after[1] - total_before[1])
+        results[label] = report.summarize(latencies[label], elapsed, queries=queries, errors=errors[label])
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    results['total'] = report.summarize(all_latencies, elapsed, errors=sum(errors.values()))
+
+    settings = {'url': args.url, 'concurrency': args.concurrency, 'duration': args.duration, 'users': users}
+    return settings, results
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == 'inprocess':
+        settings, results = run_inprocess(args)
+    else:
+        settings, results = run_http(args)
+
+    document = report.build_document(args.mode, settings, results)
+    report.print_table(results)
+    if args.save:
+        report.save(document, args.save)
+        print(f"\nResultado gravado em {args.save}")
+
+    if args.baseline:
+        regressions = report.compare(document, report.load(args.baseline), args.max_regression)
+        if regressions and args.max_regression is not None:
+            print(f"\nRegressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
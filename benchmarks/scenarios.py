@@ -0,0 +1,127 @@
+# benchmarks/scenarios.py
+# Pedidos feitos pelos benchmarks, um cenário por rota da API.
+#
+# Cada cenário recebe o contexto da execução e o número da iteração e devolve o pedido a
+# medir: (método, url, argumentos para o cliente). Trabalho de preparação (ex.: criar o
+# pagamento que vai ser apagado) é feito dentro da função e não entra na medição.
+# Os cenários de leitura vêm primeiro e os que apagam dados no fim, para que as leituras
+# meçam sempre a população gerada pelo seed.
+
+import os
+from datetime import date, datetime, timedelta, UTC
+
+from benchmarks.seed import PASSWORD
+
+
+class Context:
+    def __init__(self, app, client, run_id, user_email, child_id, payment_id, first_page_cursor):
+        self.app = app
+        self.client = client
+        self.run_id = run_id
+        self.user_email = user_email
+        self.child_id = child_id
+        self.payment_id = payment_id
+        self.first_page_cursor = first_page_cursor
+        self.today = date.today()
+
+    def login(self):
+        self.client.post('/api/login', json={'email': self.user_email, 'password': PASSWORD})
+
+    def create_child(self, i):
+        response = self.client.post('/api/children', json={
+            'full_name': f'Filho benchmark {self.run_id}-{i}', 'gender': 'Feminino',
+            'date_of_birth': '2015-01-01', 'monthly_alimony_value': 500,
+            'enabled_years': [self.today.year],
+        })
+        return response.get_json()['child']['id']
+
+    def create_payment(self):
+        response = self.client.post('/api/payments', json={
+            'child_id': self.child_id, 'amount': 10, 'payment_date': self.today.isoformat(),
+        })
+        return response.get_json()['payment']['id']
+
+    def create_reset_token(self, i):
+        from models import db, PasswordResetToken, User
+        token = f'benchmark-{self.run_id}-{i}'
+        with self.app.app_context():
+            user_id = db.session.execute(db.select(User.id).where(User.email == self.user_email)).scalar()
+            db.session.add(PasswordResetToken(user_id=user_id, token=token,
+                                              expires_at=datetime.now(UTC) + timedelta(hours=1)))
+            db.session.commit()
+        return token
+
+
+def _import_body(ctx, rows=50):
+    lines = ['child_id,amount,payment_date']
+    lines += [f'{ctx.child_id},1,{ctx.today.isoformat()}'] * rows
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _logout(ctx, i):
+    # Cada iteração precisa de uma sessão iniciada para terminar
+    ctx.login()
+    return 'POST', '/api/logout', {}
+
+
+SCENARIOS = [
+    ('GET /api/dashboard', lambda ctx, i: ('GET', '/api/dashboard', {})),
+    ('GET /api/dashboard?year=', lambda ctx, i: ('GET', f'/api/dashboard?year={ctx.today.year}', {})),
+    ('GET /api/children', lambda ctx, i: ('GET', '/api/children', {})),
+    ('GET /api/children/<id>', lambda ctx, i: ('GET', f'/api/children/{ctx.child_id}', {})),
+    ('GET /api/children/<id>/ledger', lambda ctx, i: ('GET', f'/api/children/{ctx.child_id}/ledger', {})),
+    ('GET /api/payments/<child_id>', lambda ctx, i: ('GET', f'/api/payments/{ctx.child_id}', {})),
+    ('GET /api/payments/<child_id>?year=&month=', lambda ctx, i: (
+        'GET', f'/api/payments/{ctx.child_id}?year={ctx.today.year}&month=1', {})),
+    ('GET /api/payments/<child_id>?limit=&cursor=', lambda ctx, i: (
+        'GET', f'/api/payments/{ctx.child_id}?limit=5&cursor={ctx.first_page_cursor}', {})),
+    ('GET /api/payments/export', lambda ctx, i: ('GET', '/api/payments/export?format=ndjson', {})),
+    ('GET /api/children/<id>/payments/export', lambda ctx, i: (
+        'GET', f'/api/children/{ctx.child_id}/payments/export', {})),
+    ('GET /api/sync', lambda ctx, i: ('GET', '/api/sync', {})),
+    ('GET /api/sync?since=', lambda ctx, i: ('GET', '/api/sync?since=1', {})),
+    ('GET /metrics', lambda ctx, i: (
+        'GET', '/metrics', {'headers': {'Authorization': f"Bearer {os.environ.get('METRICS_TOKEN', '')}"}})),
+    ('POST /api/login', lambda ctx, i: (
+        'POST', '/api/login', {'json': {'email': ctx.user_email, 'password': PASSWORD}})),
+    ('POST /api/register', lambda ctx, i: ('POST', '/api/register', {'json': {
+        'name': 'Benchmark', 'surname': 'Teste', 'email': f'benchmark-{ctx.run_id}-{i}@exemplo.com',
+        'password': PASSWORD}})),
+    ('POST /api/forgot-password', lambda ctx, i: (
+        'POST', '/api/forgot-password', {'json': {'email': ctx.user_email}})),
+    ('POST /api/reset-password', lambda ctx, i: ('POST', '/api/reset-password', {'json': {
+        'token': ctx.create_reset_token(i), 'new_password': PASSWORD, 'confirm_password': PASSWORD}})),
+    ('POST /api/children', lambda ctx, i: ('POST', '/api/children', {'json': {
+        'full_name': f'Filho novo {i}', 'gender': 'Masculino', 'date_of_birth': '2016-05-01',
+        'monthly_alimony_value': 400, 'enabled_years': [ctx.today.year]}})),
+    ('PUT /api/children/<id>', lambda ctx, i: (
+        'PUT', f'/api/children/{ctx.child_id}', {'json': {'full_name': f'Nome alterado {i}'}})),
+    ('POST /api/payments', lambda ctx, i: ('POST', '/api/payments', {'json': {
+        'child_id': ctx.child_id, 'amount': 100, 'payment_date': ctx.today.isoformat()}})),
+    ('PUT /api/payments/<id>', lambda ctx, i: ('PUT', f'/api/payments/{ctx.payment_id}', {'json': {
+        'amount': 300 + i % 100, 'payment_date': ctx.today.isoformat()}})),
+    ('POST /api/payments/import', lambda ctx, i: (
+        'POST', '/api/payments/import', {'data': _import_body(ctx), 'content_type': 'text/csv'})),
+    ('POST /api/sync', lambda ctx, i: ('POST', '/api/sync', {'json': {'mutations': [
+        {'idempotency_key': f'benchmark-{ctx.run_id}-{i}', 'type': 'add_payment',
+         'payload': {'child_id': ctx.child_id, 'amount': 10, 'payment_date': ctx.today.isoformat()}},
+    ]}})),
+    ('DELETE /api/payments/<id>', lambda ctx, i: ('DELETE', f'/api/payments/{ctx.create_payment()}', {})),
+    ('DELETE /api/children/<id>', lambda ctx, i: ('DELETE', f'/api/children/{ctx.create_child(i)}', {})),
+    ('POST /api/logout', _logout),
+]
+
+# Modo HTTP: mistura de leituras e escritas feita por cada cliente concorrente.
+# (rótulo, regra da rota em /metrics, método, caminho, corpo JSON a partir da sessão do cliente)
+HTTP_SCENARIOS = [
+    ('GET /api/dashboard', '/api/dashboard', 'GET', '/api/dashboard', None),
+    ('GET /api/children', '/api/children', 'GET', '/api/children', None),
+    ('GET /api/children/<id>/ledger', '/api/children/<int:child_id>/ledger', 'GET',
+     '/api/children/{child_id}/ledger', None),
+    ('GET /api/payments/<child_id>', '/api/payments/<int:child_id>', 'GET', '/api/payments/{child_id}', None),
+    ('GET /api/sync', '/api/sync', 'GET', '/api/sync', None),
+    ('POST /api/payments', '/api/payments', 'POST', '/api/payments',
+     lambda session: {'child_id': session.child_id, 'amount': 10, 'payment_date': date.today().isoformat()}),
+    ('POST /api/login', '/api/login', 'POST', '/api/login',
+     lambda session: {'email': session.email, 'password': PASSWORD}),
+]
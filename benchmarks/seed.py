@@ -0,0 +1,119 @@
+# benchmarks/seed.py
+# Gerador de dados sintéticos: utilizadores, filhos por utilizador e anos de pagamentos.
+# Os utilizadores são 'utilizador<N>@exemplo.com' com a palavra-passe PASSWORD, para que os
+# benchmarks (e o query_plans.py) possam iniciar sessão com qualquer um deles.
+#
+# Uso: python -m benchmarks.seed --database-url sqlite:////tmp/bench.db --users 1000
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, UTC
+
+PASSWORD = 'senha-de-teste'
+INSERT_CHUNK = 10000
+
+
+def user_email(index):
+    return f'utilizador{index}@exemplo.com'
+
+
+def seed(db, users, children_per_user, years, payments_per_month=1):
+    from models import User, Child, Payment, PasswordResetToken
+    import balances
+
+    password_owner = User()
+    password_owner.set_password(PASSWORD)
+    password_hash = password_owner.password_hash
+
+    today = date.today()
+    first_year = today.year - years + 1
+    now = datetime.now(UTC)
+    first_index = db.session.execute(db.select(db.func.count(User.id))).scalar()
+
+    db.session.execute(db.insert(User), [
+        {'name': f'Utilizador {i}', 'surname': 'Teste', 'email': user_email(i),
+         'password_hash': password_hash, 'created_at': now}
+        for i in range(first_index, first_index + users)
+    ])
+    user_ids = [row.id for row in db.session.execute(
+        db.select(User.id).order_by(User.id.desc()).limit(users)
+    )]
+    user_ids.reverse()
+
+    children = [
+        {'user_id': user_id, 'full_name': f'Filho {n} de {user_id}', 'gender': 'Feminino',
+         'date_of_birth': date(2015, 1, 1), 'monthly_alimony_value': 500.0,
+         'enabled_years': list(range(first_year, today.year + 1))}
+        for user_id in user_ids for n in range(children_per_user)
+    ]
+    for start in range(0, len(children), INSERT_CHUNK):
+        db.session.execute(db.insert(Child), children[start:start + INSERT_CHUNK])
+    child_ids = [row.id for row in db.session.execute(
+        db.select(Child.id).where(Child.user_id >= user_ids[0]).order_by(Child.id)
+    )]
+
+    payments = []
+    for child_id in child_ids:
+        for year in range(first_year, today.year + 1):
+            for month in range(1, 13):
+                if date(year, month, 1) > today:
+                    break
+                for n in range(payments_per_month):
+                    payment_date = date(year, month, min(5 + n, 28))
+                    if payment_date > today:
+                        break
+                    payments.append({'child_id': child_id,
+                                     'value_paid': (250.0 if month % 4 == 0 else 500.0) / payments_per_month,
+                                     'payment_date': payment_date, 'month_reference': month,
+                                     'year_reference': year, 'created_at': now})
+        if len(payments) >= INSERT_CHUNK:
+            db.session.execute(db.insert(Payment), payments)
+            payments = []
+    if payments:
+        db.session.execute(db.insert(Payment), payments)
+
+    db.session.execute(db.insert(PasswordResetToken), [
+        {'user_id': user_id, 'token': f'token-{user_id}', 'expires_at': now + timedelta(hours=1),
+         'used': False, 'created_at': now}
+        for user_id in user_ids
+    ])
+    db.session.commit()
+    # Os pagamentos foram inseridos diretamente: os totais mensais são recalculados de uma vez
+    balances.rebuild()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Gera dados sintéticos para os benchmarks.')
+    parser.add_argument('--database-url', help='Banco de dados (por omissão: DATABASE_URL).')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--children', type=int, default=2, help='Filhos por utilizador.')
+    parser.add_argument('--years', type=int, default=5, help='Anos de pagamentos por filho.')
+    parser.add_argument('--payments-per-month', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from app import create_app
+    from models import db
+    import migrations
+
+    app = create_app()
+
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+        started = time.perf_counter()
+        seed(db, args.users, args.children, args.years, args.payments_per_month)
+        print(f"{args.users} utilizadores, {args.users * args.children} filhos e {args.years} ano(s) de "
+              f"pagamentos gerados em {time.perf_counter() - started:.1f}s.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
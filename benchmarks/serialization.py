@@ -0,0 +1,119 @@
+# benchmarks/serialization.py
+# Compara a listagem de pagamentos (e de filhos) com objetos do ORM + to_dict() + provider
+# JSON padrão do Flask com o caminho atual: colunas lidas como tuplos + row_to_dict() +
+# json_provider.FastJSONProvider. Verifica também que as duas respostas são idênticas byte a byte.
+#
+# Uso: python -m benchmarks.serialization [--payments 20000] [--children 2000] [--repeat 20]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, UTC
+
+# Nomes com e sem acentos: o texto não-ASCII segue outro caminho no json_provider
+CHILD_NAMES = ('Filho', 'João Conceição', 'Inês Gonçalves Araújo')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark da serialização das listagens.')
+    parser.add_argument('--payments', type=int, default=20000, help='Pagamentos do filho listado.')
+    parser.add_argument('--children', type=int, default=2000, help='Filhos do utilizador listado.')
+    parser.add_argument('--repeat', type=int, default=20)
+    return parser.parse_args(argv)
+
+
+def best_of(repeat, function):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), sorted(timings)[len(timings) // 2], result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'serialization.db')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from models import db, User, Child, Payment
+    import json_provider
+    import migrations
+
+    app = create_app()
+
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = json_provider.FastJSONProvider(app)
+    print(f"orjson: {'sim' if json_provider.orjson is not None else 'não instalado (json padrão)'}")
+
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+        db.session.execute(db.insert(User), [{'name': 'Benchmark', 'surname': 'Teste',
+                                              'email': 'serializacao@exemplo.com', 'password_hash': 'x'}])
+        user_id = db.session.execute(db.select(User.id)).scalar()
+        db.session.execute(db.insert(Child), [
+            {'user_id': user_id, 'full_name': f'{CHILD_NAMES[n % len(CHILD_NAMES)]} {n}', 'gender': 'Feminino',
+             'date_of_birth': date(2015, 1, 1), 'monthly_alimony_value': 500.0,
+             'enabled_years': [2023, 2024, 2025]}
+            for n in range(args.children)
+        ])
+        child_id = db.session.execute(db.select(Child.id).order_by(Child.id)).scalar()
+        start = date(2000, 1, 1)
+        now = datetime.now(UTC)
+        db.session.execute(db.insert(Payment), [
+            {'child_id': child_id, 'value_paid': 500.0 + n % 7 * 0.25, 'payment_date': start + timedelta(days=n % 9000),
+             'month_reference': n % 12 + 1 if n % 3 else None, 'year_reference': 2000 + n % 25 if n % 3 else None,
+             'created_at': now}
+            for n in range(args.payments)
+        ])
+        db.session.commit()
+
+        order = (Payment.payment_date, Payment.id)
+        cases = [
+            (f'pagamentos ({args.payments})',
+             lambda: default_provider.response(
+                 [p.to_dict() for p in Payment.query.filter_by(child_id=child_id).order_by(*order).all()]
+             ).get_data(),
+             lambda: fast_provider.response(
+                 [Payment.row_to_dict(row) for row in db.session.execute(
+                     db.select(*Payment.list_columns()).where(Payment.child_id == child_id).order_by(*order))]
+             ).get_data()),
+            (f'filhos ({args.children})',
+             lambda: default_provider.response(
+                 [c.to_dict() for c in Child.query.filter_by(user_id=user_id).order_by(Child.id).all()]
+             ).get_data(),
+             lambda: fast_provider.response(
+                 [Child.row_to_dict(row) for row in db.session.execute(
+                     db.select(*Child.list_columns()).where(Child.user_id == user_id).order_by(Child.id))]
+             ).get_data()),
+        ]
+
+        failed = False
+        for label, orm_path, lean_path in cases:
+            # Sessão limpa a cada repetição, como num pedido novo
+            def run(function):
+                def measured():
+                    try:
+                        return function()
+                    finally:
+                        db.session.remove()
+                return measured
+
+            orm_best, orm_median, orm_body = best_of(args.repeat, run(orm_path))
+            lean_best, lean_median, lean_body = best_of(args.repeat, run(lean_path))
+            identical = orm_body == lean_body
+            failed = failed or not identical
+            print(f"{label}: ORM + to_dict {orm_median * 1000:.1f} ms (melhor {orm_best * 1000:.1f}), "
+                  f"tuplos + FastJSONProvider {lean_median * 1000:.1f} ms (melhor {lean_best * 1000:.1f}), "
+                  f"{orm_median / lean_median:.1f}x mais rápido, "
+                  f"respostas {'idênticas' if identical else 'DIFERENTES'} ({len(lean_body)} bytes)")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# benchmarks/startup.py
+# Tempo de arranque de um processo novo da aplicação, até à primeira resposta.
+#
+# Cada amostra é um processo Python novo (como um worker do Gunicorn acabado de criar) que
+# mede o import de app.py, create_app() e os dois primeiros GET /api/children com sessão
+# iniciada; o processo pai mede também o tempo total, incluindo o arranque do interpretador.
+# Cada modo de APP_WARMUP (ver warmup.py) é medido em separado: com 'sync' o custo passa do
+# primeiro pedido para create_app().
+#
+# Uso: python -m benchmarks.startup [--database-url URL] [--runs 10] [--modes off,sync]
+#                                   [--save startup.json] [--baseline startup.json --max-regression 20]
+#      Sem --database-url usa um SQLite temporário com uma população pequena (benchmarks.seed).
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import report
+from benchmarks.seed import seed, user_email
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('import', 'create_app', 'primeiro pedido', 'segundo pedido', 'processo')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo de arranque até à primeira resposta.')
+    parser.add_argument('--database-url')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=10, help='Processos medidos por modo.')
+    parser.add_argument('--modes', default='off,sync', help='Valores de APP_WARMUP, separados por vírgulas.')
+    parser.add_argument('--save', help='Grava o resultado neste ficheiro JSON.')
+    parser.add_argument('--baseline', help='Compara com um resultado gravado anteriormente.')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='Percentagem máxima de aumento do p95 aceite em relação à referência.')
+    # Uso interno: o processo medido
+    parser.add_argument('--measure-user-id', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def measure(user_id):
+    # Corre num processo novo: nada da aplicação pode ter sido importado antes
+    timings = {}
+    started = time.perf_counter()
+    from app import create_app
+    timings['import'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app = create_app()
+    timings['create_app'] = time.perf_counter() - started
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    for stage in ('primeiro pedido', 'segundo pedido'):
+        started = time.perf_counter()
+        response = client.get('/api/children')
+        response.get_data()
+        timings[stage] = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"GET /api/children respondeu {response.status_code}")
+    print(json.dumps(timings))
+
+
+def prepare_database(args):
+    # A população é gerada aqui, no processo pai; os processos medidos só a leem
+    from app import create_app
+    from models import db, User
+    import migrations
+
+    app = create_app()
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+        if db.session.execute(db.select(db.func.count(User.id))).scalar() == 0:
+            seed(db, args.users, 3, 3)
+        user_id = db.session.execute(db.select(User.id).where(User.email == user_email(0))).scalar()
+        db.session.remove()
+    return user_id
+
+
+def run_process(user_id, mode):
+    env = dict(os.environ, APP_WARMUP=mode)
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--measure-user-id', str(user_id)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"Processo medido falhou (APP_WARMUP={mode}):\n{completed.stderr}")
+    timings = json.loads(completed.stdout.strip().splitlines()[-1])
+    timings['processo'] = elapsed
+    return timings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.measure_user_id is not None:
+        measure(args.measure_user_id)
+        return 0
+
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    user_id = prepare_database(args)
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    results = {}
+    for mode in modes:
+        samples = {stage: [] for stage in STAGES}
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            for stage, seconds in run_process(user_id, mode).items():
+                samples[stage].append(seconds)
+        elapsed = time.perf_counter() - started
+        for stage in STAGES:
+            results[f'{mode}: {stage}'] = report.summarize(samples[stage], elapsed)
+
+    settings = {
+        'database': os.environ['DATABASE_URL'].split(':')[0],
+        'users': args.users, 'runs': args.runs, 'modes': modes,
+    }
+    document = report.build_document('startup', settings, results)
+    report.print_table(results)
+    if args.save:
+        report.save(document, args.save)
+        print(f"\nResultado gravado em {args.save}")
+
+    if args.baseline:
+        regressions = report.compare(document, report.load(args.baseline), args.max_regression)
+        if regressions and args.max_regression is not None:
+            print(f"\nRegressões: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
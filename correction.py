@@ -0,0 +1,219 @@
+# correction.py
+# Correção monetária da pensão em atraso por índices de inflação (INPC/IPCA), mais juros de mora.
+#
+# O valor em falta de cada mês (ledger.build_ledger) é multiplicado pela variação acumulada do
+# índice desde o mês do vencimento até ao último mês publicado, e sobre o valor corrigido
+# incidem juros simples de CORRECTION_INTEREST_RATE ao mês, contados até ao mês atual.
+#
+# Séries: um ficheiro CSV por índice em CORRECTION_INDEX_DIR (por omissão data/indices/), com
+# uma linha 'AAAA-MM,variação mensal em %' por mês, sem falhas (ex.: '2024-01,0.57'), tal como
+# publicado pelo IBGE. Cada série fica em memória como um array de produtos acumulados, pelo
+# que o fator de correção de qualquer mês é uma divisão.
+# data/indices-exemplo/ tem séries ilustrativas (não oficiais) para desenvolvimento e testes.
+# Os ficheiros são relidos quando mudam (verificado no máximo a cada RELOAD_SECONDS).
+#
+# Os resultados ficam em cache por processo, por filho, versão dos dados do utilizador
+# (users.data_version), índice, último mês publicado e mês atual: um novo mês do índice ou uma
+# alteração nos pagamentos produzem uma entrada nova. O último mês publicado entra também no ETag
+# da resposta (app.correction_etag), para que um novo mês não seja servido com um 304.
+#
+# Quando sai um novo mês do índice: acrescentar a linha ao CSV e recalcular a carteira toda com
+#   flask --app app recalculate-corrections --index inpc [--output dividas.csv]
+
+import array
+import csv
+import itertools
+import logging
+import operator
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import ledger
+from models import db, Child
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+INDEX_DIR = os.environ.get('CORRECTION_INDEX_DIR', os.path.join(ROOT, 'data', 'indices'))
+DEFAULT_INDEX = os.environ.get('CORRECTION_INDEX', 'inpc')
+SUPPORTED_INDEXES = ('inpc', 'ipca')
+# Juros de mora simples ao mês sobre o valor corrigido (1% ao mês; 0 = só correção)
+INTEREST_RATE = float(os.environ.get('CORRECTION_INTEREST_RATE', 0.01))
+CACHE_SIZE = int(os.environ.get('CORRECTION_CACHE_SIZE', 10000))
+RELOAD_SECONDS = 60
+CHUNK_SIZE = 2000
+
+logger = logging.getLogger(__name__)
+
+
+class IndexUnavailable(Exception):
+    pass
+
+
+def month_ordinal(year, month):
+    return year * 12 + month - 1
+
+
+def format_ordinal(ordinal):
+    return f'{ordinal // 12:04d}-{ordinal % 12 + 1:02d}'
+
+
+class IndexSeries:
+    __slots__ = ('name', 'first', 'last', 'cumulative')
+
+    def __init__(self, name, first, variations):
+        self.name = name
+        self.first = first
+        self.last = first + len(variations) - 1
+        # cumulative[0] = 1 (antes da série); cumulative[i] = produto dos fatores até ao mês first + i - 1
+        factors = array.array('d', (1 + variation / 100 for variation in variations))
+        self.cumulative = array.array('d', itertools.accumulate(factors, operator.mul, initial=1.0))
+
+    def factor(self, ordinal):
+        # Fator de um mês de vencimento até ao último mês publicado: as variações dos meses
+        # seguintes. Meses anteriores à série usam a série toda; meses depois do último, 1.
+        position = min(max(ordinal - self.first + 1, 0), len(self.cumulative) - 1)
+        return self.cumulative[-1] / self.cumulative[position]
+
+
+def load_series(name, path):
+    variations = []
+    first = previous = None
+    with open(path, newline='') as f:
+        for line_number, row in enumerate(csv.reader(f), start=1):
+            if not row or row[0].startswith('#') or not row[0][:1].isdigit():
+                continue
+            try:
+                year, month = (int(part) for part in row[0].strip().split('-'))
+                variation = float(row[1].strip().replace(',', '.'))
+            except (ValueError, IndexError):
+                raise ValueError(f"{path}:{line_number}: linha inválida (esperado 'AAAA-MM,variação')")
+            ordinal = month_ordinal(year, month)
+            if previous is not None and ordinal != previous + 1:
+                raise ValueError(f"{path}:{line_number}: a série tem de ser mensal e sem falhas")
+            first = ordinal if first is None else first
+            previous = ordinal
+            variations.append(variation)
+    if not variations:
+        raise ValueError(f"{path}: série vazia")
+    return IndexSeries(name, first, variations)
+
+
+_lock = threading.Lock()
+# nome -> (série, mtime do ficheiro, última verificação)
+_series = {}
+_results = OrderedDict()
+
+
+def get_series(name, force_reload=False):
+    if name not in SUPPORTED_INDEXES:
+        raise IndexUnavailable(f"Índice desconhecido: {name} (use {', '.join(SUPPORTED_INDEXES)})")
+    path = os.path.join(INDEX_DIR, f'{name}.csv')
+    now = time.monotonic()
+    with _lock:
+        cached = _series.get(name)
+        if cached is not None and not force_reload and now - cached[2] < RELOAD_SECONDS:
+            return cached[0]
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            logger.warning('Ficheiro da série de índice não encontrado', extra={'index': name, 'path': path})
+            raise IndexUnavailable(f"Série do índice {name.upper()} indisponível")
+        if cached is None or force_reload or cached[1] != mtime:
+            series = load_series(name, path)
+            logger.info('Série de índice carregada', extra={'index': name, 'last_month': format_ordinal(series.last)})
+        else:
+            series = cached[0]
+        _series[name] = (series, mtime, now)
+        return series
+
+
+def correct(series, ledger_result, today, interest_rate=INTEREST_RATE):
+    # Acrescenta ao resultado de ledger.build_ledger os valores corrigidos de cada mês e totais
+    current = month_ordinal(today.year, today.month)
+    corrected_months = []
+    total_corrected = total_interest = 0.0
+    for month in ledger_result['months']:
+        ordinal = month_ordinal(month['year'], month['month'])
+        factor = series.factor(ordinal)
+        corrected = month['shortfall'] * factor
+        # Juros simples pelos meses decorridos desde o vencimento
+        interest = corrected * (current - ordinal) * interest_rate
+        corrected_months.append({**month, 'correction_factor': round(factor, 6),
+                                 'corrected_shortfall': round(corrected, 2), 'interest': round(interest, 2)})
+        total_corrected += corrected
+        total_interest += interest
+    return {
+        **ledger_result,
+        'months': corrected_months,
+        'total_corrected': round(total_corrected, 2),
+        'total_interest': round(total_interest, 2),
+        'total_updated': round(total_corrected + total_interest, 2),
+        'correction': {
+            'index': series.name,
+            'index_last_month': format_ordinal(series.last),
+            'interest_rate_monthly': interest_rate,
+        },
+    }
+
+
+def corrected_ledger(child, data_version, index_name=None, today=None, totals=None):
+    today = today or date.today()
+    series = get_series(index_name or DEFAULT_INDEX)
+    key = (child.id, data_version, series.name, series.last, month_ordinal(today.year, today.month), INTEREST_RATE)
+    with _lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+            return result
+
+    result = correct(series, ledger.build_ledger(child, today=today, totals=totals), today)
+    with _lock:
+        _results[key] = result
+        while len(_results) > CACHE_SIZE:
+            _results.popitem(last=False)
+    return result
+
+
+def recalculate_portfolio(index_name=None, today=None, chunk_size=CHUNK_SIZE, writer=None):
+    # Recalcula a dívida corrigida de todos os filhos (ex.: depois de publicado um novo mês do
+    # índice), por blocos de filhos. 'writer' (csv.writer) recebe uma linha por filho.
+    today = today or date.today()
+    series = get_series(index_name or DEFAULT_INDEX, force_reload=True)
+    with _lock:
+        _results.clear()
+
+    summary = {'children': 0, 'total_due': 0.0, 'total_corrected': 0.0, 'total_interest': 0.0,
+               'index': series.name, 'index_last_month': format_ordinal(series.last)}
+    if writer is not None:
+        writer.writerow(['child_id', 'user_id', 'total_due', 'total_corrected', 'total_interest', 'total_updated'])
+    after_id = 0
+    while True:
+        children = db.session.execute(
+            db.select(Child.id, Child.user_id, Child.enabled_years, Child.monthly_alimony_value)
+            .where(Child.id > after_id)
+            .order_by(Child.id)
+            .limit(chunk_size)
+        ).all()
+        if not children:
+            break
+        years = sorted({year for child in children for year in ledger.years_to_track(child, today)})
+        totals = ledger.monthly_paid_totals([child.id for child in children], years)
+        # Leitura curta por bloco, como em reminders.py
+        db.session.rollback()
+
+        for child in children:
+            result = correct(series, ledger.build_ledger(child, today=today, totals=totals), today)
+            summary['children'] += 1
+            summary['total_due'] += result['total_due']
+            summary['total_corrected'] += result['total_corrected']
+            summary['total_interest'] += result['total_interest']
+            if writer is not None:
+                writer.writerow([child.id, child.user_id, result['total_due'], result['total_corrected'],
+                                 result['total_interest'], result['total_updated']])
+        after_id = children[-1].id
+
+    for key in ('total_due', 'total_corrected', 'total_interest'):
+        summary[key] = round(summary[key], 2)
+    return summary
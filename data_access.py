@@ -0,0 +1,91 @@
+# data_access.py
+# Alterações de filhos e pagamentos com a verificação de posse na própria instrução SQL.
+#
+# Cada função altera apenas linhas de filhos do utilizador (children.user_id) e devolve o que
+# foi alterado (RETURNING), ou None se o registo não existe ou pertence a outro utilizador.
+# Não há uma consulta prévia para carregar o objeto: a latência de uma escrita já não
+# depende de idas e voltas ao banco nem do número de pagamentos do filho (os pagamentos e os
+# totais mensais de um filho excluído são apagados pelo banco, com ON DELETE CASCADE).
+
+from models import db, Child, Payment
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def update_child(user_id, child_id, values, version):
+    # 'values' já validados (colunas de Child); devolve o filho atualizado como em to_dict()
+    row = db.session.execute(
+        db.update(Child)
+        .where(Child.id == child_id, Child.user_id == user_id)
+        .values(**values, sync_version=version)
+        .returning(*Child.list_columns())
+        .execution_options(synchronize_session=False)
+    ).first()
+    return Child.row_to_dict(row) if row else None
+
+
+def delete_child(user_id, child_id):
+    return db.session.execute(
+        db.delete(Child)
+        .where(Child.id == child_id, Child.user_id == user_id)
+        .returning(Child.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def update_payment(user_id, payment_id, values, version):
+    # Devolve (data_antiga, valor_antigo, linha_nova) para atualizar child_month_balance
+    returning = (*Payment.list_columns(),)
+
+    if _dialect() == 'postgresql':
+        # Uma instrução: a subconsulta bloqueia a linha e fornece os valores anteriores
+        # (o RETURNING do PostgreSQL só vê os novos)
+        old = (
+            db.select(Payment.id, Payment.payment_date, Payment.value_paid)
+            .where(Payment.id == payment_id)
+            .with_for_update()
+            .subquery('old')
+        )
+        row = db.session.execute(
+            db.update(Payment)
+            .where(Payment.id == old.c.id, Payment.child_id == Child.id, Child.user_id == user_id)
+            .values(**values, sync_version=version)
+            .returning(*returning, old.c.payment_date, old.c.value_paid)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            return None
+        return row[-2], row[-1], row[:-2]
+
+    # SQLite: o RETURNING não pode referir outras tabelas. A leitura e a escrita correm na
+    # mesma transação, que já tem o bloqueio de escrita do banco (versioning.bump)
+    old = db.session.execute(
+        db.select(Payment.payment_date, Payment.value_paid)
+        .join(Child, Child.id == Payment.child_id)
+        .where(Payment.id == payment_id, Child.user_id == user_id)
+    ).first()
+    if old is None:
+        return None
+    row = db.session.execute(
+        db.update(Payment)
+        .where(Payment.id == payment_id)
+        .values(**values, sync_version=version)
+        .returning(*returning)
+        .execution_options(synchronize_session=False)
+    ).first()
+    return old.payment_date, old.value_paid, row
+
+
+def delete_payment(user_id, payment_id):
+    # Devolve a linha apagada (id, child_id, payment_date, value_paid) ou None
+    return db.session.execute(
+        db.delete(Payment)
+        .where(
+            Payment.id == payment_id,
+            Payment.child_id.in_(db.select(Child.id).where(Child.user_id == user_id)),
+        )
+        .returning(Payment.id, Payment.child_id, Payment.payment_date, Payment.value_paid)
+        .execution_options(synchronize_session=False)
+    ).first()
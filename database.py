@@ -0,0 +1,79 @@
+# database.py
+# Configuração do engine do SQLAlchemy (SQLALCHEMY_ENGINE_OPTIONS).
+#
+# O pool de ligações é por processo: cada worker do Gunicorn precisa de tantas ligações
+# quantos pedidos atende em simultâneo (1 com workers sync, o número de threads com
+# gthread, um limite com gevent). O gunicorn.conf.py define DB_POOL_SIZE de acordo com o
+# modelo de workers escolhido. Ao todo, o servidor abre até
+#     workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# ligações, que têm de caber no max_connections do PostgreSQL (junto com o worker de e-mails).
+#
+# Variáveis de ambiente:
+#   DB_POOL_SIZE              ligações mantidas abertas por processo (por omissão 5)
+#   DB_MAX_OVERFLOW           ligações extra em picos (por omissão 2)
+#   DB_POOL_TIMEOUT           segundos à espera de uma ligação livre (por omissão 10)
+#   DB_POOL_RECYCLE           segundos até uma ligação ser renovada (por omissão 1800)
+#   DB_STATEMENT_TIMEOUT_MS   tempo máximo de cada consulta no PostgreSQL (0 = sem limite)
+#
+# No SQLite as chaves estrangeiras só são verificadas (e o ON DELETE CASCADE só é aplicado)
+# com PRAGMA foreign_keys=ON, ativado em cada nova ligação.
+
+import os
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def _int_env(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(database_url):
+    options = {
+        # Deteta ligações fechadas pelo servidor (ex.: reinício do banco) antes de as usar
+        'pool_pre_ping': True,
+        'pool_recycle': _int_env('DB_POOL_RECYCLE', 1800),
+    }
+    if not database_url or database_url.startswith('sqlite'):
+        return options
+
+    options.update(
+        pool_size=_int_env('DB_POOL_SIZE', 5),
+        max_overflow=_int_env('DB_MAX_OVERFLOW', 2),
+        pool_timeout=_int_env('DB_POOL_TIMEOUT', 10),
+    )
+    statement_timeout = _int_env('DB_STATEMENT_TIMEOUT_MS', 0)
+    if statement_timeout and database_url.startswith(('postgres://', 'postgresql')):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+def make_psycopg2_green():
+    # Com workers gevent, as esperas do psycopg2 pelo banco passam a ceder a vez às outras
+    # greenlets em vez de bloquearem o processo (o mesmo que o pacote psycogreen faz)
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+
+    def gevent_wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Estado inesperado do poll(): {state!r}")
+
+    extensions.set_wait_callback(gevent_wait_callback)
@@ -0,0 +1,281 @@
+# email_outbox.py
+# Caixa de saída de e-mails.
+#
+# As rotas não enviam e-mails diretamente: gravam uma linha em 'email_outbox' na mesma
+# transação dos dados que originam o e-mail (ex.: o PasswordResetToken). Um worker em
+# segundo plano envia as mensagens pendentes com um conjunto limitado de threads, tenta
+# de novo com espera exponencial em caso de falha e, esgotadas as tentativas, marca a
+# mensagem como 'dead' para análise manual.
+#
+# Transportes (variável EMAIL_TRANSPORT):
+#   sendgrid -> API do SendGrid (SENDGRID_API_KEY e SENDGRID_SENDER_EMAIL)
+#   console  -> escreve a mensagem no stdout (por omissão, se o SendGrid não estiver configurado)
+#   file     -> grava cada mensagem como JSON em EMAIL_FILE_DIR (útil para testes)
+#
+# Worker: flask --app app deliver-emails   (ou EMAIL_OUTBOX_IN_PROCESS=1 para uma thread no próprio servidor)
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+
+from models import db, EmailOutbox
+
+STATUS_PENDING = 'pending'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_DEAD = 'dead'
+
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+BACKOFF_BASE_SECONDS = int(os.environ.get('EMAIL_BACKOFF_BASE_SECONDS', 30))
+BACKOFF_MAX_SECONDS = 6 * 60 * 60
+# Mensagens em 'sending' há mais tempo do que isto (worker interrompido) voltam à fila
+STALE_LOCK_SECONDS = 10 * 60
+SENDER_NAME = 'Pensão em Dia Suporte'
+
+logger = logging.getLogger(__name__)
+
+
+class EmailDeliveryError(Exception):
+    pass
+
+
+# --- TRANSPORTES ---
+# send(message) envia uma mensagem; send_batch(template, recipients) envia a mesma mensagem
+# a vários destinatários, cada um com as suas substituições ({'-chave-': 'valor'}) no texto.
+
+def apply_substitutions(text, substitutions):
+    for key, value in substitutions.items():
+        text = text.replace(key, value)
+    return text
+
+class ConsoleTransport:
+    name = 'console'
+
+    def send(self, message):
+        logger.info("E-mail (transporte console)", extra={
+            'to_email': message['to_email'],
+            'subject': message['subject'],
+            'body': message['text_content'] or message['html_content'],
+        })
+
+    def send_batch(self, template, recipients):
+        for recipient in recipients:
+            self.send({
+                'to_email': recipient['to_email'],
+                'subject': apply_substitutions(template['subject'], recipient['substitutions']),
+                'html_content': apply_substitutions(template['html_content'], recipient['substitutions']),
+                'text_content': apply_substitutions(template.get('text_content') or '', recipient['substitutions']),
+            })
+
+
+class FileTransport:
+    name = 'file'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, message):
+        path = os.path.join(self.directory, f"email-{message['id']}-{time.time_ns()}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(message, f, ensure_ascii=False, indent=2)
+
+    def send_batch(self, template, recipients):
+        # Um ficheiro por lote, como um único pedido à API
+        path = os.path.join(self.directory, f"batch-{time.time_ns()}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'template': template, 'recipients': recipients}, f, ensure_ascii=False, indent=2)
+
+
+class SendGridTransport:
+    name = 'sendgrid'
+
+    def __init__(self, api_key, sender_email):
+        self.api_key = api_key
+        self.sender_email = sender_email
+
+    def send(self, message):
+        # Importado apenas quando um e-mail é realmente enviado
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail, Email, To
+
+        mail = Mail(
+            from_email=Email(self.sender_email, SENDER_NAME), # Remetente verificado no SendGrid
+            to_emails=To(message['to_email']),
+            subject=message['subject'],
+            html_content=message['html_content'],
+        )
+        response = SendGridAPIClient(self.api_key).send(mail)
+        if response.status_code >= 300:
+            raise EmailDeliveryError(f"SendGrid respondeu {response.status_code}")
+
+    def send_batch(self, template, recipients):
+        # Um único pedido à API com uma 'personalization' por destinatário (máx. 1000)
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail, Email, To, Personalization, Substitution
+
+        mail = Mail(
+            from_email=Email(self.sender_email, SENDER_NAME),
+            subject=template['subject'],
+            html_content=template['html_content'],
+            plain_text_content=template.get('text_content'),
+        )
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient['to_email']))
+            for key, value in recipient['substitutions'].items():
+                personalization.add_substitution(Substitution(key, value))
+            mail.add_personalization(personalization)
+
+        response = SendGridAPIClient(self.api_key).send(mail)
+        if response.status_code >= 300:
+            raise EmailDeliveryError(f"SendGrid respondeu {response.status_code}")
+
+
+def transport_from_env():
+    name = os.environ.get('EMAIL_TRANSPORT')
+    api_key = os.environ.get('SENDGRID_API_KEY')
+    sender_email = os.environ.get('SENDGRID_SENDER_EMAIL') # O e-mail verificado no SendGrid
+
+    if name == 'file':
+        return FileTransport(os.environ.get('EMAIL_FILE_DIR', 'emails_enviados'))
+    if name == 'console' or not (api_key and sender_email):
+        return ConsoleTransport()
+    return SendGridTransport(api_key, sender_email)
+
+
+# --- CAIXA DE SAÍDA ---
+
+def enqueue(to_email, subject, html_content, text_content=None):
+    # Apenas adiciona à sessão: o commit é feito pela rota, junto com os restantes dados
+    message = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+        status=STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=datetime.now(UTC),
+    )
+    db.session.add(message)
+    return message
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    # Reserva mensagens prontas para envio. No PostgreSQL, FOR UPDATE SKIP LOCKED permite
+    # vários workers em paralelo sem enviar a mesma mensagem duas vezes.
+    now = datetime.now(UTC)
+    ready = (
+        db.select(EmailOutbox.id)
+        .where(db.or_(
+            db.and_(EmailOutbox.status == STATUS_PENDING, EmailOutbox.next_attempt_at <= now),
+            db.and_(EmailOutbox.status == STATUS_SENDING, EmailOutbox.locked_at < now - timedelta(seconds=STALE_LOCK_SECONDS)),
+        ))
+        .order_by(EmailOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claimed_ids = db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ready.scalar_subquery()))
+        .values(status=STATUS_SENDING, locked_at=now)
+        .returning(EmailOutbox.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    if not claimed_ids:
+        return []
+
+    return [
+        {
+            'id': row.id,
+            'to_email': row.to_email,
+            'subject': row.subject,
+            'html_content': row.html_content,
+            'text_content': row.text_content,
+            'attempts': row.attempts,
+        }
+        for row in EmailOutbox.query.filter(EmailOutbox.id.in_(claimed_ids)).order_by(EmailOutbox.id)
+    ]
+
+
+def _record_result(message, error):
+    now = datetime.now(UTC)
+    values = {'attempts': message['attempts'] + 1, 'locked_at': None}
+    if error is None:
+        values.update(status=STATUS_SENT, sent_at=now, last_error=None)
+    elif values['attempts'] >= MAX_ATTEMPTS:
+        values.update(status=STATUS_DEAD, last_error=str(error)[:1000])
+    else:
+        values.update(
+            status=STATUS_PENDING,
+            next_attempt_at=now + backoff_delay(values['attempts']),
+            last_error=str(error)[:1000],
+        )
+    db.session.execute(db.update(EmailOutbox).where(EmailOutbox.id == message['id']).values(**values))
+    return values['status']
+
+
+def _send(transport, message):
+    try:
+        transport.send(message)
+        return None
+    except Exception as e:
+        return e
+
+
+def deliver_batch(transport, executor, batch_size=50):
+    # Envia um lote: as threads só falam com o transporte; o banco é usado apenas nesta thread
+    messages = claim_batch(batch_size)
+    if not messages:
+        return {}
+
+    errors = list(executor.map(lambda message: _send(transport, message), messages))
+    summary = {}
+    for message, error in zip(messages, errors):
+        status = _record_result(message, error)
+        summary[status] = summary.get(status, 0) + 1
+        if error is not None:
+            logger.warning("Erro ao enviar e-mail", extra={'email_id': message['id'], 'status': status, 'error': str(error)})
+    db.session.commit()
+    return summary
+
+
+def run_worker(app, transport=None, max_workers=4, batch_size=50, poll_interval=5.0, once=False, stop_event=None):
+    transport = transport or transport_from_env()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='email-outbox') as executor:
+        while True:
+            with app.app_context():
+                try:
+                    summary = deliver_batch(transport, executor, batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.exception("Erro no worker de e-mails")
+                    summary = {}
+                finally:
+                    db.session.remove()
+            if once and not summary:
+                return
+            if summary:
+                # Ainda pode haver mais mensagens prontas: continua sem esperar
+                continue
+            if stop_event is not None:
+                if stop_event.wait(poll_interval):
+                    return
+            else:
+                time.sleep(poll_interval)
+
+
+def start_background_worker(app, **kwargs):
+    # Worker numa thread do próprio processo (para quem não tem um processo 'worker' separado)
+    thread = threading.Thread(target=run_worker, args=(app,), kwargs=kwargs, name='email-outbox-worker', daemon=True)
+    thread.start()
+    return thread
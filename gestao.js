@@ -61,10 +61,11 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // --- Funções de Conexão com o Backend (API) ---
 
-    // Função para buscar todos os filhos do utilizador
-    async function fetchChildren() {
+    // Função para buscar todos os filhos do utilizador, já com os pagamentos do ano
+    // indicado agrupados por mês e o montante devedor calculado (um único pedido ao backend)
+    async function fetchDashboard(ano) {
         try {
-            const response = await fetch('/api/children');
+            const response = await fetch(`/api/dashboard?year=${ano}`);
             if (!response.ok) {
                 // Se a sessão expirou ou não está autenticado, redireciona para o login
                 if (response.status === 401) {
@@ -83,20 +84,32 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
 
-    // Função para buscar pagamentos de um filho específico
-    async function fetchPaymentsForChild(childId) {
+    // Função para buscar apenas os pagamentos de um filho num ano específico
+    async function fetchPaymentsForYear(childId, ano) {
         try {
-            const response = await fetch(`/api/payments/${childId}`);
+            const response = await fetch(`/api/payments/${childId}?year=${ano}`);
             if (!response.ok) {
-                if (response.status === 404) return []; // Sem pagamentos é ok
-                throw new Error(`Erro ao buscar pagamentos para o filho ${childId}: ${response.statusText}`);
+                throw new Error(`Erro ao buscar pagamentos de ${ano} para o filho ${childId}: ${response.statusText}`);
             }
-            const payments = await response.json();
-            return payments;
+            return await response.json();
         } catch (error) {
-            console.error(`Erro ao carregar pagamentos para o filho ${childId}:`, error);
-            alert(`Erro ao carregar pagamentos para o filho ${childId}.`);
-            return [];
+            console.error(`Erro ao carregar pagamentos de ${ano} para o filho ${childId}:`, error);
+            alert(`Erro ao carregar pagamentos de ${ano}.`);
+            return null;
+        }
+    }
+
+    // Função para buscar o montante devedor de um filho, calculado pelo backend
+    async function fetchLedger(childId) {
+        try {
+            const response = await fetch(`/api/children/${childId}/ledger`);
+            if (!response.ok) {
+                throw new Error(`Erro ao buscar montante devedor do filho ${childId}: ${response.statusText}`);
+            }
+            return await response.json();
+        } catch (error) {
+            console.error(`Erro ao carregar montante devedor do filho ${childId}:`, error);
+            return null;
         }
     }
 
@@ -181,53 +194,14 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // --- Funções de Cálculo e Lógica de Negócio ---
 
-    // Adaptação para calcular o montante devido com base nos dados do backend
-    function calcularMontanteDevido(filho, pagamentosDoFilho) {
-        const valorMensal = parseFloat(filho.monthly_alimony_value);
-        const hoje = new Date();
-        const anoAtual = hoje.getFullYear();
-        const mesAtual = hoje.getMonth(); // 0-11
-
-        let totalDevido = 0;
-        let status = "verde";
-        let temMesesComDivida = false;
-
-        // USA APENAS OS ANOS HABILITADOS PARA CÁLCULO (agora persistente)
-        const anosParaCalcular = filho.enabled_years || []; 
-
-        if (anosParaCalcular.length === 0) {
-            return { totalDevido: 0, status: "verde" }; // Se nenhum ano habilitado, dívida é 0
-        }
-
-        for (const ano of anosParaCalcular) { 
-            if (ano > anoAtual) continue; // Não calcula para anos futuros
-
-            // Considera o mês atual se for o ano atual, caso contrário, todos os 12 meses.
-            const limiteMes = (ano === anoAtual) ? mesAtual : 11;
-
-            for (let mes = 0; mes <= limiteMes; mes++) {
-                const pagamentosNoPeriodo = pagamentosDoFilho[ano] && pagamentosDoFilho[ano][mes] ? pagamentosDoFilho[ano][mes] : [];
-                const totalPago = pagamentosNoPeriodo.reduce((soma, p) => soma + parseFloat(p.amount || 0), 0);
-
-                if (totalPago < valorMensal) {
-                    totalDevido += (valorMensal - totalPago);
-                    temMesesComDivida = true;
-                    if (totalPago === 0) {
-                        status = "vermelho";
-                    } else if (status !== "vermelho") {
-                        status = "amarelo";
-                    }
-                }
-            }
-        }
-
-        if (totalDevido === 0) {
-            status = "verde";
-        } else if (status === "verde" && temMesesComDivida) {
-            status = "amarelo";
-        }
-
-        return { totalDevido, status };
+    // Organiza os pagamentos de um ano (lista plana do backend) em 12 listas, uma por mês
+    function organizarPagamentosDoAno(payments) {
+        const meses = Array(12).fill().map(() => []);
+        payments.forEach(p => {
+            const date = new Date(p.payment_date + 'T12:00:00'); // Garante que a data é tratada como local para evitar fuso horário
+            meses[date.getMonth()].push(p);
+        });
+        return meses;
     }
 
     // Função para Calcular Idade
@@ -260,7 +234,7 @@ document.addEventListener("DOMContentLoaded", function () {
         allChildrenData = []; // Limpa o cache de filhos
         allPaymentsByChildAndYear = {}; // Limpa o cache de pagamentos
 
-        const children = await fetchChildren();
+        const children = await fetchDashboard(currentYearToDisplay);
         // Inicializa 'enabled_years' para cada filho se não vier do backend
         allChildrenData = children.map(child => {
             if (!child.enabled_years || !Array.isArray(child.enabled_years)) {
@@ -290,12 +264,10 @@ document.addEventListener("DOMContentLoaded", function () {
         if (yearNavigation) yearNavigation.style.display = 'flex'; // Volta a exibir
         if (yearEnableToggle) yearEnableToggle.style.display = 'block'; // Volta a exibir
 
-        // Para cada filho, busca seus pagamentos e depois renderiza
+        // Para cada filho, renderiza com os pagamentos do ano exibido, que já vieram agrupados por mês.
+        // Os outros anos são buscados apenas quando o utilizador navega até eles.
         for (const filho of allChildrenData) {
-            const payments = await fetchPaymentsForChild(filho.id);
-            // Organiza os pagamentos por ano e mês para fácil acesso no frontend
-            const organizedPayments = organizePaymentsByYearAndMonth(payments);
-            allPaymentsByChildAndYear[filho.id] = organizedPayments; // Armazena no cache global
+            allPaymentsByChildAndYear[filho.id] = filho.payments_by_year || {}; // Armazena no cache global
 
             // 1. Criar o Botão da Aba
             const tabButton = document.createElement("button");
@@ -309,7 +281,9 @@ document.addEventListener("DOMContentLoaded", function () {
             filhoContentDiv.classList.add("filho-content");
             filhoContentDiv.id = `filho-${filho.id}-content`; // ID único para o conteúdo
 
-            const { totalDevido, status } = calcularMontanteDevido(filho, organizedPayments);
+            // Montante devedor calculado pelo backend (ledger) para todos os anos habilitados
+            const totalDevido = filho.ledger ? filho.ledger.total_due : 0;
+            const status = filho.ledger ? filho.ledger.status : "verde";
             const idadeFilho = calcularIdade(filho.date_of_birth); // Usa date_of_birth do backend
 
             filhoContentDiv.innerHTML = `
@@ -361,38 +335,6 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     }
 
-    // Adapta os pagamentos do backend (lista plana) para a estrutura { ano: { mes: [] } }
-    function organizePaymentsByYearAndMonth(payments) {
-        const organized = {};
-        payments.forEach(p => {
-            const date = new Date(p.payment_date + 'T12:00:00'); // Garante que a data é tratada como local para evitar fuso horário
-            const year = date.getFullYear();
-            const month = date.getMonth(); // 0-11
-
-            if (!organized[year]) {
-                organized[year] = Array(12).fill().map(() => []); // Inicializa todos os meses do ano
-            }
-            organized[year][month].push({
-                id: p.id,
-                amount: p.amount,
-                payment_date: p.payment_date, // Mantém YYYY-MM-DD
-                created_at: p.created_at,
-                month_reference: p.month_reference, // Inclui referência do mês
-                year_reference: p.year_reference    // Inclui referência do ano
-            });
-        });
-
-        // Ordenar os pagamentos dentro de cada mês por data
-        for (const year in organized) {
-            for (let mes = 0; mes < 12; mes++) {
-                if (organized[year][mes]) {
-                    organized[year][mes].sort((a, b) => new Date(a.payment_date) - new Date(b.payment_date));
-                }
-            }
-        }
-        return organized;
-    }
-
     // --- Função para renderizar os meses para um filho específico e um ano específico ---
     function renderizarMesesParaFilho(filho, filhoContentDiv, yearToDisplay) {
         const mesesGrid = filhoContentDiv.querySelector(".meses-grid");
@@ -540,7 +482,7 @@ document.addEventListener("DOMContentLoaded", function () {
     // --- Handlers de Ações Globalizadas (adaptados para trabalhar com o filho atual) ---
 
     // Handler para os botões de navegar ano
-    function handleYearNavigation(e) {
+    async function handleYearNavigation(e) {
         const filhoId = parseInt(e.currentTarget.dataset.filhoId);
         const filhoContentDiv = document.getElementById(`filho-${filhoId}-content`);
         let yearInView = parseInt(filhoContentDiv.querySelector('.current-year').textContent.replace('Ano: ', ''));
@@ -551,6 +493,13 @@ document.addEventListener("DOMContentLoaded", function () {
             yearInView++;
         }
 
+        // Busca os pagamentos do ano apenas se ainda não estiverem no cache
+        if (!allPaymentsByChildAndYear[filhoId][yearInView]) {
+            const payments = await fetchPaymentsForYear(filhoId, yearInView);
+            if (payments === null) return;
+            allPaymentsByChildAndYear[filhoId][yearInView] = organizarPagamentosDoAno(payments);
+        }
+
         filhoContentDiv.querySelector('.current-year').textContent = `Ano: ${yearInView}`;
         const filhoAtual = allChildrenData.find(f => f.id === filhoId);
         renderizarMesesParaFilho(filhoAtual, filhoContentDiv, yearInView);
@@ -619,10 +568,11 @@ document.addEventListener("DOMContentLoaded", function () {
     }
 
     // Função para atualizar apenas o display do montante devedor de um filho específico
-    function atualizarMontanteDevedorDisplay(filhoId) {
-        const filho = allChildrenData.find(f => f.id === filhoId);
-        const pagamentosDoFilho = allPaymentsByChildAndYear[filhoId];
-        const { totalDevido, status } = calcularMontanteDevido(filho, pagamentosDoFilho);
+    async function atualizarMontanteDevedorDisplay(filhoId) {
+        const ledger = await fetchLedger(filhoId);
+        if (!ledger) return;
+        const totalDevido = ledger.total_due;
+        const status = ledger.status;
         const filhoContentDiv = document.getElementById(`filho-${filhoId}-content`);
         const montanteDevedorElem = filhoContentDiv.querySelector('.montante-devedor');
 
@@ -0,0 +1,85 @@
+# gunicorn.conf.py
+# Configuração do Gunicorn em produção (lida automaticamente: gunicorn 'app:create_app()').
+#
+# GUNICORN_WORKER_CLASS escolhe o modelo de workers:
+#   sync     um pedido de cada vez por processo (o comportamento antigo)
+#   gthread  GUNICORN_THREADS pedidos em simultâneo por processo, em threads (por omissão)
+#   gevent   até GUNICORN_WORKER_CONNECTIONS pedidos por processo, em greenlets; o psycopg2
+#            é tornado cooperativo (database.make_psycopg2_green). Requer: pip install gevent
+# WEB_CONCURRENCY define o número de processos (por omissão, 2 x CPUs + 1 com sync e o número
+# de CPUs nos restantes). O pool de ligações de cada processo acompanha a concorrência do
+# worker (ver database.py).
+#
+# Medir a diferença de débito entre modelos (com o mesmo banco populado por benchmarks.seed):
+#   python -m benchmarks.seed --database-url $DATABASE_URL --users 200
+#   export RATE_LIMIT_ENABLED=0   (os clientes do benchmark fazem login todos do mesmo IP)
+#   export METRICS_TOKEN=local    (o benchmark lê as consultas por pedido de /metrics)
+#   GUNICORN_WORKER_CLASS=sync    gunicorn 'app:create_app()' &   python -m benchmarks.run http --url http://127.0.0.1:8000 --concurrency 32 --duration 60 --save sync.json
+#   GUNICORN_WORKER_CLASS=gthread gunicorn 'app:create_app()' &   python -m benchmarks.run http --url http://127.0.0.1:8000 --concurrency 32 --duration 60 --baseline sync.json
+#   GUNICORN_WORKER_CLASS=gevent  gunicorn 'app:create_app()' &   (idem)
+# e comparar os pedidos por segundo e o p95 da linha 'total'.
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in ('sync', 'gthread', 'gevent'):
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS inválido: {worker_class} (use sync, gthread ou gevent)")
+
+cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * cpus + 1 if worker_class == 'sync' else cpus))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# O Render define PORT; localmente, o mesmo endereço por omissão do Gunicorn
+bind = f"0.0.0.0:{os.environ['PORT']}" if 'PORT' in os.environ else '127.0.0.1:8000'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Reinicia cada worker de tempos a tempos (com desfasamento) para conter fugas de memória
+max_requests = 2000
+max_requests_jitter = 200
+
+# Pedidos em simultâneo por processo -> ligações ao banco por processo
+if worker_class == 'sync':
+    concurrency = 1
+elif worker_class == 'gthread':
+    concurrency = threads
+else:
+    # Com gevent nem todos os pedidos usam o banco ao mesmo tempo; os restantes esperam no pool
+    concurrency = min(worker_connections, 20)
+os.environ.setdefault('DB_POOL_SIZE', str(concurrency))
+os.environ.setdefault('DB_MAX_OVERFLOW', str(max(concurrency // 2, 1)))
+os.environ.setdefault('DB_STATEMENT_TIMEOUT_MS', str(max(timeout - 5, 1) * 1000))
+# Processos que calculam hashes de palavras-passe: ao todo cerca de um por CPU (ver passwords.py)
+os.environ.setdefault('PASSWORD_HASH_WORKERS', str(max(cpus // workers, 1)))
+# Métricas de todos os workers somadas em /metrics (ver metrics.py). Definido aqui, antes de
+# os workers importarem a aplicação.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'pensao-metrics'))
+
+
+def on_starting(server):
+    # Build dos ficheiros estáticos antes de os workers carregarem a aplicação (ver assets.py)
+    import assets
+    assets.build()
+    # Os contadores recomeçam a cada arranque do servidor: apaga os ficheiros da execução anterior
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    # Retira os pedidos em curso de um worker terminado de http_requests_in_progress
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Antes de o worker carregar a aplicação: com APP_WARMUP=sync, create_app() já abre as
+    # ligações do pool (ver warmup.py), que têm de ser cooperativas desde o início
+    if worker_class == 'gevent':
+        import database
+        database.make_psycopg2_green()
@@ -0,0 +1,59 @@
+# json_provider.py
+# Provider JSON do Flask (usado por jsonify) com o orjson, quando instalado.
+#
+# A saída é byte a byte igual à do provider padrão do Flask em produção: chaves ordenadas,
+# sem espaços, caracteres não-ASCII como \uXXXX e datas no formato HTTP. O orjson grava o
+# texto não-ASCII (nomes com acentos) em UTF-8, que é depois escapado como no json padrão.
+# Quando o orjson não aceita o objeto (chaves que não são texto, inteiros enormes) ou não
+# está instalado, usa-se o json da biblioteca padrão, como antes. Em modo debug a saída
+# continua indentada pelo provider padrão.
+# Exceções conhecidas, com o mesmo valor para quem lê o JSON: floats abaixo de 1e-4 ou a
+# partir de 1e16 saem noutra notação (1e16 em vez de 1e+16, 0.00001 em vez de 1e-05), e
+# NaN/Infinity (que não são JSON válido) saem como null pelo orjson.
+
+import codecs
+from json.encoder import encode_basestring_ascii
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+
+def _escape_non_ascii(error):
+    # Cada sequência de caracteres não-ASCII passa a \uXXXX (pares substitutos acima de
+    # U+FFFF), tal como o json padrão com ensure_ascii
+    return encode_basestring_ascii(error.object[error.start:error.end])[1:-1], error.end
+
+
+codecs.register_error('json_provider.escape', _escape_non_ascii)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def _orjson_dumps(self, obj):
+        if orjson is None:
+            return None
+        try:
+            data = orjson.dumps(
+                obj,
+                default=self.default,
+                # Datas e dataclasses passam pelo mesmo 'default' do provider do Flask
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return None
+        if not data.isascii():
+            data = data.decode().encode('ascii', 'json_provider.escape')
+        return data
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._orjson_dumps(obj)
+        if data is None:
+            data = self.dumps(obj, separators=(',', ':')).encode()
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
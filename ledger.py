@@ -0,0 +1,95 @@
+# ledger.py
+# Motor de cálculo da dívida (Montante Devedor) de cada filho.
+# Os totais pagos vêm da tabela child_month_balance (mantida por balances.py), por isso
+# o custo depende do número de meses acompanhados e não do número de pagamentos.
+# O valor devido é sempre o valor mensal atual do filho, aplicado na leitura.
+
+from datetime import date
+
+import balances
+
+# Estados usados pelo frontend (classes CSS .verde, .amarelo e .vermelho)
+STATUS_PAGO = 'verde'
+STATUS_PARCIAL = 'amarelo'
+STATUS_NAO_PAGO = 'vermelho'
+
+
+def years_to_track(child, today=None):
+    # Apenas os anos habilitados e que não estão no futuro contam para a dívida
+    today = today or date.today()
+    years = set()
+    for year in child.enabled_years or []:
+        try:
+            year = int(year)
+        except (ValueError, TypeError):
+            continue
+        if year <= today.year:
+            years.add(year)
+    return sorted(years)
+
+
+def monthly_paid_totals(child_ids, years):
+    # Devolve { (child_id, ano, mês): (total_pago, quantidade_de_pagamentos) }
+    # agrupado pela data do pagamento, tal como o frontend organiza os meses.
+    # Lê da tabela child_month_balance: no máximo 12 linhas por ano e por filho.
+    return balances.paid_totals(child_ids, years)
+
+
+def month_status(due, paid):
+    if paid >= due:
+        return STATUS_PAGO
+    if paid > 0:
+        return STATUS_PARCIAL
+    return STATUS_NAO_PAGO
+
+
+def build_ledger(child, today=None, totals=None):
+    # Calcula, mês a mês, o valor devido, o valor pago, a diferença em falta e o estado.
+    # 'totals' pode ser passado já calculado (ex.: para vários filhos de uma vez).
+    today = today or date.today()
+    years = years_to_track(child, today)
+    if totals is None:
+        totals = monthly_paid_totals([child.id], years)
+
+    due = float(child.monthly_alimony_value)
+    months = []
+    total_due = 0.0
+    total_paid = 0.0
+    status = STATUS_PAGO
+
+    for year in years:
+        last_month = today.month if year == today.year else 12
+        for month in range(1, last_month + 1):
+            paid, count = totals.get((child.id, year, month), (0.0, 0))
+            shortfall = max(due - paid, 0.0)
+            current_status = month_status(due, paid)
+
+            if current_status == STATUS_NAO_PAGO:
+                status = STATUS_NAO_PAGO
+            elif current_status == STATUS_PARCIAL and status != STATUS_NAO_PAGO:
+                status = STATUS_PARCIAL
+
+            total_due += shortfall
+            total_paid += paid
+            months.append({
+                'year': year,
+                'month': month,
+                'due': round(due, 2),
+                'paid': round(paid, 2),
+                'payments_count': count,
+                'shortfall': round(shortfall, 2),
+                'status': current_status,
+            })
+
+    if total_due == 0:
+        status = STATUS_PAGO
+
+    return {
+        'child_id': child.id,
+        'monthly_alimony_value': due,
+        'enabled_years': years,
+        'total_paid': round(total_paid, 2),
+        'total_due': round(total_due, 2),
+        'status': status,
+        'months': months,
+    }
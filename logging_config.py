@@ -0,0 +1,70 @@
+# logging_config.py
+# Logging estruturado: cada evento é uma linha JSON no stdout, com os campos passados em
+# 'extra' (ex.: logger.info('Login falhou', extra={'user_id': 1})).
+# Os pedidos só colocam o registo numa fila (QueueHandler); a serialização e a escrita no
+# stdout são feitas por uma thread própria (QueueListener), fora do caminho do pedido.
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, UTC
+
+# Atributos que todo o LogRecord tem; os restantes vieram de 'extra'
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, UTC).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve a mensagem e a exceção já na thread do pedido (os argumentos podem mudar
+        # depois), mas deixa o JSON para o listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level=None):
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level or os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+    _listener.start()
+    # Escreve o que ainda estiver na fila quando o processo termina
+    atexit.register(_listener.stop)
@@ -0,0 +1,155 @@
+# metrics.py
+# Métricas dos pedidos HTTP no formato de texto do Prometheus (GET /metrics).
+#
+# Por rota (o padrão da rota, ex.: /api/payments/<int:child_id>, não o URL concreto):
+#   http_requests_total                     pedidos por método, rota e código de estado
+#   http_request_duration_seconds           histograma da latência
+#   http_request_sql_statements             histograma do número de consultas SQL por pedido
+#   http_request_sql_duration_seconds       histograma do tempo gasto no banco por pedido
+#   http_requests_in_progress               pedidos em curso
+# O débito (pedidos por segundo) obtém-se com rate(http_requests_total[1m]).
+#
+# As consultas são contadas pelos eventos do SQLAlchemy (before/after_cursor_execute) e
+# associadas ao pedido em curso através de uma ContextVar.
+#
+# Os valores são guardados pelo prometheus_client. Com PROMETHEUS_MULTIPROC_DIR definido (o
+# gunicorn.conf.py define-o), cada worker grava os seus valores nessa pasta e /metrics devolve
+# a soma de todos, qualquer que seja o worker que atende o pedido; sem ele (um só processo),
+# os valores ficam em memória.
+#
+# /metrics só existe com METRICS_TOKEN definido e exige 'Authorization: Bearer <token>';
+# sem token responde 404.
+
+import hmac
+import logging
+import os
+import time
+from contextvars import ContextVar
+
+import prometheus_client
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+# Pedidos mais lentos do que isto ficam registados no log com nível WARNING
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))
+
+_request_stats = ContextVar('request_sql_stats', default=None)
+
+
+# Sem as séries *_created, que o formato de texto do Prometheus não precisa
+prometheus_client.disable_created_metrics()
+
+REQUESTS = Counter('http_requests', 'Pedidos HTTP por método, rota e código de estado.',
+                   ['method', 'route', 'status'])
+LATENCY = Histogram('http_request_duration_seconds', 'Latência dos pedidos HTTP.',
+                    ['method', 'route'], buckets=LATENCY_BUCKETS)
+SQL_STATEMENTS = Histogram('http_request_sql_statements', 'Consultas SQL executadas por pedido.',
+                           ['method', 'route'], buckets=SQL_COUNT_BUCKETS)
+SQL_DURATION = Histogram('http_request_sql_duration_seconds', 'Tempo gasto no banco de dados por pedido.',
+                         ['method', 'route'], buckets=LATENCY_BUCKETS)
+# livesum: soma dos workers vivos (os valores de um worker terminado são descartados)
+IN_PROGRESS = Gauge('http_requests_in_progress', 'Pedidos HTTP em curso.', multiprocess_mode='livesum')
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry)
+
+
+# --- EVENTOS DO SQLALCHEMY (todos os engines) ---
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats['sql_count'] += 1
+        stats['sql_time'] += time.perf_counter() - started
+
+
+# --- MIDDLEWARE ---
+
+def _before_request():
+    stats = {'started': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0}
+    g.metrics_stats = stats
+    _request_stats.set(stats)
+    IN_PROGRESS.inc()
+
+
+def _finish(stats, method, route, status):
+    _request_stats.set(None)
+    duration = time.perf_counter() - stats['started']
+    IN_PROGRESS.dec()
+    REQUESTS.labels(method, route, status).inc()
+    LATENCY.labels(method, route).observe(duration)
+    SQL_STATEMENTS.labels(method, route).observe(stats['sql_count'])
+    SQL_DURATION.labels(method, route).observe(stats['sql_time'])
+
+    fields = {
+        'method': method,
+        'route': route,
+        'status': status,
+        'duration_ms': round(duration * 1000, 2),
+        'sql_count': stats['sql_count'],
+        'sql_ms': round(stats['sql_time'] * 1000, 2),
+    }
+    if duration >= SLOW_REQUEST_SECONDS:
+        logger.warning('Pedido lento', extra=fields)
+    else:
+        logger.info('Pedido', extra=fields)
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _after_request(response):
+    stats = g.pop('metrics_stats', None)
+    if stats is None:
+        return response
+    args = (stats, request.method, _route(), response.status_code)
+    if response.is_streamed:
+        # Exportações: as consultas correm enquanto o corpo é enviado, por isso o pedido
+        # só é medido quando o servidor fecha a resposta
+        response.call_on_close(lambda: _finish(*args))
+    else:
+        _finish(*args)
+    return response
+
+
+def _teardown_request(error):
+    # Pedidos interrompidos por uma exceção não passam pelo after_request
+    stats = g.pop('metrics_stats', None)
+    if stats is not None:
+        _finish(stats, request.method, _route(), 500)
+
+
+def metrics_view():
+    token = os.environ.get('METRICS_TOKEN')
+    if not token:
+        return Response('Não encontrado\n', status=404, mimetype='text/plain')
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return Response('Não autorizado\n', status=401, mimetype='text/plain')
+    return Response(render(), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,161 @@
+# migrations.py
+# Migrações versionadas do esquema do banco de dados.
+# Cada migração é aplicada numa transação e registada na tabela 'schema_migrations'.
+# As migrações são idempotentes (checkfirst / IF NOT EXISTS), porque num banco novo a
+# migração 1 já cria as tabelas com o formato atual dos modelos.
+#
+# Uso: flask --app app db-upgrade   |   flask --app app db-status
+
+from datetime import datetime, UTC
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect
+
+from models import db, User, Child, Payment, PasswordResetToken, ChildMonthBalance, SyncTombstone, SyncMutation, EmailOutbox
+import balances
+
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def _create_indexes(conn, table, names):
+    # Só os índices indicados: o modelo tem também índices sobre colunas que apenas
+    # migrações posteriores acrescentam
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def _0001_base_tables(conn):
+    # Tabelas originais da aplicação (já existentes nos bancos em produção)
+    for model in (User, Child, Payment, PasswordResetToken):
+        model.__table__.create(conn, checkfirst=True)
+
+
+def _0002_child_month_balance(conn):
+    if inspect(conn).has_table(ChildMonthBalance.__tablename__):
+        return
+    ChildMonthBalance.__table__.create(conn)
+    conn.execute(
+        db.insert(ChildMonthBalance).from_select(
+            ['child_id', 'year', 'month', 'total_paid', 'payment_count'],
+            balances.totals_from_payments_query(),
+        )
+    )
+
+
+def _0003_composite_indexes(conn):
+    _create_indexes(conn, Child.__table__, {'ix_children_user_id_id'})
+    _create_indexes(conn, Payment.__table__, {'ix_payments_child_id_payment_date'})
+    _create_indexes(conn, PasswordResetToken.__table__,
+                    {'ix_password_reset_tokens_token_used', 'ix_password_reset_tokens_user_id'})
+
+
+def _add_column_if_missing(conn, table_name, column_name, ddl):
+    columns = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    if column_name not in columns:
+        conn.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}")
+
+
+def _0004_users_data_version(conn):
+    _add_column_if_missing(conn, 'users', 'data_version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _0005_sync(conn):
+    _add_column_if_missing(conn, 'children', 'sync_version', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column_if_missing(conn, 'payments', 'sync_version', 'INTEGER NOT NULL DEFAULT 0')
+    SyncTombstone.__table__.create(conn, checkfirst=True)
+    SyncMutation.__table__.create(conn, checkfirst=True)
+    _create_indexes(conn, Child.__table__, {'ix_children_user_id_sync_version'})
+    _create_indexes(conn, Payment.__table__, {'ix_payments_child_id_sync_version'})
+    _create_indexes(conn, SyncTombstone.__table__, {'ix_sync_tombstones_user_id_version'})
+
+
+def _0006_email_outbox(conn):
+    EmailOutbox.__table__.create(conn, checkfirst=True)
+
+
+def _child_foreign_key(conn, table_name):
+    for foreign_key in inspect(conn).get_foreign_keys(table_name):
+        if foreign_key['referred_table'] == 'children' and foreign_key['constrained_columns'] == ['child_id']:
+            return foreign_key
+    return None
+
+
+def _rebuild_sqlite_table(conn, table):
+    # O SQLite não altera restrições de tabelas existentes: recria a tabela com o formato
+    # atual do modelo e copia os dados. Linhas de filhos que já não existem (possíveis no
+    # SQLite, que não verificava as chaves estrangeiras) não são copiadas.
+    old_name = f'{table.name}_old'
+    old_columns = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    for index in inspect(conn).get_indexes(table.name):
+        conn.exec_driver_sql(f'DROP INDEX {index["name"]}')
+    conn.exec_driver_sql(f'ALTER TABLE {table.name} RENAME TO {old_name}')
+    table.create(conn)
+    columns = ', '.join(column.name for column in table.columns if column.name in old_columns)
+    conn.exec_driver_sql(
+        f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old_name} '
+        f'WHERE child_id IN (SELECT id FROM children)'
+    )
+    conn.exec_driver_sql(f'DROP TABLE {old_name}')
+
+
+def _0007_child_on_delete_cascade(conn):
+    # Pagamentos e totais mensais apagados pelo banco quando o filho é excluído
+    dialect = conn.dialect.name
+    for table in (Payment.__table__, ChildMonthBalance.__table__):
+        foreign_key = _child_foreign_key(conn, table.name)
+        if foreign_key is None or (foreign_key.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+            continue
+        if dialect == 'postgresql':
+            name = foreign_key['name']
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} DROP CONSTRAINT {name}')
+            conn.exec_driver_sql(
+                f'ALTER TABLE {table.name} ADD CONSTRAINT {name} '
+                f'FOREIGN KEY (child_id) REFERENCES children (id) ON DELETE CASCADE'
+            )
+        elif dialect == 'sqlite':
+            _rebuild_sqlite_table(conn, table)
+        else:
+            raise RuntimeError(f"Banco de dados não suportado: {dialect}")
+
+
+MIGRATIONS = [
+    (1, 'Tabelas base (users, children, payments, password_reset_tokens)', _0001_base_tables),
+    (2, 'Tabela child_month_balance preenchida a partir de payments', _0002_child_month_balance),
+    (3, 'Índices compostos para as consultas das rotas da API', _0003_composite_indexes),
+    (4, 'Coluna users.data_version para ETags', _0004_users_data_version),
+    (5, 'Sincronização incremental (sync_version, sync_tombstones, sync_mutations)', _0005_sync),
+    (6, 'Tabela email_outbox para envio assíncrono de e-mails', _0006_email_outbox),
+    (7, 'ON DELETE CASCADE em payments e child_month_balance', _0007_child_on_delete_cascade),
+]
+
+
+def applied_versions():
+    schema_migrations.create(db.engine, checkfirst=True)
+    with db.engine.connect() as conn:
+        return {row.version for row in conn.execute(schema_migrations.select())}
+
+
+def pending_migrations():
+    applied = applied_versions()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+def upgrade(echo=print):
+    applied = []
+    for version, description, migrate in pending_migrations():
+        with db.engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.now(UTC),
+            ))
+        echo(f"Migração {version:04d} aplicada: {description}")
+        applied.append(version)
+    return applied
@@ -0,0 +1,247 @@
+# models.py
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from datetime import datetime, UTC
+
+import passwords
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    # Nas rotas marcadas com replica.read_only, as consultas SELECT vão para a réplica de
+    # leitura (bind 'replica'); escritas e flushes usam sempre o banco principal
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if getattr(clause, 'is_select', False) and has_app_context() and g.get('use_replica'):
+            return db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# --- MODELOS DO BANCO DE DADOS ---
+
+class User(db.Model):
+    __tablename__ = 'users'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    surname = db.Column(db.String(255), nullable=False)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    # Incrementado a cada alteração nos filhos/pagamentos do utilizador (ver versioning.py)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    children = db.relationship('Child', backref='user', lazy=True, cascade="all, delete-orphan")
+    reset_tokens = db.relationship('PasswordResetToken', backref='user', lazy=True, cascade="all, delete-orphan")
+
+    def set_password(self, password):
+        self.password_hash = passwords.hash_password(password)
+
+    def check_password(self, password):
+        # Palavras-passe em texto simples ou com um custo antigo ficam com o hash atual
+        # (gravado no commit seguinte)
+        valid, new_hash = passwords.verify_password(self.password_hash, password)
+        if new_hash is not None:
+            self.password_hash = new_hash
+        return valid
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'surname': self.surname,
+            'email': self.email
+        }
+
+class Child(db.Model):
+    __tablename__ = 'children'
+    __table_args__ = (
+        # Listagem dos filhos de um utilizador e verificação de posse (id + user_id)
+        db.Index('ix_children_user_id_id', 'user_id', 'id'),
+        # Sincronização incremental (GET /api/sync?since=)
+        db.Index('ix_children_user_id_sync_version', 'user_id', 'sync_version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    full_name = db.Column(db.String(255), nullable=False)
+    gender = db.Column(db.String(50), nullable=True)
+    date_of_birth = db.Column(db.Date, nullable=False)
+    monthly_alimony_value = db.Column(db.Float, nullable=False)
+    enabled_years = db.Column(db.JSON, nullable=True)
+    # Versão dos dados do utilizador (users.data_version) na última alteração deste filho
+    sync_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # passive_deletes: ao excluir um filho, os pagamentos e totais são apagados pelo banco
+    # (ON DELETE CASCADE) sem serem carregados um a um
+    payments = db.relationship('Payment', backref='child', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+    month_balances = db.relationship('ChildMonthBalance', backref='child', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'full_name': self.full_name,
+            'gender': self.gender,
+            'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
+            'monthly_alimony_value': self.monthly_alimony_value,
+            'enabled_years': self.enabled_years
+        }
+
+    # Listagens sem criar objetos: apenas as colunas de to_dict(), lidas como tuplos
+    @classmethod
+    def list_columns(cls):
+        return (cls.id, cls.user_id, cls.full_name, cls.gender, cls.date_of_birth,
+                cls.monthly_alimony_value, cls.enabled_years)
+
+    @staticmethod
+    def row_to_dict(row):
+        # O mesmo resultado de to_dict() a partir de uma linha de list_columns()
+        child_id, user_id, full_name, gender, date_of_birth, monthly_alimony_value, enabled_years = row
+        return {
+            'id': child_id,
+            'user_id': user_id,
+            'full_name': full_name,
+            'gender': gender,
+            'date_of_birth': date_of_birth.isoformat() if date_of_birth else None,
+            'monthly_alimony_value': monthly_alimony_value,
+            'enabled_years': enabled_years
+        }
+
+class Payment(db.Model):
+    __tablename__ = 'payments'
+    __table_args__ = (
+        # Pagamentos de um filho ordenados pela data (listagens, exportações e agregações por mês)
+        db.Index('ix_payments_child_id_payment_date', 'child_id', 'payment_date', 'id'),
+        db.Index('ix_payments_child_id_sync_version', 'child_id', 'sync_version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    child_id = db.Column(db.Integer, db.ForeignKey('children.id', ondelete='CASCADE'), nullable=False)
+    value_paid = db.Column(db.Float, nullable=False)
+    payment_date = db.Column(db.Date, nullable=False)
+    month_reference = db.Column(db.Integer, nullable=True)
+    year_reference = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+    # Versão dos dados do utilizador (users.data_version) na última alteração deste pagamento
+    sync_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'child_id': self.child_id,
+            'amount': self.value_paid,
+            'payment_date': self.payment_date.isoformat() if self.payment_date else None,
+            'month_reference': self.month_reference,
+            'year_reference': self.year_reference,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    # Listagens sem criar objetos: apenas as colunas de to_dict(), lidas como tuplos
+    @classmethod
+    def list_columns(cls):
+        return (cls.id, cls.child_id, cls.value_paid, cls.payment_date,
+                cls.month_reference, cls.year_reference, cls.created_at)
+
+    @staticmethod
+    def row_to_dict(row):
+        # O mesmo resultado de to_dict() a partir de uma linha de list_columns()
+        payment_id, child_id, value_paid, payment_date, month_reference, year_reference, created_at = row
+        return {
+            'id': payment_id,
+            'child_id': child_id,
+            'amount': value_paid,
+            'payment_date': payment_date.isoformat() if payment_date else None,
+            'month_reference': month_reference,
+            'year_reference': year_reference,
+            'created_at': created_at.isoformat() if created_at else None
+        }
+
+# Totais pagos por filho e mês (pela data do pagamento), mantidos em conjunto com a tabela
+# 'payments' para que a leitura da dívida não precise de percorrer todo o histórico.
+class ChildMonthBalance(db.Model):
+    __tablename__ = 'child_month_balance'
+    child_id = db.Column(db.Integer, db.ForeignKey('children.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    total_paid = db.Column(db.Float, nullable=False, default=0)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'child_id': self.child_id,
+            'year': self.year,
+            'month': self.month,
+            'total_paid': self.total_paid,
+            'payment_count': self.payment_count
+        }
+
+# Registo de exclusões, para que a sincronização incremental informe o cliente
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_user_id_version', 'user_id', 'version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    entity_type = db.Column(db.String(20), nullable=False) # 'child' ou 'payment'
+    entity_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+# Mutações enviadas pelo cliente offline (POST /api/sync), guardadas pela chave de
+# idempotência gerada no cliente para que um reenvio não aplique a mesma alteração duas vezes
+class SyncMutation(db.Model):
+    __tablename__ = 'sync_mutations'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_sync_mutations_user_id_key'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    idempotency_key = db.Column(db.String(255), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+# E-mails a enviar pelo worker em segundo plano (ver email_outbox.py)
+class EmailOutbox(db.Model):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    text_content = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending, sending, sent, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(UTC))
+    locked_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+class PasswordResetToken(db.Model):
+    __tablename__ = 'password_reset_tokens'
+    __table_args__ = (
+        # Procura de tokens ainda não utilizados (reset_password)
+        db.Index('ix_password_reset_tokens_token_used', 'token', 'used'),
+        # Remoção em cascata dos tokens de um utilizador
+        db.Index('ix_password_reset_tokens_user_id', 'user_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    token = db.Column(db.String(255), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    used = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(UTC))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'token': self.token,
+            'expires_at': self.expires_at.isoformat(),
+            'used': self.used,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,137 @@
+# passwords.py
+# Hash das palavras-passe (scrypt ou PBKDF2, no formato do werkzeug.security).
+#
+# O cálculo de um hash custa dezenas a centenas de milissegundos de CPU. Para não ocupar o
+# worker que atende o pedido (e, com gthread, as outras threads do mesmo processo), os
+# hashes são calculados num pool de processos, limitado em tamanho e em pedidos à espera.
+# Quando a fila está cheia durante mais de PASSWORD_HASH_WAIT_SECONDS é levantado
+# HashingBusy (a API responde 503 com Retry-After).
+#
+# Palavras-passe antigas, guardadas em texto simples, continuam a ser aceites e são
+# convertidas para hash no login seguinte; o mesmo acontece aos hashes feitos com um
+# PASSWORD_HASH_METHOD diferente do atual (ex.: depois de aumentar o custo).
+#
+# Variáveis de ambiente:
+#   PASSWORD_HASH_METHOD        método e custo no formato do werkzeug (por omissão
+#                               scrypt:32768:8:1; ex.: scrypt:65536:8:1, pbkdf2:sha256:600000)
+#   PASSWORD_HASH_WORKERS       processos do pool por processo da aplicação (por omissão o
+#                               número de CPUs; 0 = calcular no próprio pedido)
+#   PASSWORD_HASH_MAX_PENDING   hashes em curso ou à espera no pool (por omissão 8 x processos)
+#   PASSWORD_HASH_WAIT_SECONDS  espera máxima por um lugar na fila (por omissão 5)
+#
+# Os processos do pool importam o módulo principal do programa (como em qualquer uso de
+# multiprocessing com spawn/forkserver): scripts que usem a aplicação diretamente precisam de
+# if __name__ == '__main__'. O gunicorn, o comando flask e os benchmarks já o têm.
+#
+# Medir o débito de logins com cada custo: python -m benchmarks.passwords
+
+import functools
+import hmac
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', max(HASH_WORKERS, 1) * 8))
+HASH_WAIT_SECONDS = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS', 5))
+
+_HASHED_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = threading.BoundedSemaphore(HASH_MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _get_executor():
+    # Um pool por processo, criado no primeiro uso (depois do fork dos workers do Gunicorn).
+    # Os processos do pool são criados pelo forkserver, não por fork de um processo com threads.
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context(start_method),
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _discard_executor(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(function, *args):
+    if HASH_WORKERS <= 0:
+        return function(*args)
+    if not _slots.acquire(timeout=HASH_WAIT_SECONDS):
+        raise HashingBusy()
+    try:
+        executor = _get_executor()
+        try:
+            return executor.submit(function, *args).result()
+        except BrokenProcessPool as e:
+            # Um processo do pool morreu (ex.: falta de memória): o pool é recriado no
+            # próximo pedido e este hash é calculado aqui
+            logger.warning('Pool de hash de palavras-passe reiniciado', extra={'error': str(e)})
+            _discard_executor(executor)
+            return function(*args)
+    finally:
+        _slots.release()
+
+
+@functools.cache
+def _current_method():
+    # Prefixo que generate_password_hash grava para HASH_METHOD ('scrypt' -> 'scrypt:32768:8:1')
+    return _run(generate_password_hash, '', HASH_METHOD).split('$', 1)[0]
+
+
+def warm_up():
+    # Arranca os processos do pool antes do primeiro login (ver warmup.py)
+    if HASH_WORKERS > 0:
+        executor = _get_executor()
+        for future in [executor.submit(os.getpid) for _ in range(HASH_WORKERS)]:
+            future.result()
+    _current_method()
+
+
+def is_hashed(stored):
+    return stored.startswith(_HASHED_PREFIXES) and stored.count('$') == 2
+
+
+def needs_rehash(stored):
+    return not is_hashed(stored) or stored.split('$', 1)[0] != _current_method()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, HASH_METHOD)
+
+
+def verify_password(stored, password):
+    # Devolve (correta, novo_hash); novo_hash só é diferente de None quando a palavra-passe
+    # está correta e o valor guardado deve ser substituído
+    if is_hashed(stored):
+        valid = _run(check_password_hash, stored, password)
+    else:
+        # Registo antigo em texto simples
+        valid = hmac.compare_digest(stored.encode(), password.encode())
+    if valid and needs_rehash(stored):
+        return True, hash_password(password)
+    return valid, None
@@ -0,0 +1,207 @@
+# payment_export.py
+# Exportação do histórico de pagamentos (por filho ou de todos os filhos do utilizador)
+# em CSV ou NDJSON. As linhas são lidas do banco com um cursor no servidor (yield_per)
+# e escritas na resposta à medida que chegam, por isso a memória usada não depende do
+# tamanho do histórico. Cada mês acompanhado recebe uma linha de subtotal com o valor
+# devido e a diferença em falta calculados pelo ledger.
+
+import csv
+import io
+import json
+from datetime import date
+
+from models import db, Child, Payment
+import ledger
+
+YIELD_PER = 1000
+CSV_FLUSH_ROWS = 500
+
+CSV_COLUMNS = [
+    'record_type', 'child_id', 'child_name', 'year', 'month',
+    'payment_id', 'payment_date', 'amount', 'month_reference', 'year_reference',
+    'month_total_paid', 'month_payments_count', 'month_due', 'month_shortfall', 'month_status',
+    'total_paid', 'total_due',
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _year_range_filter(column, from_year, to_year):
+    conditions = []
+    if from_year is not None:
+        conditions.append(column >= date(from_year, 1, 1))
+    if to_year is not None:
+        conditions.append(column < date(to_year + 1, 1, 1))
+    return conditions
+
+
+def load_children(user_id, child_id=None):
+    query = Child.query.filter_by(user_id=user_id)
+    if child_id is not None:
+        query = query.filter_by(id=child_id)
+    return query.order_by(Child.id).all()
+
+
+def _ledger_months(children, from_year, to_year):
+    # { child_id: { (ano, mês): mês_do_ledger } } para os meses dentro do intervalo pedido
+    today = date.today()
+    years = sorted({year for child in children for year in ledger.years_to_track(child, today)})
+    totals = ledger.monthly_paid_totals([child.id for child in children], years)
+    result = {}
+    for child in children:
+        child_ledger = ledger.build_ledger(child, today=today, totals=totals)
+        result[child.id] = {
+            (month['year'], month['month']): month
+            for month in child_ledger['months']
+            if (from_year is None or month['year'] >= from_year) and (to_year is None or month['year'] <= to_year)
+        }
+    return result
+
+
+def _month_subtotal(child, year, month, paid, count, ledger_month):
+    row = {
+        'record_type': 'month_subtotal',
+        'child_id': child.id,
+        'child_name': child.full_name,
+        'year': year,
+        'month': month,
+        'month_total_paid': round(paid, 2),
+        'month_payments_count': count,
+    }
+    if ledger_month:
+        due = ledger_month['due']
+        row['month_due'] = due
+        row['month_shortfall'] = round(max(due - paid, 0.0), 2)
+        row['month_status'] = ledger.month_status(due, paid)
+    return row
+
+
+def _child_total(child, total_paid, total_due):
+    return {
+        'record_type': 'child_total',
+        'child_id': child.id,
+        'child_name': child.full_name,
+        'total_paid': round(total_paid, 2),
+        'total_due': round(total_due, 2),
+    }
+
+
+def export_rows(children, from_year=None, to_year=None):
+    # Gera dicionários pela ordem filho -> data do pagamento, intercalando os subtotais
+    # mensais (incluindo os meses acompanhados sem nenhum pagamento).
+    if not children:
+        return
+    children_by_id = {child.id: child for child in children}
+    ledger_months = _ledger_months(children, from_year, to_year)
+
+    stmt = (
+        db.select(
+            Payment.id,
+            Payment.child_id,
+            Payment.value_paid,
+            Payment.payment_date,
+            Payment.month_reference,
+            Payment.year_reference,
+        )
+        .where(Payment.child_id.in_(children_by_id), *_year_range_filter(Payment.payment_date, from_year, to_year))
+        .order_by(Payment.child_id, Payment.payment_date, Payment.id)
+    )
+    result = db.session.execute(stmt, execution_options={'yield_per': YIELD_PER})
+
+    state = {'child': None, 'key': None, 'paid': 0.0, 'count': 0, 'pending': [], 'total_paid': 0.0, 'total_due': 0.0}
+
+    def close_month():
+        child, key = state['child'], state['key']
+        if key is None:
+            return
+        ledger_month = ledger_months[child.id].get(key)
+        row = _month_subtotal(child, key[0], key[1], state['paid'], state['count'], ledger_month)
+        state['total_due'] += row.get('month_shortfall', 0.0)
+        state['key'], state['paid'], state['count'] = None, 0.0, 0
+        yield row
+
+    def empty_months_before(key):
+        # Meses do ledger sem pagamentos que vêm antes de 'key' (ou todos, se key for None)
+        child = state['child']
+        while state['pending'] and (key is None or state['pending'][0] < key):
+            year, month = state['pending'].pop(0)
+            row = _month_subtotal(child, year, month, 0.0, 0, ledger_months[child.id][(year, month)])
+            state['total_due'] += row.get('month_shortfall', 0.0)
+            yield row
+
+    def close_child():
+        if state['child'] is None:
+            return
+        yield from close_month()
+        yield from empty_months_before(None)
+        yield _child_total(state['child'], state['total_paid'], state['total_due'])
+
+    def open_child(child):
+        state.update(child=child, key=None, paid=0.0, count=0, total_paid=0.0, total_due=0.0,
+                     pending=sorted(ledger_months[child.id]))
+
+    remaining_children = list(children)
+    for payment_id, child_id, value_paid, payment_date, month_reference, year_reference in result:
+        if state['child'] is None or state['child'].id != child_id:
+            yield from close_child()
+            # Filhos sem pagamentos no intervalo também aparecem, com os meses em dívida
+            while remaining_children[0].id != child_id:
+                open_child(remaining_children.pop(0))
+                yield from close_child()
+            open_child(remaining_children.pop(0))
+
+        key = (payment_date.year, payment_date.month)
+        if key != state['key']:
+            yield from close_month()
+            yield from empty_months_before(key)
+            if state['pending'] and state['pending'][0] == key:
+                state['pending'].pop(0)
+            state['key'] = key
+
+        state['paid'] += value_paid
+        state['count'] += 1
+        state['total_paid'] += value_paid
+        yield {
+            'record_type': 'payment',
+            'child_id': child_id,
+            'child_name': state['child'].full_name,
+            'year': key[0],
+            'month': key[1],
+            'payment_id': payment_id,
+            'payment_date': payment_date.isoformat(),
+            'amount': value_paid,
+            'month_reference': month_reference,
+            'year_reference': year_reference,
+        }
+
+    yield from close_child()
+    for child in remaining_children:
+        open_child(child)
+        yield from close_child()
+
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
@@ -0,0 +1,190 @@
+# payment_import.py
+# Importação em massa de pagamentos a partir de CSV ou NDJSON (um objeto JSON por linha).
+# O corpo do pedido é lido linha a linha, sem ser carregado inteiro em memória, e as
+# linhas válidas são inseridas em blocos (INSERT com vários registos) numa só transação.
+
+import codecs
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, date
+
+from models import db, Child, Payment
+import balances
+import versioning
+
+CHUNK_SIZE = 1000
+# Limite de erros detalhados na resposta (os restantes são apenas contados)
+MAX_REPORTED_ERRORS = 1000
+
+CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(content_type, requested_format=None):
+    if requested_format:
+        if requested_format in ('csv', 'ndjson'):
+            return requested_format
+        raise ImportFormatError("Formato inválido. Use 'csv' ou 'ndjson'.")
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if mimetype in CSV_CONTENT_TYPES:
+        return 'csv'
+    if mimetype in NDJSON_CONTENT_TYPES:
+        return 'ndjson'
+    raise ImportFormatError("Tipo de conteúdo não suportado. Envie text/csv ou application/x-ndjson.")
+
+
+def _iter_lines(stream):
+    # Decodifica o corpo em UTF-8 aos poucos (aceita BOM, comum em ficheiros do Excel)
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r') + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_rows(stream, import_format):
+    # Gera (número_da_linha, dicionário | None, erro | None)
+    lines = _iter_lines(stream)
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None, 'JSON inválido'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Cada linha deve ser um objeto JSON'
+            continue
+        yield line_number, row, None
+
+
+def _empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_payment_row(row):
+    # Valida uma linha com as mesmas regras de POST /api/payments.
+    # Devolve (valores_para_insert, None) ou (None, mensagem_de_erro).
+    child_id = row.get('child_id')
+    amount = row.get('amount')
+    payment_date_str = row.get('payment_date')
+    month_reference = row.get('month_reference')
+    year_reference = row.get('year_reference')
+
+    if _empty(child_id) or _empty(amount) or _empty(payment_date_str):
+        return None, 'Dados em falta'
+
+    try:
+        child_id = int(child_id)
+        payment_date = datetime.strptime(str(payment_date_str).strip(), '%Y-%m-%d').date()
+        amount_float = float(amount)
+        month_reference = None if _empty(month_reference) else int(month_reference)
+        year_reference = None if _empty(year_reference) else int(year_reference)
+    except (ValueError, TypeError):
+        return None, 'Formato de filho, data, valor, mês ou ano inválido'
+
+    if payment_date > date.today():
+        return None, 'A data de pagamento não pode ser no futuro'
+
+    return {
+        'child_id': child_id,
+        'value_paid': amount_float,
+        'payment_date': payment_date,
+        'month_reference': month_reference,
+        'year_reference': year_reference,
+    }, None
+
+
+def _flush(chunk, version):
+    for values in chunk:
+        values['sync_version'] = version
+    db.session.execute(db.insert(Payment), chunk)
+    # Atualiza child_month_balance com uma instrução por mês afetado, não por pagamento
+    deltas = defaultdict(lambda: [0.0, 0])
+    for values in chunk:
+        key = (values['child_id'], values['payment_date'].replace(day=1))
+        deltas[key][0] += values['value_paid']
+        deltas[key][1] += 1
+    for (child_id, month_start), (amount, count) in deltas.items():
+        balances.apply_delta(child_id, month_start, amount, count)
+
+
+def import_payments(stream, import_format, user_id):
+    owned_children = {}
+    chunk = []
+    imported = 0
+    rejected = 0
+    version = None
+    errors = []
+
+    def reject(line_number, message):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'row': line_number, 'message': message})
+
+    try:
+        for line_number, row, error in iter_rows(stream, import_format):
+            if error:
+                reject(line_number, error)
+                continue
+
+            values, error = parse_payment_row(row)
+            if error:
+                reject(line_number, error)
+                continue
+
+            # Verificação de posse feita uma única vez por filho
+            child_id = values['child_id']
+            if child_id not in owned_children:
+                owned_children[child_id] = db.session.query(
+                    Child.query.filter_by(id=child_id, user_id=user_id).exists()
+                ).scalar()
+            if not owned_children[child_id]:
+                reject(line_number, 'Filho não encontrado ou não autorizado para este utilizador')
+                continue
+
+            chunk.append(values)
+            if len(chunk) >= CHUNK_SIZE:
+                # Uma única versão de dados para toda a importação
+                version = version or versioning.bump(user_id)
+                _flush(chunk, version)
+                imported += len(chunk)
+                chunk = []
+
+        if chunk:
+            version = version or versioning.bump(user_id)
+            _flush(chunk, version)
+            imported += len(chunk)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'errors': errors,
+        'errors_truncated': rejected > len(errors),
+    }
@@ -0,0 +1,176 @@
+# query_plans.py
+# Verificação de regressões nos planos de execução das consultas da API.
+#
+# Cria (ou usa) um banco de dados de testes, aplica as migrações, insere um volume grande
+# de dados e chama cada rota da API através do cliente de testes do Flask. Todas as
+# consultas SQL executadas pelas rotas são capturadas e analisadas com EXPLAIN; se alguma
+# fizer uma leitura completa de uma tabela (sequential scan) o script termina com erro.
+#
+# Uso:
+#   python query_plans.py                                  (SQLite temporário)
+#   python query_plans.py --database-url postgresql://...  (apenas bancos de teste!)
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+
+from benchmarks.seed import PASSWORD, seed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Verifica se as consultas das rotas da API usam índices.')
+    parser.add_argument('--database-url', help='Banco de dados de teste (por omissão: SQLite temporário).')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--children', type=int, default=3, help='Filhos por utilizador.')
+    parser.add_argument('--years', type=int, default=5, help='Anos de pagamentos por filho.')
+    return parser.parse_args()
+
+
+def explain(db, statement, parameters):
+    # Devolve a lista de tabelas lidas por completo no plano de execução
+    raw = db.engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if db.engine.dialect.name == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            full_scans = []
+            for row in cursor.fetchall():
+                detail = row[-1]
+                if detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail:
+                    full_scans.append(detail)
+            return full_scans
+
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+        plan = cursor.fetchone()[0][0]['Plan']
+        full_scans = []
+        pending = [plan]
+        while pending:
+            node = pending.pop()
+            if node.get('Node Type') == 'Seq Scan':
+                full_scans.append(f"Seq Scan on {node.get('Relation Name')}")
+            pending.extend(node.get('Plans', []))
+        return full_scans
+    finally:
+        raw.rollback()
+        raw.close()
+
+
+def main():
+    args = parse_args()
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+    os.environ['DATABASE_URL'] = database_url
+    # Sem uma linha de log por pedido no meio do relatório
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Os logins repetidos do mesmo IP não podem ser travados pelo limite de tentativas
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+    from sqlalchemy import event
+    from app import create_app, encode_payments_cursor
+    from models import db, User, Child, Payment, PasswordResetToken
+    import migrations
+
+    app = create_app()
+
+    with app.app_context():
+        migrations.upgrade(echo=lambda message: None)
+        seed(db, args.users, args.children, args.years)
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ANALYZE')
+
+        user = User.query.order_by(User.id.desc()).first()
+        child = Child.query.filter_by(user_id=user.id).order_by(Child.id).first()
+        payment = Payment.query.filter_by(child_id=child.id).order_by(Payment.id).first()
+        other_child = Child.query.filter_by(user_id=user.id).order_by(Child.id.desc()).first()
+        reset_token = PasswordResetToken.query.filter_by(user_id=user.id).first().token
+        first_page_cursor = encode_payments_cursor(
+            Payment.query.filter_by(child_id=child.id).order_by(Payment.payment_date, Payment.id).offset(4).first()
+        )
+        db.session.remove()
+
+        captured = []
+        current_route = {'label': None}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if current_route['label'] and not executemany:
+                captured.append((current_route['label'], statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+
+        client = app.test_client()
+        today = date.today().isoformat()
+        routes = [
+            ('POST /api/register', 'post', '/api/register',
+             {'name': 'Novo', 'surname': 'Utilizador', 'email': 'novo@exemplo.com', 'password': 'x'}),
+            ('POST /api/login', 'post', '/api/login', {'email': user.email, 'password': PASSWORD}),
+            ('GET /api/dashboard', 'get', '/api/dashboard', None),
+            ('GET /api/children', 'get', '/api/children', None),
+            ('GET /api/children/<id>', 'get', f'/api/children/{child.id}', None),
+            ('GET /api/children/<id>/ledger', 'get', f'/api/children/{child.id}/ledger', None),
+            ('PUT /api/children/<id>', 'put', f'/api/children/{child.id}', {'full_name': 'Nome Alterado'}),
+            ('GET /api/dashboard?year=', 'get', f'/api/dashboard?year={date.today().year}', None),
+            ('GET /api/payments/<child_id>', 'get', f'/api/payments/{child.id}', None),
+            ('GET /api/payments/<child_id>?year=&month=', 'get',
+             f'/api/payments/{child.id}?year={date.today().year}&month=1', None),
+            ('GET /api/payments/<child_id>?limit=&cursor=', 'get',
+             f'/api/payments/{child.id}?limit=5&cursor={first_page_cursor}', None),
+            ('GET /api/payments/export', 'get', '/api/payments/export?format=ndjson', None),
+            ('GET /api/children/<id>/payments/export', 'get', f'/api/children/{child.id}/payments/export', None),
+            ('POST /api/payments', 'post', '/api/payments',
+             {'child_id': child.id, 'amount': 100, 'payment_date': today}),
+            ('PUT /api/payments/<id>', 'put', f'/api/payments/{payment.id}', {'amount': 321, 'payment_date': today}),
+            ('DELETE /api/payments/<id>', 'delete', f'/api/payments/{payment.id}', None),
+            ('POST /api/payments/import', 'post', '/api/payments/import',
+             f'child_id,amount,payment_date\n{child.id},100,{today}\n'),
+            ('DELETE /api/children/<id>', 'delete', f'/api/children/{other_child.id}', None),
+            ('POST /api/forgot-password', 'post', '/api/forgot-password', {'email': user.email}),
+            ('POST /api/reset-password', 'post', '/api/reset-password',
+             {'token': reset_token, 'new_password': PASSWORD, 'confirm_password': PASSWORD}),
+            ('GET /api/sync', 'get', '/api/sync', None),
+            ('GET /api/sync?since=', 'get', '/api/sync?since=1', None),
+            ('POST /api/sync', 'post', '/api/sync', {'mutations': [
+                {'idempotency_key': 'query-plans-1', 'type': 'add_payment',
+                 'payload': {'child_id': child.id, 'amount': 10, 'payment_date': today}},
+            ]}),
+            ('POST /api/logout', 'post', '/api/logout', None),
+        ]
+
+        failures = []
+        for label, method, url, body in routes:
+            current_route['label'] = label
+            if isinstance(body, str):
+                response = getattr(client, method)(url, data=body.encode(), content_type='text/csv')
+            else:
+                response = getattr(client, method)(url, json=body)
+            # As exportações são enviadas em streaming: as consultas só correm ao ler o corpo
+            response.get_data()
+            response.close()
+            current_route['label'] = None
+            if response.status_code >= 400:
+                failures.append(f"{label}: resposta inesperada {response.status_code}")
+
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+        checked = 0
+        for label, statement, parameters in captured:
+            if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                continue
+            checked += 1
+            for scan in explain(db, statement, parameters):
+                failures.append(f"{label}: {scan}\n    {' '.join(statement.split())}")
+
+    print(f"{len(routes)} rotas, {checked} consultas analisadas com EXPLAIN ({database_url.split(':')[0]}).")
+    if failures:
+        print("Consultas sem índice:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("Todas as consultas usam índices.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# ratelimit.py
+# Limite de tentativas em /api/login e /api/forgot-password, por IP e por e-mail.
+#
+# Cada chave (ex.: login + IP) tem um "balde de fichas" (token bucket): cabem até N fichas,
+# cada pedido gasta uma e o balde volta a encher à razão de N por janela. Sem fichas, o
+# pedido é recusado com 429 e Retry-After, antes de qualquer consulta ao banco principal.
+#
+# O estado é partilhado por todos os workers do Gunicorn da mesma máquina num ficheiro SQLite
+# local (RATE_LIMIT_DB), sem serviços externos. Se esse ficheiro falhar, os pedidos passam.
+#
+# Variáveis de ambiente:
+#   RATE_LIMIT_ENABLED       0 desliga os limites (benchmarks, testes de carga)
+#   RATE_LIMIT_DB            ficheiro do estado (por omissão, na pasta temporária)
+#   RATE_LIMIT_PROXY_COUNT   proxies à frente da aplicação cujo X-Forwarded-For é de confiança
+#                            (por omissão 1 no Render, 0 nos restantes)
+#   RATE_LIMIT_<NOME>        limite no formato 'pedidos/segundos', ex.: RATE_LIMIT_LOGIN_IP=20/60
+
+import hashlib
+import logging
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import jsonify, request
+
+ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+DB_PATH = os.environ.get('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'pensao-rate-limit.db'))
+PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 1 if os.environ.get('RENDER') else 0))
+# Baldes sem uso há mais do que isto estão cheios e podem ser apagados
+PRUNE_AFTER_SECONDS = 24 * 3600
+
+
+def _parse_limit(name, default):
+    requests, seconds = os.environ.get(f'RATE_LIMIT_{name}', default).split('/')
+    return int(requests), float(seconds)
+
+
+# Por rota: limites por IP e por e-mail (o e-mail do corpo JSON do pedido)
+LIMITS = {
+    'login': {
+        'ip': _parse_limit('LOGIN_IP', '20/60'),
+        'email': _parse_limit('LOGIN_EMAIL', '10/300'),
+    },
+    'forgot_password': {
+        'ip': _parse_limit('FORGOT_PASSWORD_IP', '5/900'),
+        'email': _parse_limit('FORGOT_PASSWORD_EMAIL', '3/3600'),
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _connection():
+    # Uma ligação por thread (e por processo, depois do fork dos workers)
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(DB_PATH, timeout=1.0, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Perder o estado num crash da máquina não é grave
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def _client_ip():
+    if PROXY_COUNT > 0:
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if len(forwarded) >= PROXY_COUNT:
+            return forwarded[-PROXY_COUNT]
+    return request.remote_addr or 'desconhecido'
+
+
+def _keys(name):
+    limits = LIMITS[name]
+    keys = [(f'{name}:ip:{_client_ip()}', limits['ip'])]
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    if isinstance(email, str) and email.strip():
+        # O ficheiro guarda apenas um hash do e-mail
+        digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        keys.append((f'{name}:email:{digest}', limits['email']))
+    return keys
+
+
+def take(keys, now=None):
+    # Gasta uma ficha de cada balde se todos tiverem pelo menos uma. Devolve 0 se o pedido
+    # pode seguir, ou os segundos até haver fichas em todos os baldes.
+    now = time.time() if now is None else now
+    conn = _connection()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        buckets = []
+        retry_after = 0.0
+        for key, (capacity, seconds) in keys:
+            rate = capacity / seconds
+            row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(now - row[1], 0) * rate)
+            if tokens < 1:
+                retry_after = max(retry_after, (1 - tokens) / rate)
+            buckets.append((key, tokens))
+        if not retry_after:
+            conn.executemany(
+                'INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                [(key, tokens - 1, now) for key, tokens in buckets],
+            )
+            if random.random() < 0.001:
+                conn.execute('DELETE FROM buckets WHERE updated_at < ?', (now - PRUNE_AFTER_SECONDS,))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    return retry_after
+
+
+def limit(name):
+    def decorator(f):
+        def wrapper(*args, **kwargs):
+            if ENABLED:
+                try:
+                    retry_after = take(_keys(name))
+                except sqlite3.Error as e:
+                    logger.warning('Limite de tentativas indisponível', extra={'error': str(e)})
+                    retry_after = 0
+                if retry_after:
+                    logger.info('Demasiadas tentativas', extra={'path': request.path})
+                    return (jsonify({'message': 'Demasiadas tentativas. Tente novamente mais tarde.'}), 429,
+                            {'Retry-After': str(math.ceil(retry_after))})
+            return f(*args, **kwargs)
+        wrapper.__name__ = f.__name__
+        return wrapper
+    return decorator
@@ -0,0 +1,202 @@
+# reminders.py
+# Lembretes de meses de pensão em atraso (tarefa noturna).
+#
+# A procura é feita em SQL, por blocos de utilizadores (paginação por id): para cada filho
+# são gerados os meses acompanhados (anos em enabled_years até ao mês atual) e comparados
+# com os totais de child_month_balance, que é mantida a partir de 'payments' por
+# balances.py. Nenhum objeto é carregado por utilizador e cada bloco é uma leitura curta,
+# sem bloqueios em 'payments'.
+#
+# Os e-mails são enviados em lotes: uma mensagem com substituições por destinatário
+# (personalizations do SendGrid), até BATCH_SIZE destinatários por pedido à API.
+#
+# Uso (cron da plataforma): flask --app app send-reminders [--dry-run]
+
+import html
+import logging
+import time
+from datetime import date
+
+from sqlalchemy import text
+
+from models import db
+from email_outbox import transport_from_env
+
+CHUNK_SIZE = 2000
+# O SendGrid aceita no máximo 1000 personalizations por pedido
+BATCH_SIZE = 1000
+SEND_ATTEMPTS = 3
+# Anos inválidos em enabled_years (ex.: texto) são ignorados, como em ledger.years_to_track
+MIN_YEAR = 1900
+
+logger = logging.getLogger(__name__)
+
+# Expansão de children.enabled_years (JSON) numa linha por ano, conforme o banco
+_ENABLED_YEARS_SQL = {
+    'postgresql': (
+        "json_array_elements_text(CASE WHEN json_typeof(c.enabled_years) = 'array' "
+        "THEN c.enabled_years ELSE '[]'::json END) AS y(value)"
+    ),
+    'sqlite': "json_each(c.enabled_years) AS y",
+}
+_YEAR_VALUE_SQL = {
+    'postgresql': "CASE WHEN y.value ~ '^[0-9]{1,4}$' THEN CAST(y.value AS INTEGER) ELSE 0 END",
+    'sqlite': "CAST(y.value AS INTEGER)",
+}
+
+_OVERDUE_SQL = """
+WITH months(month) AS (
+    VALUES (1), (2), (3), (4), (5), (6), (7), (8), (9), (10), (11), (12)
+),
+tracked AS (
+    SELECT DISTINCT c.id AS child_id, {year_value} AS year, m.month AS month
+    FROM children c, {enabled_years}, months m
+    WHERE c.user_id > :after_user_id AND c.user_id <= :last_user_id
+)
+SELECT c.user_id, u.email, u.name, c.id AS child_id, c.full_name,
+       COUNT(*) AS overdue_months,
+       SUM(c.monthly_alimony_value - COALESCE(b.total_paid, 0)) AS shortfall
+FROM tracked t
+JOIN children c ON c.id = t.child_id
+JOIN users u ON u.id = c.user_id
+LEFT JOIN child_month_balance b
+       ON b.child_id = t.child_id AND b.year = t.year AND b.month = t.month
+WHERE t.year >= :min_year
+  AND (t.year < :current_year OR (t.year = :current_year AND t.month <= :current_month))
+  AND COALESCE(b.total_paid, 0) < c.monthly_alimony_value
+GROUP BY c.user_id, u.email, u.name, c.id, c.full_name
+ORDER BY c.user_id, c.id
+"""
+
+REMINDER_TEMPLATE = {
+    'subject': 'Pensão em Dia: há meses de pensão em atraso',
+    'html_content': (
+        "Olá -nome-,<br><br>"
+        "Existem meses de pensão alimentícia por pagar ou pagos apenas em parte:<br>"
+        "<ul>-detalhes_html-</ul>"
+        "Total em falta: <strong>R$ -total-</strong><br><br>"
+        "Consulte os detalhes e registe os pagamentos na página de gestão.<br><br>"
+        "Atenciosamente,<br>A Equipa Pensão em Dia"
+    ),
+    'text_content': (
+        "Olá -nome_texto-,\n\n"
+        "Existem meses de pensão alimentícia por pagar ou pagos apenas em parte:\n"
+        "-detalhes_texto-\n"
+        "Total em falta: R$ -total-\n\n"
+        "Consulte os detalhes e registe os pagamentos na página de gestão.\n\n"
+        "Atenciosamente,\nA Equipa Pensão em Dia"
+    ),
+}
+
+
+def _format_money(value):
+    return f"{value:.2f}".replace('.', ',')
+
+
+def _overdue_query(dialect_name):
+    if dialect_name not in _ENABLED_YEARS_SQL:
+        raise RuntimeError(f"Banco de dados não suportado para lembretes: {dialect_name}")
+    return text(_OVERDUE_SQL.format(
+        enabled_years=_ENABLED_YEARS_SQL[dialect_name],
+        year_value=_YEAR_VALUE_SQL[dialect_name],
+    ))
+
+
+def iter_overdue_children(today=None, chunk_size=CHUNK_SIZE):
+    # Gera listas de linhas (user_id, email, name, child_id, full_name, overdue_months, shortfall),
+    # uma lista por bloco de utilizadores. Os filhos de um utilizador ficam sempre no mesmo bloco.
+    today = today or date.today()
+    query = _overdue_query(db.engine.dialect.name)
+    after_user_id = 0
+    while True:
+        last_user_id = db.session.execute(
+            text("SELECT MAX(id) FROM (SELECT id FROM users WHERE id > :after ORDER BY id LIMIT :limit) AS chunk"),
+            {'after': after_user_id, 'limit': chunk_size},
+        ).scalar()
+        if last_user_id is None:
+            return
+        rows = db.session.execute(query, {
+            'after_user_id': after_user_id,
+            'last_user_id': last_user_id,
+            'min_year': MIN_YEAR,
+            'current_year': today.year,
+            'current_month': today.month,
+        }).all()
+        # Termina a transação de leitura a cada bloco
+        db.session.rollback()
+        if rows:
+            yield rows
+        after_user_id = last_user_id
+
+
+def build_recipients(rows):
+    # Agrupa as linhas por utilizador: um destinatário com a lista dos seus filhos
+    recipients = []
+    current = None
+    for row in rows:
+        if current is None or current['user_id'] != row.user_id:
+            current = {'user_id': row.user_id, 'to_email': row.email, 'name': row.name, 'children': [], 'total': 0.0}
+            recipients.append(current)
+        current['children'].append((row.full_name, int(row.overdue_months), float(row.shortfall)))
+        current['total'] += float(row.shortfall)
+
+    result = []
+    for recipient in recipients:
+        html_lines = []
+        text_lines = []
+        for full_name, overdue_months, shortfall in recipient['children']:
+            description = f"{overdue_months} mês(es) em atraso, R$ {_format_money(shortfall)} em falta"
+            html_lines.append(f"<li>{html.escape(full_name)}: {description}</li>")
+            text_lines.append(f"- {full_name}: {description}")
+        result.append({
+            'to_email': recipient['to_email'],
+            'substitutions': {
+                '-nome-': html.escape(recipient['name']),
+                '-nome_texto-': recipient['name'],
+                '-detalhes_html-': ''.join(html_lines),
+                '-detalhes_texto-': '\n'.join(text_lines),
+                '-total-': _format_money(recipient['total']),
+            },
+        })
+    return result
+
+
+def _send_batch(transport, recipients):
+    for attempt in range(1, SEND_ATTEMPTS + 1):
+        try:
+            transport.send_batch(REMINDER_TEMPLATE, recipients)
+            return True
+        except Exception as e:
+            logger.warning("Erro ao enviar lote de lembretes", extra={
+                'recipients': len(recipients), 'attempt': attempt, 'error': str(e),
+            })
+            if attempt < SEND_ATTEMPTS:
+                time.sleep(2 ** attempt)
+    return False
+
+
+def send_reminders(transport=None, today=None, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, dry_run=False):
+    transport = transport or transport_from_env()
+    summary = {'children': 0, 'recipients': 0, 'sent': 0, 'failed': 0, 'batches': 0}
+    pending = []
+
+    def flush(recipients):
+        summary['batches'] += 1
+        if dry_run:
+            return
+        if _send_batch(transport, recipients):
+            summary['sent'] += len(recipients)
+        else:
+            summary['failed'] += len(recipients)
+
+    for rows in iter_overdue_children(today, chunk_size):
+        summary['children'] += len(rows)
+        recipients = build_recipients(rows)
+        summary['recipients'] += len(recipients)
+        pending.extend(recipients)
+        while len(pending) >= batch_size:
+            flush(pending[:batch_size])
+            pending = pending[batch_size:]
+    if pending:
+        flush(pending)
+    return summary
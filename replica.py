@@ -0,0 +1,88 @@
+# replica.py
+# Leituras numa réplica do banco de dados (opcional).
+#
+# Com DATABASE_REPLICA_URL definido, as rotas GET marcadas com @replica.read_only fazem as
+# consultas SELECT na réplica (bind 'replica', ver models.RoutingSession). Escritas ficam
+# sempre no banco principal.
+#
+# Ler o que se acabou de escrever: cada escrita guarda na sessão do utilizador a versão
+# dos dados (users.data_version) que produziu. Uma rota de leitura só usa a réplica se a
+# versão lá for pelo menos essa, ou seja, se a réplica já tiver recebido as alterações do
+# próprio utilizador; caso contrário lê do principal.
+#
+# Falhas: se a réplica não responder, o pedido é servido pelo principal e a réplica fica
+# fora de uso durante REPLICA_RETRY_SECONDS.
+#
+# Teste local com dois ficheiros SQLite (a "réplica" é uma cópia do principal):
+#   cp app.db replica.db
+#   DATABASE_URL=sqlite:///$PWD/app.db DATABASE_REPLICA_URL=sqlite:///$PWD/replica.db flask --app app run
+
+import logging
+import os
+import threading
+import time
+
+from flask import current_app, g, session
+from sqlalchemy.exc import DBAPIError
+
+from models import db, User, REPLICA_BIND
+
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', 30))
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_unavailable_until = 0.0
+
+
+def is_configured():
+    return REPLICA_BIND in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def remember_write(version):
+    # Chamado no commit de cada escrita (versioning.bump) com a nova versão dos dados
+    if version is not None and is_configured():
+        session['data_version'] = max(version, session.get('data_version') or 0)
+
+
+def _mark_unavailable(error):
+    global _unavailable_until
+    with _lock:
+        _unavailable_until = time.monotonic() + REPLICA_RETRY_SECONDS
+    logger.warning('Réplica de leitura indisponível; a usar o banco principal', extra={'error': str(error)})
+
+
+def _replica_is_current(user_id):
+    # Consulta a versão dos dados do utilizador na réplica. Serve também de verificação de
+    # que a réplica está a responder.
+    if time.monotonic() < _unavailable_until:
+        return False
+    try:
+        with db.engines[REPLICA_BIND].connect() as conn:
+            replica_version = conn.execute(
+                db.select(User.data_version).where(User.id == user_id)
+            ).scalar()
+    except DBAPIError as e:
+        _mark_unavailable(e)
+        return False
+    if replica_version is None:
+        # Utilizador ainda não replicado
+        return False
+    return replica_version >= (session.get('data_version') or 0)
+
+
+def read_only(f):
+    def wrapper(*args, **kwargs):
+        if not is_configured() or not _replica_is_current(session.get('user_id')):
+            return f(*args, **kwargs)
+        g.use_replica = True
+        try:
+            return f(*args, **kwargs)
+        except DBAPIError as e:
+            # A réplica falhou a meio do pedido: repete-o no banco principal
+            db.session.rollback()
+            _mark_unavailable(e)
+            g.use_replica = False
+            return f(*args, **kwargs)
+    wrapper.__name__ = f.__name__
+    return wrapper
@@ -0,0 +1,176 @@
+# sync.py
+# Sincronização incremental para o PWA.
+#
+# GET /api/sync?since=<cursor> devolve apenas os filhos e pagamentos alterados depois do
+# cursor (comparando o sync_version de cada linha com a versão dos dados do utilizador),
+# mais as exclusões registadas em 'sync_tombstones'. Sem 'since' devolve tudo.
+#
+# POST /api/sync recebe uma fila de mutações feitas offline. Cada mutação traz uma chave
+# de idempotência gerada no cliente e é aplicada pela rota normal da API; o resultado fica
+# guardado em 'sync_mutations', por isso um reenvio devolve o mesmo resultado sem repetir
+# a alteração (ex.: sem criar um Payment duplicado).
+
+import logging
+
+from flask import current_app, session
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Child, Payment, SyncTombstone, SyncMutation
+import replica
+import versioning
+
+MAX_MUTATIONS_PER_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+# tipo da mutação -> (método HTTP, caminho da rota da API)
+MUTATION_ROUTES = {
+    'add_child': ('POST', '/api/children'),
+    'update_child': ('PUT', '/api/children/{id}'),
+    'delete_child': ('DELETE', '/api/children/{id}'),
+    'add_payment': ('POST', '/api/payments'),
+    'update_payment': ('PUT', '/api/payments/{id}'),
+    'delete_payment': ('DELETE', '/api/payments/{id}'),
+}
+
+
+class SyncError(ValueError):
+    pass
+
+
+def encode_cursor(version):
+    return str(version)
+
+
+def decode_cursor(cursor):
+    try:
+        version = int(cursor)
+    except (ValueError, TypeError):
+        raise SyncError('Cursor de sincronização inválido')
+    if version < 0:
+        raise SyncError('Cursor de sincronização inválido')
+    return version
+
+
+def record_tombstone(user_id, entity_type, entity_id, version):
+    db.session.add(SyncTombstone(user_id=user_id, entity_type=entity_type, entity_id=entity_id, version=version))
+
+
+def changes_since(user_id, since=None):
+    # A versão é lida antes das linhas: qualquer alteração confirmada depois desta leitura
+    # terá uma versão maior e será devolvida na próxima sincronização.
+    version = versioning.current(user_id) or 0
+    if since is not None and since > version:
+        # Cursor de outro banco/estado: o cliente recebe tudo de novo
+        since = None
+
+    children_query = Child.query.filter_by(user_id=user_id)
+    payments_query = Payment.query.join(Child).filter(Child.user_id == user_id)
+    deleted = {'children': [], 'payments': []}
+
+    if since is not None:
+        children_query = children_query.filter(Child.sync_version > since)
+        payments_query = payments_query.filter(Payment.sync_version > since)
+        tombstones = (
+            SyncTombstone.query
+            .filter(SyncTombstone.user_id == user_id, SyncTombstone.version > since)
+            .order_by(SyncTombstone.version)
+        )
+        for tombstone in tombstones:
+            # A exclusão de um filho remove também todos os pagamentos dele
+            key = 'children' if tombstone.entity_type == 'child' else 'payments'
+            deleted[key].append(tombstone.entity_id)
+
+    return {
+        'cursor': encode_cursor(version),
+        'full': since is None,
+        'children': [child.to_dict() for child in children_query.order_by(Child.id)],
+        'payments': [payment.to_dict() for payment in payments_query.order_by(Payment.id)],
+        'deleted': deleted,
+    }
+
+
+def _dispatch(user_id, method, path, payload):
+    # Executa a rota da API correspondente, com as mesmas validações de um pedido normal
+    adapter = current_app.url_map.bind('localhost')
+    endpoint, view_args = adapter.match(path, method=method)
+    with current_app.test_request_context(path, method=method, json=payload or {}):
+        session['user_id'] = user_id
+        return current_app.make_response(current_app.view_functions[endpoint](**view_args))
+
+
+def _replay(record):
+    if record.status_code is None:
+        # A alteração foi confirmada mas o resultado não chegou a ser guardado
+        return {'status': 200, 'body': {'message': 'Mutação já aplicada'}}
+    return {'status': record.status_code, 'body': record.response_body}
+
+
+def _apply_one(user_id, mutation):
+    if not isinstance(mutation, dict):
+        return {'status': 400, 'body': {'message': 'Mutação inválida'}}
+
+    key = mutation.get('idempotency_key')
+    if not isinstance(key, str) or not key or len(key) > 255:
+        return {'status': 400, 'body': {'message': 'Chave de idempotência em falta ou inválida'}}
+
+    route = MUTATION_ROUTES.get(mutation.get('type'))
+    if route is None:
+        return {'idempotency_key': key, 'status': 400, 'body': {'message': 'Tipo de mutação desconhecido'}}
+    method, path = route
+    if '{id}' in path:
+        try:
+            path = path.format(id=int(mutation.get('id')))
+        except (ValueError, TypeError):
+            return {'idempotency_key': key, 'status': 400, 'body': {'message': 'Identificador em falta ou inválido'}}
+
+    existing = SyncMutation.query.filter_by(user_id=user_id, idempotency_key=key).first()
+    if existing:
+        return {'idempotency_key': key, 'replayed': True, **_replay(existing)}
+
+    try:
+        # A chave é gravada antes da alteração: o commit feito pela rota inclui as duas,
+        # e a restrição UNIQUE impede que dois envios simultâneos apliquem a mesma mutação
+        db.session.add(SyncMutation(user_id=user_id, idempotency_key=key))
+        db.session.flush()
+        response = _dispatch(user_id, method, path, mutation.get('payload'))
+    except IntegrityError:
+        db.session.rollback()
+        existing = SyncMutation.query.filter_by(user_id=user_id, idempotency_key=key).first()
+        if existing:
+            return {'idempotency_key': key, 'replayed': True, **_replay(existing)}
+        return {'idempotency_key': key, 'status': 409, 'body': {'message': 'Conflito ao aplicar a mutação'}}
+    except Exception:
+        db.session.rollback()
+        logger.exception("Erro ao aplicar mutação", extra={'user_id': user_id, 'idempotency_key': key})
+        return {'idempotency_key': key, 'status': 500, 'body': {'message': 'Erro interno ao aplicar a mutação'}}
+
+    body = response.get_json(silent=True)
+    if response.status_code >= 400:
+        # Descarta alterações parciais feitas pela rota antes de falhar, mas guarda o resultado
+        db.session.rollback()
+        db.session.add(SyncMutation(user_id=user_id, idempotency_key=key,
+                                    status_code=response.status_code, response_body=body))
+    else:
+        record = SyncMutation.query.filter_by(user_id=user_id, idempotency_key=key).first()
+        record.status_code = response.status_code
+        record.response_body = body
+    db.session.commit()
+    return {'idempotency_key': key, 'replayed': False, 'status': response.status_code, 'body': body}
+
+
+def apply_mutations(user_id, mutations):
+    if not isinstance(mutations, list):
+        raise SyncError("O campo 'mutations' deve ser uma lista.")
+    if len(mutations) > MAX_MUTATIONS_PER_BATCH:
+        raise SyncError(f'No máximo {MAX_MUTATIONS_PER_BATCH} mutações por pedido.')
+
+    # Aplicadas pela ordem em que foram feitas no cliente, cada uma na sua transação
+    results = [_apply_one(user_id, mutation) for mutation in mutations]
+    version = versioning.current(user_id) or 0
+    # As mutações correm em contextos de pedido próprios: regista a versão na sessão deste
+    replica.remember_write(version)
+    return {
+        'results': results,
+        'cursor': encode_cursor(version),
+    }
@@ -0,0 +1,117 @@
+# tests/test_correction.py
+# Correção monetária (correction.py) com as séries de exemplo de data/indices-exemplo/.
+#
+# Uso: python -m unittest discover -s tests -t .
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DIR = os.path.join(ROOT, 'data', 'indices-exemplo')
+
+_tmp = tempfile.mkdtemp()
+# Antes de importar a aplicação: hashes no próprio processo e sem limite de tentativas
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import correction  # noqa: E402
+
+
+class SeriesTest(unittest.TestCase):
+    def setUp(self):
+        self.series = correction.load_series('inpc', os.path.join(SAMPLE_DIR, 'inpc.csv'))
+
+    def test_loads_sample(self):
+        self.assertEqual(correction.format_ordinal(self.series.first), '2023-01')
+        self.assertEqual(correction.format_ordinal(self.series.last), '2025-12')
+
+    def test_factor(self):
+        series = correction.IndexSeries('teste', correction.month_ordinal(2024, 1), [1.0, 2.0, 0.5])
+        # Janeiro vencido: variações de fevereiro e março
+        self.assertAlmostEqual(series.factor(correction.month_ordinal(2024, 1)), 1.02 * 1.005)
+        # Antes da série: a série toda; no último mês e depois dele: sem correção
+        self.assertAlmostEqual(series.factor(correction.month_ordinal(2023, 6)), 1.01 * 1.02 * 1.005)
+        self.assertEqual(series.factor(correction.month_ordinal(2024, 3)), 1.0)
+        self.assertEqual(series.factor(correction.month_ordinal(2025, 1)), 1.0)
+
+    def test_correct(self):
+        series = correction.IndexSeries('teste', correction.month_ordinal(2024, 1), [1.0, 2.0, 0.5])
+        ledger_result = {'total_due': 300.0, 'months': [
+            {'year': 2024, 'month': 1, 'shortfall': 100.0},
+            {'year': 2024, 'month': 3, 'shortfall': 200.0},
+        ]}
+        result = correction.correct(series, ledger_result, date(2024, 5, 10), interest_rate=0.01)
+        january, march = result['months']
+        self.assertAlmostEqual(january['corrected_shortfall'], 102.51)
+        self.assertAlmostEqual(january['interest'], round(100 * 1.02 * 1.005 * 4 * 0.01, 2))
+        self.assertEqual(march['corrected_shortfall'], 200.0)
+        self.assertEqual(march['interest'], 4.0)
+        self.assertEqual(result['correction']['index_last_month'], '2024-03')
+
+
+class LedgerRouteTest(unittest.TestCase):
+    def setUp(self):
+        from app import create_app
+        import migrations
+
+        self.index_dir = tempfile.mkdtemp(dir=_tmp)
+        shutil.copy(os.path.join(SAMPLE_DIR, 'inpc.csv'), self.index_dir)
+        self._previous_dir = correction.INDEX_DIR
+        correction.INDEX_DIR = self.index_dir
+        correction._series.clear()
+
+        database = os.path.join(tempfile.mkdtemp(dir=_tmp), 'teste.db')
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+        with self.app.app_context():
+            migrations.upgrade(echo=lambda message: None)
+        self.client = self.app.test_client()
+        self.client.post('/api/register', json={'name': 'A', 'surname': 'B', 'email': 'a@b.pt', 'password': 'p'})
+        self.client.post('/api/login', json={'email': 'a@b.pt', 'password': 'p'})
+        response = self.client.post('/api/children', json={
+            'full_name': 'Criança', 'gender': 'F', 'date_of_birth': '2020-01-01',
+            'monthly_alimony_value': 500, 'enabled_years': [2024],
+        })
+        self.child_id = response.get_json()['child']['id']
+
+    def tearDown(self):
+        correction.INDEX_DIR = self._previous_dir
+        correction._series.clear()
+
+    def url(self, index_name='inpc'):
+        return f'/api/children/{self.child_id}/ledger?correction={index_name}'
+
+    def test_corrected_ledger(self):
+        response = self.client.get(self.url())
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body['correction']['index_last_month'], '2025-12')
+        self.assertGreater(body['total_corrected'], body['total_due'])
+        self.assertEqual(self.client.get(self.url('xx')).status_code, 400)
+        # Sem ficheiro da série: 503
+        self.assertEqual(self.client.get(self.url('ipca')).status_code, 503)
+
+    def test_new_index_month_changes_etag(self):
+        first = self.client.get(self.url())
+        etag = first.headers['ETag']
+        self.assertEqual(self.client.get(self.url(), headers={'If-None-Match': etag}).status_code, 304)
+
+        with open(os.path.join(self.index_dir, 'inpc.csv'), 'a') as f:
+            f.write('2026-01,0.50\n')
+        correction.get_series('inpc', force_reload=True)
+
+        second = self.client.get(self.url(), headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers['ETag'], etag)
+        self.assertEqual(second.get_json()['correction']['index_last_month'], '2026-01')
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
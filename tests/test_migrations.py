@@ -0,0 +1,90 @@
+# tests/test_migrations.py
+# Migrações (migrations.py) aplicadas a um banco com o esquema original da aplicação, sem
+# as colunas e os índices acrescentados depois, e não só a um banco novo.
+#
+# Uso: python -m unittest discover -s tests -t .
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+_tmp = tempfile.mkdtemp()
+# Antes de importar a aplicação: hashes no próprio processo e sem limite de tentativas
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+# Tabelas tal como o db.create_all() da versão original as criava no SQLite
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, name VARCHAR(255) NOT NULL, surname VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL, password_hash VARCHAR(255) NOT NULL, created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (email)
+);
+CREATE TABLE children (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, full_name VARCHAR(255) NOT NULL,
+    gender VARCHAR(50), date_of_birth DATE NOT NULL, monthly_alimony_value FLOAT NOT NULL,
+    enabled_years JSON,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE TABLE payments (
+    id INTEGER NOT NULL, child_id INTEGER NOT NULL, value_paid FLOAT NOT NULL,
+    payment_date DATE NOT NULL, month_reference INTEGER, year_reference INTEGER, created_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(child_id) REFERENCES children (id)
+);
+CREATE TABLE password_reset_tokens (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, token VARCHAR(255) NOT NULL,
+    expires_at DATETIME NOT NULL, used BOOLEAN NOT NULL, created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (token), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+INSERT INTO users VALUES (1, 'Ana', 'Silva', 'ana@exemplo.pt', 'antiga', '2024-01-01 00:00:00');
+INSERT INTO children VALUES (1, 1, 'Criança', 'F', '2020-01-01', 500.0, '[2024]');
+INSERT INTO payments VALUES (1, 1, 300.0, '2024-01-10', 1, 2024, '2024-01-10 00:00:00');
+"""
+
+
+class BaselineUpgradeTest(unittest.TestCase):
+    def setUp(self):
+        from app import create_app
+
+        database = os.path.join(tempfile.mkdtemp(dir=_tmp), 'baseline.db')
+        connection = sqlite3.connect(database)
+        connection.executescript(BASELINE_SCHEMA)
+        connection.close()
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+
+    def test_upgrade(self):
+        import migrations
+        from models import db
+
+        with self.app.app_context():
+            migrations.upgrade(echo=lambda message: None)
+            self.assertEqual(migrations.pending_migrations(), [])
+            self.assertEqual(sorted(migrations.applied_versions()), [version for version, _, _ in migrations.MIGRATIONS])
+            indexes = {index['name'] for table in ('children', 'payments')
+                       for index in db.inspect(db.engine).get_indexes(table)}
+            self.assertLessEqual({'ix_children_user_id_id', 'ix_children_user_id_sync_version',
+                                  'ix_payments_child_id_payment_date', 'ix_payments_child_id_sync_version'}, indexes)
+            # Uma segunda execução não tem nada a fazer
+            migrations.upgrade(echo=lambda message: None)
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = 1
+        ledger = client.get('/api/children/1/ledger')
+        self.assertEqual(ledger.status_code, 200)
+        self.assertEqual(ledger.get_json()['total_paid'], 300.0)
+
+        self.assertEqual(client.delete('/api/children/1').status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(db.session.execute(db.text('SELECT COUNT(*) FROM payments')).scalar(), 0)
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_payment_import.py
+# Importação em massa de pagamentos (POST /api/payments/import, payment_import.py).
+#
+# Uso: python -m unittest discover -s tests -t .
+
+import os
+import shutil
+import tempfile
+import unittest
+
+_tmp = tempfile.mkdtemp()
+# Antes de importar a aplicação: hashes no próprio processo e sem limite de tentativas
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+
+class ImportRouteTest(unittest.TestCase):
+    def setUp(self):
+        from app import create_app
+        import migrations
+
+        database = os.path.join(tempfile.mkdtemp(dir=_tmp), 'teste.db')
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+        with self.app.app_context():
+            migrations.upgrade(echo=lambda message: None)
+        self.client = self.app.test_client()
+        self.client.post('/api/register', json={'name': 'A', 'surname': 'B', 'email': 'a@b.pt', 'password': 'p'})
+        self.client.post('/api/login', json={'email': 'a@b.pt', 'password': 'p'})
+        response = self.client.post('/api/children', json={
+            'full_name': 'Criança', 'gender': 'F', 'date_of_birth': '2020-01-01',
+            'monthly_alimony_value': 500, 'enabled_years': [2024],
+        })
+        self.child_id = response.get_json()['child']['id']
+
+    def post_csv(self, body):
+        return self.client.post('/api/payments/import', data=body, content_type='text/csv')
+
+    def test_csv(self):
+        body = ('\ufeffchild_id,amount,payment_date,month_reference,year_reference\n'
+                f'{self.child_id},300,2024-01-10,1,2024\n'
+                f'{self.child_id},abc,2024-02-10,2,2024\n').encode()
+        response = self.post_csv(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['imported'], 1)
+        self.assertEqual(response.get_json()['rejected'], 1)
+
+    def test_not_utf8(self):
+        response = self.post_csv(b'\xff\xfe')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'], 'O ficheiro deve estar em UTF-8')
+
+        # Linhas válidas antes do erro de codificação também não são gravadas
+        body = f'child_id,amount,payment_date\n{self.child_id},300,2024-01-10\n'.encode() + b'\xe9\n'
+        self.assertEqual(self.post_csv(body).status_code, 400)
+        payments = self.client.get(f'/api/payments/{self.child_id}').get_json()
+        self.assertEqual(payments, [])
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# tests/test_replica.py
+# Leituras na réplica (replica.py): uma réplica que falha a meio do pedido não dá erro ao
+# utilizador, o pedido é repetido no banco principal.
+#
+# Uso: python -m unittest discover -s tests -t .
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+_tmp = tempfile.mkdtemp()
+# Antes de importar a aplicação: hashes no próprio processo e sem limite de tentativas
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+import replica  # noqa: E402
+
+
+class ReplicaFailoverTest(unittest.TestCase):
+    def setUp(self):
+        from app import create_app
+        from models import REPLICA_BIND
+        import migrations
+
+        directory = tempfile.mkdtemp(dir=_tmp)
+        primary = os.path.join(directory, 'principal.db')
+        self.replica = os.path.join(directory, 'replica.db')
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+            'SQLALCHEMY_BINDS': {REPLICA_BIND: f'sqlite:///{self.replica}'},
+        })
+        with self.app.app_context():
+            migrations.upgrade(echo=lambda message: None)
+        self.client = self.app.test_client()
+        self.client.post('/api/register', json={'name': 'A', 'surname': 'B', 'email': 'a@b.pt', 'password': 'p'})
+        self.client.post('/api/login', json={'email': 'a@b.pt', 'password': 'p'})
+        response = self.client.post('/api/children', json={
+            'full_name': 'Criança', 'gender': 'F', 'date_of_birth': '2020-01-01',
+            'monthly_alimony_value': 500, 'enabled_years': [2024],
+        })
+        self.child_id = response.get_json()['child']['id']
+        self.client.post('/api/payments', json={
+            'child_id': self.child_id, 'amount': 300, 'payment_date': '2024-01-10',
+            'month_reference': 1, 'year_reference': 2024,
+        })
+        # Réplica em dia (mesma data_version), mas sem a tabela de pagamentos
+        shutil.copy(primary, self.replica)
+        connection = sqlite3.connect(self.replica)
+        connection.execute('DROP TABLE payments')
+        connection.close()
+
+    def tearDown(self):
+        replica._unavailable_until = 0.0
+
+    def test_payments_fall_back_to_primary(self):
+        response = self.client.get(f'/api/payments/{self.child_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([payment['amount'] for payment in response.get_json()], [300.0])
+        self.assertGreater(replica._unavailable_until, 0.0)
+
+
+def tearDownModule():
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# versioning.py
+# Versão dos dados de cada utilizador, usada para pedidos GET condicionais (ETag).
+# Todas as rotas que alteram filhos ou pagamentos incrementam users.data_version na
+# mesma transação; as rotas de leitura devolvem um ETag derivado dessa versão e
+# respondem 304 a um If-None-Match igual, sem executar as consultas pesadas.
+
+from datetime import date
+
+from flask import current_app, g, has_request_context, make_response, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User
+import replica
+
+
+def bump(user_id, *entities):
+    # Incrementa a versão e marca os filhos/pagamentos alterados com a nova versão
+    # (sync_version), usada pela sincronização incremental. Devolve a nova versão.
+    version = db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+        .returning(User.data_version)
+    ).scalar()
+    for entity in entities:
+        entity.sync_version = version
+    if has_request_context():
+        # Guardada na sessão do utilizador só depois do commit (_remember_committed_version)
+        g.pending_data_version = max(version, g.get('pending_data_version') or 0)
+    return version
+
+
+@event.listens_for(Session, 'after_commit')
+def _remember_committed_version(db_session):
+    # As leituras seguintes deste utilizador só usam a réplica quando ela tiver esta versão
+    if has_request_context():
+        replica.remember_write(g.pop('pending_data_version', None))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_version(db_session):
+    # Uma escrita desfeita (ex.: 404 depois do incremento) não pode afastar a sessão da réplica
+    if has_request_context():
+        g.pop('pending_data_version', None)
+
+
+def current(user_id):
+    return db.session.execute(
+        db.select(User.data_version).where(User.id == user_id)
+    ).scalar()
+
+
+def etag_for(user_id, version, extra=None):
+    # A data entra no ETag porque o montante devedor muda com a passagem dos meses
+    etag = f"{user_id}-{version}-{date.today().isoformat()}"
+    return f"{etag}-{extra}" if extra else etag
+
+
+def conditional_get(f=None, *, etag_extra=None):
+    # etag_extra: função opcional que devolve o que, além dos dados do utilizador, muda a
+    # resposta (ex.: o último mês publicado do índice de correção)
+    if f is None:
+        return lambda f: conditional_get(f, etag_extra=etag_extra)
+
+    def wrapper(*args, **kwargs):
+        user_id = session.get('user_id')
+        version = current(user_id)
+        if version is None:
+            return f(*args, **kwargs)
+        # Disponível para a rota (ex.: chave de cache em correction.py)
+        g.data_version = version
+
+        etag = etag_for(user_id, version, etag_extra() if etag_extra else None)
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            # O navegador guarda a resposta, mas revalida sempre com If-None-Match
+            response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    wrapper.__name__ = f.__name__
+    return wrapper
@@ -0,0 +1,78 @@
+# warmup.py
+# Aquecimento opcional de cada processo da aplicação, logo depois de create_app().
+#
+# Sem aquecimento, o primeiro pedido de cada worker paga a configuração dos mappers do
+# SQLAlchemy, a abertura das ligações ao banco (TLS + autenticação no PostgreSQL), o arranque
+# do pool de hash de palavras-passe e a leitura das séries de índices de correção. Com
+# APP_WARMUP, isso é feito antes de o worker receber pedidos (sync) ou numa thread à parte
+# enquanto os primeiros pedidos já são atendidos (background).
+#
+# No Gunicorn a aplicação é criada em cada worker (sem preload_app), pelo que as ligações
+# abertas aqui pertencem ao próprio worker.
+#
+# Variáveis de ambiente:
+#   APP_WARMUP              off (por omissão), sync ou background
+#   APP_WARMUP_CONNECTIONS  ligações abertas por engine (por omissão o DB_POOL_SIZE do pool)
+#
+# Medir o efeito no tempo até à primeira resposta: python -m benchmarks.startup
+
+import logging
+import os
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy.orm import configure_mappers
+
+import passwords
+from models import db
+
+MODES = ('off', 'sync', 'background')
+
+logger = logging.getLogger(__name__)
+
+
+def _open_connections(engine, count):
+    # Abre 'count' ligações ao mesmo tempo e devolve-as ao pool, onde ficam prontas a usar
+    connections = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(sqlalchemy.text('SELECT 1'))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def warm_up(app):
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            configure_mappers()
+            for engine in db.engines.values():
+                pool_size = engine.pool.size() if hasattr(engine.pool, 'size') else 1
+                _open_connections(engine, int(os.environ.get('APP_WARMUP_CONNECTIONS', pool_size)))
+            passwords.warm_up()
+            import correction
+            try:
+                correction.get_series(correction.DEFAULT_INDEX)
+            except correction.IndexUnavailable:
+                pass
+    except Exception as e:
+        # Um banco indisponível no arranque não impede o worker de arrancar: o pre-ping do
+        # pool volta a tentar no primeiro pedido
+        logger.warning('Aquecimento do processo falhou', extra={'error': str(e)})
+        return False
+    logger.info('Processo aquecido', extra={'duration_ms': round((time.perf_counter() - started) * 1000, 1)})
+    return True
+
+
+def init_app(app):
+    mode = os.environ.get('APP_WARMUP', 'off')
+    if mode not in MODES:
+        raise RuntimeError(f"APP_WARMUP inválido: {mode} (use {', '.join(MODES)})")
+    if mode == 'sync':
+        warm_up(app)
+    elif mode == 'background':
+        threading.Thread(target=warm_up, args=(app,), name='app-warmup', daemon=True).start()